@@ -0,0 +1,57 @@
+"""
+Microbenchmark for the local vector memory backend: search latency over a
+user store of N memories (query embedding cached, as for repeated turns, and
+uncached with the hashing embedder), plus a reopen check that the SQLite
+store round-trips.
+
+    python bench_local_memory.py [n_memories]
+"""
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from vendors.local_memory import LocalMemory, MemoryMessage
+
+WORDS = (
+    "I like chess football cooking travel Spain London guitar my sister works as a nurse "
+    "we have two kids and a dog preparing for IELTS band seven next spring remote job pilot"
+).split()
+
+
+def random_sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 16)))
+
+
+async def main(n_memories: int) -> None:
+    rng = random.Random(0)
+    root = Path(tempfile.mkdtemp())
+    memory = LocalMemory(user_id="bench-user", agent_id="Stacy", run_id="", root=root)
+    messages = [MemoryMessage(role="user", content=random_sentence(rng)) for _ in range(n_memories)]
+    t0 = time.perf_counter()
+    for i in range(0, len(messages), 100):
+        await memory.add_messages(messages[i : i + 100])
+    print(f"ingest: {n_memories} messages in {time.perf_counter() - t0:.2f}s")
+
+    queries = [random_sentence(rng) for _ in range(200)]
+    for label, warm in [("uncached query", False), ("cached query  ", True)]:
+        if warm:
+            for q in queries:
+                await memory.search_for_turn(q)
+        t0 = time.perf_counter()
+        for q in queries:
+            await memory.search_for_turn(q)
+        print(f"search_for_turn {label}: {(time.perf_counter() - t0) / len(queries) * 1e6:7.1f} us")
+
+    expected = [m.memory for m in await memory.search_for_system(queries[0])]
+    LocalMemory._stores.clear()
+    reopened = LocalMemory(user_id="bench-user", agent_id="Stacy", run_id="", root=root)
+    assert [m.memory for m in await reopened.search_for_system(queries[0])] == expected, "reopen mismatch"
+    assert await LocalMemory(user_id="bench-user", agent_id="Other", run_id="", root=root).search_for_turn(queries[0]) == []
+    print("reopen: ok")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,187 @@
+"""
+Microbenchmark and randomized equivalence check for the compiled MDAGAW
+scenario graph.
+
+Walks every `strategies/mdagaw/*.json` scenario at random, firing one of the
+offered transitions per turn, and compares `ScenarioFrontier.candidates()`
+with the previous per-turn rescan of all states (kept below as the
+reference): same keys, same data, same order, with fork blocking applied the
+same way. The reference only understands states nested by branch, flat
+scenarios are checked against the transitions of their visited states
+instead.
+
+    python bench_mdagaw_graph.py [n_walks]
+"""
+import json
+import random
+import sys
+import timeit
+from copy import deepcopy
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "strategies" / "mdagaw"))
+
+from graph import ScenarioGraph, scenario_frontier  # noqa: E402
+
+SCENARIO_DIR = Path(__file__).parent / "strategies" / "mdagaw"
+
+
+# ============================================================================
+# Reference (previous) implementation
+# ============================================================================
+
+def legacy_collect(scenario: dict) -> tuple[dict, dict]:
+    active_states = scenario["visited_states"]
+    all_transitions = {}
+    transition_sources = {}
+    for branch_name, branch_states in scenario["states"].items():
+        for state_name, state_data in branch_states.items():
+            if state_name not in active_states:
+                if "condition" in state_data:
+                    has_incoming = False
+                    for _, other_branch_states in scenario["states"].items():
+                        for _, other_state_data in other_branch_states.items():
+                            if "transitions" in other_state_data:
+                                if state_name in other_state_data["transitions"]:
+                                    has_incoming = True
+                                    break
+                    if not has_incoming:
+                        transition_key = f"INITIAL:{state_name}"
+                        all_transitions[transition_key] = {
+                            "condition": state_data["condition"],
+                            "type": "parallel",
+                            "shortDesc": f"Activate initial state {state_name}"
+                        }
+                        transition_sources[transition_key] = "INITIAL"
+                continue
+            if "transitions" not in state_data:
+                continue
+            for target, transition_data in state_data["transitions"].items():
+                if "isBlocked" in transition_data and transition_data["isBlocked"]:
+                    continue
+                transition_key = f"{state_name}:{target}"
+                all_transitions[transition_key] = {
+                    "condition": transition_data["condition"],
+                    "isPositive": target == "SUCCESS" or transition_data.get("isPositive", True),
+                    "type": transition_data["type"],
+                    "shortDesc": transition_data.get("shortDesc", f"Transition to {target}")
+                }
+                transition_sources[transition_key] = state_name
+    if "tstates" in scenario:
+        for terminal_state, terminal_data in scenario["tstates"].items():
+            if terminal_state not in scenario["visited_states"] and "condition" in terminal_data:
+                transition_key = f"GLOBAL:{terminal_state}"
+                all_transitions[transition_key] = {
+                    "condition": terminal_data["condition"],
+                    "isPositive": terminal_state == "SUCCESS",
+                    "shortDesc": f"Reach {terminal_state}"
+                }
+                transition_sources[transition_key] = "GLOBAL"
+    return all_transitions, transition_sources
+
+
+def legacy_fire(scenario: dict, from_state: str, target_state: str) -> None:
+    if target_state not in scenario["visited_states"]:
+        scenario["visited_states"].append(target_state)
+    if from_state in ("INITIAL", "GLOBAL"):
+        return
+    for branch_name, branch_states in scenario["states"].items():
+        if from_state in branch_states:
+            source_state = branch_states[from_state]
+            if "transitions" in source_state and target_state in source_state["transitions"]:
+                if source_state["transitions"][target_state].get("type") == "fork":
+                    for other_target in source_state["transitions"]:
+                        if other_target != target_state:
+                            source_state["transitions"][other_target]["isBlocked"] = True
+
+
+# ============================================================================
+# Random walks
+# ============================================================================
+
+def load_scenarios() -> dict[str, dict]:
+    scenarios = {}
+    for file_path in sorted(SCENARIO_DIR.glob("*.json")):
+        with open(file_path, "r") as f:
+            scenarios[file_path.stem] = json.load(f)
+    return scenarios
+
+
+def is_nested(scenario: dict) -> bool:
+    return all(isinstance(value, dict) for entry in scenario["states"].values() for value in entry.values())
+
+
+def expected_flat(scenario: dict) -> set[str]:
+    """Keys a flat scenario should offer: open arrows of visited states and unreached terminals"""
+    graph = ScenarioGraph(scenario)
+    visited = scenario["visited_states"]
+    keys = {f"INITIAL:{name}" for name in graph.initial if name not in visited}
+    for name in dict.fromkeys(visited):
+        for target, transition in graph.outgoing.get(name, ()):
+            if not transition.get("isBlocked"):
+                keys.add(f"{name}:{target}")
+    keys |= {f"GLOBAL:{name}" for name, data in graph.terminals.items() if name not in visited and "condition" in data}
+    return keys
+
+
+def walk(scenario: dict, rng: random.Random, max_turns: int = 12) -> int:
+    """One conversation; returns the number of transitions fired"""
+    legacy = deepcopy(scenario)
+    legacy["visited_states"] = ["START"]
+    session = deepcopy(scenario)
+    session["visited_states"] = ["START"]
+    nested = is_nested(scenario)
+    for turn in range(max_turns):
+        frontier = scenario_frontier(session)
+        all_transitions, transition_sources = frontier.candidates()
+        if nested:
+            ref_transitions, ref_sources = legacy_collect(legacy)
+            assert list(all_transitions.items()) == list(ref_transitions.items()), (session["name"], turn)
+            assert list(transition_sources.items()) == list(ref_sources.items()), (session["name"], turn)
+        else:
+            assert set(all_transitions) == expected_flat(session), (session["name"], turn)
+        if not all_transitions:
+            return turn
+        key = rng.choice(list(all_transitions))
+        from_state, target_state = transition_sources[key], key.split(":", 1)[1]
+        frontier.fire(from_state, target_state)
+        if nested:
+            legacy_fire(legacy, from_state, target_state)
+            assert session["visited_states"] == legacy["visited_states"], (session["name"], turn)
+        if target_state in ("SUCCESS", "FAIL"):
+            return turn + 1
+    return max_turns
+
+
+def check_equivalence(n_walks: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    for name, scenario in load_scenarios().items():
+        fired = sum(walk(scenario, rng) for _ in range(n_walks))
+        layout = "nested" if is_nested(scenario) else "flat"
+        print(f"equivalence: {name} ({layout}) {n_walks} walks, {fired} transitions ok")
+
+
+def bench() -> None:
+    rng = random.Random(1)
+    for name, scenario in load_scenarios().items():
+        if not is_nested(scenario):
+            continue
+        session = deepcopy(scenario)
+        session["visited_states"] = ["START"]
+        frontier = scenario_frontier(session)
+        # a few turns in, the shape of a typical mid-conversation check
+        for _ in range(3):
+            all_transitions, transition_sources = frontier.candidates()
+            key = rng.choice([k for k in all_transitions if not k.startswith("GLOBAL:")] or list(all_transitions))
+            frontier.fire(transition_sources[key], key.split(":", 1)[1])
+        for label, fn in [
+            ("legacy  ", lambda: legacy_collect(session)),
+            ("frontier", frontier.candidates),
+        ]:
+            seconds = min(timeit.repeat(fn, number=200, repeat=5)) / 200
+            print(f"{name} candidates {label}: {seconds * 1e6:7.1f} us/turn")
+
+
+if __name__ == "__main__":
+    check_equivalence(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
+    bench()
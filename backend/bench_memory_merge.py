@@ -0,0 +1,140 @@
+"""
+Microbenchmark and randomized equivalence check for the UserProfile merge engine.
+
+Compares `merge_profiles` / `filter_profile` against the previous deepcopy-based
+implementations (kept below as the reference) on random profiles: merged profile
+and diff must dump to the same content (list order aside, the old path ordered
+lists through set()), filter output must match exactly, and merging must be
+deterministic and leave both inputs untouched.
+
+    python bench_memory_merge.py [n_cases]
+"""
+import random
+import sys
+import timeit
+from copy import deepcopy
+from typing import Any
+
+from pydantic import BaseModel
+
+from vendors.memory import UserProfile, filter_profile, merge_profiles
+
+WORDS = ["chess", "Spain", "IELTS", "guitar", "remote", "Maria", "pilot", "cooking", "x", "a" * 120]
+
+
+# ============================================================================
+# Reference (previous) implementation
+# ============================================================================
+
+def legacy_merge(old: BaseModel, new: BaseModel) -> tuple[BaseModel, BaseModel]:
+    updated = deepcopy(old)
+    diff = type(new).model_validate({}, strict=False)
+    for key in type(new).model_fields:
+        old_value, new_value = getattr(old, key, None), getattr(new, key, None)
+        if new_value is None:
+            continue
+        if isinstance(new_value, list) and len(new_value) == 0:
+            setattr(updated, key, old_value or [])
+            continue
+        if isinstance(old_value, BaseModel) and isinstance(new_value, BaseModel):
+            _updated, _diff = legacy_merge(old_value, new_value)
+            setattr(updated, key, _updated)
+            setattr(diff, key, _diff)
+            continue
+        if isinstance(old_value, list) and isinstance(new_value, list):
+            setattr(updated, key, [ov for ov in old_value if ov not in new_value] + list(set(new_value)))
+            setattr(diff, key, list(set(new_value) - set(old_value)))
+            continue
+        setattr(updated, key, new_value)
+        setattr(diff, key, new_value if (new_value != old_value) else None)
+    return updated, diff
+
+
+def legacy_filter(profile: BaseModel, min_len: int, max_len: int, k_last: int | None) -> BaseModel:
+    out = deepcopy(profile)
+
+    def _filter_value(value: Any) -> Any:
+        if isinstance(value, list):
+            value = [v for v in value if min_len <= len(str(v)) <= max_len]
+            return value[-k_last:] if k_last else value
+        return value if min_len <= len(str(value)) <= max_len else None
+
+    def _filter(x: BaseModel) -> BaseModel:
+        for field in type(x).model_fields:
+            value = getattr(x, field)
+            setattr(x, field, _filter(value) if isinstance(value, BaseModel) else _filter_value(value))
+        return x
+
+    return _filter(out)
+
+
+# ============================================================================
+# Random profiles
+# ============================================================================
+
+def random_profile(rng: random.Random, density: float) -> UserProfile:
+    def _fill(cls: type[BaseModel]) -> dict:
+        data = {}
+        for name, field in cls.model_fields.items():
+            annotation = field.annotation
+            if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+                data[name] = _fill(annotation)
+            elif rng.random() > density:
+                continue
+            elif "list" in str(annotation):
+                data[name] = [rng.choice(WORDS) for _ in range(rng.randint(0, 6))]
+            elif "bool" in str(annotation):
+                data[name] = rng.random() < 0.5
+            elif "Literal" in str(annotation):
+                data[name] = None
+            else:
+                data[name] = rng.choice(WORDS)
+        return data
+
+    return UserProfile.model_validate(_fill(UserProfile))
+
+
+def normalized(dumped: Any) -> Any:
+    if isinstance(dumped, dict):
+        return {k: normalized(v) for k, v in dumped.items()}
+    if isinstance(dumped, list):
+        return sorted(dumped)
+    return dumped
+
+
+def check_equivalence(n_cases: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    for _ in range(n_cases):
+        old = random_profile(rng, density=0.6)
+        new = random_profile(rng, density=0.4)
+        old_dump, new_dump = old.dump(), new.dump()
+
+        merged, diff = merge_profiles(old, new)
+        ref_merged, ref_diff = legacy_merge(old, new)
+        assert normalized(merged.dump()) == normalized(ref_merged.dump()), (old_dump, new_dump)
+        assert normalized(diff.dump()) == normalized(ref_diff.dump()), (old_dump, new_dump)
+        assert merge_profiles(old, new)[0].dump() == merged.dump(), "merge is not deterministic"
+        assert old.dump() == old_dump and new.dump() == new_dump, "merge mutated its inputs"
+
+        args = (1, 100, 5)
+        assert filter_profile(old, *args).dump() == legacy_filter(old, *args).dump()
+        assert old.dump() == old_dump, "filter mutated its input"
+    print(f"equivalence: {n_cases} random cases ok")
+
+
+def bench() -> None:
+    rng = random.Random(1)
+    pairs = [(random_profile(rng, 0.8), random_profile(rng, 0.3)) for _ in range(200)]
+    for name, fn in [
+        ("merge  legacy", lambda: [legacy_merge(o, n) for o, n in pairs]),
+        ("merge  engine", lambda: [merge_profiles(o, n) for o, n in pairs]),
+        ("filter legacy", lambda: [legacy_filter(o, 1, 100, 5) for o, _ in pairs]),
+        ("filter engine", lambda: [filter_profile(o, 1, 100, 5) for o, _ in pairs]),
+    ]:
+        seconds = min(timeit.repeat(fn, number=5, repeat=3)) / (5 * len(pairs))
+        print(f"{name}: {seconds * 1e6:7.1f} us/profile")
+
+
+if __name__ == "__main__":
+    check_equivalence(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    bench()
@@ -0,0 +1,72 @@
+"""
+Check of the write-behind persistence of UpdatableMemoryJSON against a slow
+in-memory S3: marks on an unchanged profile upload nothing, quick changes
+coalesce into one upload, a change landing while an upload is in flight is
+saved by a follow-up upload (not only at close), and aclose flushes the
+last change.
+
+    python bench_memory_save.py
+"""
+import asyncio
+from typing import Any
+
+from vendors.memory import UpdatableMemoryJSON
+
+DEBOUNCE = 0.05
+UPLOAD_SECONDS = 0.1
+
+
+class SlowS3:
+    def __init__(self, data: dict[str, Any]):
+        self.data = data
+        self.n_uploads = 0
+        self.uploading = asyncio.Event()
+
+    async def load_file(self, path: str) -> Any:
+        return self.data.get(path)
+
+    async def save_file(self, path: str, data: Any) -> bool:
+        self.n_uploads += 1
+        self.uploading.set()
+        await asyncio.sleep(UPLOAD_SECONDS)
+        self.data[path] = data
+        self.uploading.clear()
+        return True
+
+
+async def main() -> None:
+    s3 = SlowS3({"memory/u.json": {"name": "Maria"}})
+    memory = UpdatableMemoryJSON("u", s3, llmapi=None, save_debounce=DEBOUNCE)  # type: ignore[arg-type]
+    await memory.load_memory()
+    assert memory._memory is not None
+
+    for _ in range(5):
+        memory._mark_dirty()
+    await asyncio.sleep(DEBOUNCE + UPLOAD_SECONDS * 2)
+    assert s3.n_uploads == 0, "unchanged profile was uploaded"
+
+    for i in range(5):
+        memory._memory.general_notes = memory._memory.general_notes + [f"note {i}"]
+        memory._mark_dirty()
+    await asyncio.sleep(DEBOUNCE + UPLOAD_SECONDS * 2)
+    assert s3.n_uploads == 1, f"quick changes were not coalesced: {s3.n_uploads} uploads"
+
+    memory._memory.name = "Anna"
+    memory._mark_dirty()
+    await s3.uploading.wait()
+    memory._memory.name = "Olga"  # lands while the upload is in flight
+    memory._mark_dirty()
+    await asyncio.sleep(DEBOUNCE + UPLOAD_SECONDS * 3)
+    assert s3.n_uploads == 3, f"change during upload not saved: {s3.n_uploads} uploads"
+    assert s3.data["memory/u.json"]["name"] == "Olga" and not memory._dirty
+
+    memory._memory.name = "Vera"
+    memory._mark_dirty()
+    await memory.aclose()
+    assert s3.data["memory/u.json"]["name"] == "Vera", "aclose did not flush"
+    assert memory._debounced_save is None or memory._debounced_save.done()
+    print(f"save: ok ({s3.n_uploads} uploads)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
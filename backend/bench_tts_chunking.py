@@ -0,0 +1,116 @@
+"""
+Time-to-first-audio benchmark for the non-streaming TTS chunking.
+
+Feeds typical 5-15 word replies through a fake LLM token stream into
+a fake TTS whose response time follows a simple latency model, once with
+SingleSentenceTokenizer (whole reply in one request) and once with
+AdaptiveChunkTokenizer + PipelinedStreamAdapter, and reports how long
+it takes until the first audio frame and until the last one.
+
+    python bench_tts_chunking.py [runs]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from livekit.agents import tts, utils
+
+os.environ.setdefault("ELEVEN_API_KEY", "bench")
+
+from tts import AdaptiveChunkTokenizer, PipelinedStreamAdapter, SingleSentenceTokenizer  # noqa: E402
+
+
+SAMPLE_RATE = 24000
+FRAME_SAMPLES = SAMPLE_RATE // 50
+TOKEN_INTERVAL = 0.025  # ~40 tokens/s from the LLM
+# Latency model for one non-streaming request: fixed round trip plus generation
+# time growing with the text length, audio itself lasts ~60 ms per character
+TTS_BASE_LATENCY = 0.25
+TTS_LATENCY_PER_CHAR = 0.003
+AUDIO_SECONDS_PER_CHAR = 0.06
+
+REPLIES = [
+    "Wow, that's honestly a bold opening.",
+    "Okay, I'll bite. What's the plan for tonight?",
+    "Hmm, maybe. Tell me something I don't already know about you.",
+    "No, I really don't think so, but nice try anyway.",
+    "You know what, fine. Coffee, thirty minutes, and you're paying.",
+    "Listen, I appreciate the effort, I really do, but I'm waiting for someone.",
+]
+
+
+class _ModelChunkedStream(tts.ChunkedStream):
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        text = self._input_text
+        await asyncio.sleep(TTS_BASE_LATENCY + TTS_LATENCY_PER_CHAR * len(text))
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
+            sample_rate=SAMPLE_RATE,
+            num_channels=1,
+            mime_type="audio/pcm",
+            frame_size_ms=20,
+        )
+        n_frames = max(1, int(len(text) * AUDIO_SECONDS_PER_CHAR * 50))
+        output_emitter.push(bytes(FRAME_SAMPLES * 2 * n_frames))
+        output_emitter.flush()
+
+
+class _ModelTTS(tts.TTS):
+    def __init__(self):
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=SAMPLE_RATE,
+            num_channels=1,
+        )
+
+    def synthesize(self, text: str, *, conn_options=tts.tts.DEFAULT_API_CONNECT_OPTIONS) -> tts.ChunkedStream:
+        return _ModelChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+async def _measure(adapter: tts.StreamAdapter, reply: str) -> tuple[float, float]:
+    t0 = time.perf_counter()
+    first_audio = None
+    # playout clock: a frame can't start before the previous one has finished playing
+    playout_end = t0
+    async with adapter.stream() as stream:
+        async def _llm():
+            for word in reply.split():
+                stream.push_text(word + " ")
+                await asyncio.sleep(TOKEN_INTERVAL)
+            stream.end_input()
+
+        llm_task = asyncio.create_task(_llm())
+        async for ev in stream:
+            now = time.perf_counter()
+            if first_audio is None:
+                first_audio = now - t0
+            playout_end = max(playout_end, now) + ev.frame.duration
+        await llm_task
+    return first_audio, playout_end - t0
+
+
+async def main(runs: int) -> None:
+    modes = {
+        "single": lambda: tts.StreamAdapter(tts=_ModelTTS(), sentence_tokenizer=SingleSentenceTokenizer()),
+        "adaptive": lambda: PipelinedStreamAdapter(tts=_ModelTTS(), sentence_tokenizer=AdaptiveChunkTokenizer()),
+    }
+    for reply in REPLIES:
+        results = {}
+        for name, make_adapter in modes.items():
+            samples = [await _measure(make_adapter(), reply) for _ in range(runs)]
+            results[name] = (
+                statistics.median(s[0] for s in samples),
+                statistics.median(s[1] for s in samples),
+            )
+        (single_first, single_end), (adaptive_first, adaptive_end) = results["single"], results["adaptive"]
+        print(
+            f"{len(reply.split()):>2} words  first audio {single_first * 1000:4.0f} -> {adaptive_first * 1000:4.0f} ms  "
+            f"playout end {single_end:.2f} -> {adaptive_end:.2f} s  "
+            f"chunks={AdaptiveChunkTokenizer().tokenize(reply)}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3))
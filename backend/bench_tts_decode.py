@@ -0,0 +1,135 @@
+"""
+Event-loop lag benchmark for ExtendedChunkedStream decoding.
+
+Runs N concurrent synth streams against a local fake ElevenLabs /stream
+endpoint and measures how late a 5 ms ticker wakes up on the same loop,
+once with mp3 (decoded by the AudioEmitter's AudioStreamDecoder) and once
+with raw pcm (sliced into frames by the AudioEmitter, no decoder).
+
+    python bench_tts_decode.py [N ...]
+"""
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+
+import aiohttp
+import av
+import numpy as np
+from aiohttp import web
+
+os.environ.setdefault("ELEVEN_API_KEY", "bench")
+
+from tts import StreamingFalseNextTextTTS  # noqa: E402
+
+
+SAMPLE_RATE = 22050
+AUDIO_SECONDS = 4.0
+CHUNK_BYTES = 4096
+CHUNK_INTERVAL = 0.005  # server pacing, ElevenLabs streams faster than real time
+TICK_SECONDS = 0.005
+
+
+def _sine_pcm(seconds: float, sample_rate: int) -> np.ndarray:
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    return (np.sin(2 * np.pi * 220 * t) * 8000).astype(np.int16)
+
+
+def _encode_mp3(samples: np.ndarray, sample_rate: int) -> bytes:
+    buf = io.BytesIO()
+    container = av.open(buf, "w", format="mp3")
+    stream = container.add_stream("mp3", rate=sample_rate)
+    stream.layout = "mono"
+    frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format="s16", layout="mono")
+    frame.sample_rate = sample_rate
+    for packet in stream.encode(frame):
+        container.mux(packet)
+    for packet in stream.encode(None):
+        container.mux(packet)
+    container.close()
+    return buf.getvalue()
+
+
+async def _serve(bodies: dict[str, bytes]) -> web.AppRunner:
+    async def handler(request: web.Request) -> web.StreamResponse:
+        encoding = request.query["output_format"].split("_")[0]
+        resp = web.StreamResponse(headers={"Content-Type": f"audio/{encoding}"})
+        await resp.prepare(request)
+        body = bodies[encoding]
+        for i in range(0, len(body), CHUNK_BYTES):
+            await resp.write(body[i:i + CHUNK_BYTES])
+            await asyncio.sleep(CHUNK_INTERVAL)
+        await resp.write_eof()
+        return resp
+
+    app = web.Application()
+    app.router.add_post("/v1/text-to-speech/{voice_id}/stream", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 8766).start()
+    return runner
+
+
+async def _measure(encoding: str, n_streams: int, session: aiohttp.ClientSession) -> dict:
+    tts = StreamingFalseNextTextTTS(
+        encoding=encoding,
+        base_url="http://127.0.0.1:8766/v1",
+        http_session=session,
+    )
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(time.perf_counter() - t0 - TICK_SECONDS)
+
+    async def synth():
+        frames = 0
+        async for _ in tts.synthesize("benchmark"):
+            frames += 1
+        return frames
+
+    tick_task = asyncio.create_task(ticker())
+    t0 = time.perf_counter()
+    frames = await asyncio.gather(*(synth() for _ in range(n_streams)))
+    elapsed = time.perf_counter() - t0
+    done.set()
+    await tick_task
+
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    return {
+        "encoding": encoding,
+        "streams": n_streams,
+        "frames": sum(frames),
+        "wall_s": elapsed,
+        "lag_p50_ms": statistics.median(lags_ms),
+        "lag_p99_ms": lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))],
+        "lag_max_ms": lags_ms[-1],
+    }
+
+
+async def main(stream_counts: list[int]) -> None:
+    samples = _sine_pcm(AUDIO_SECONDS, SAMPLE_RATE)
+    bodies = {"mp3": _encode_mp3(samples, SAMPLE_RATE), "pcm": samples.tobytes()}
+    runner = await _serve(bodies)
+    try:
+        async with aiohttp.ClientSession() as session:
+            for n_streams in stream_counts:
+                for encoding in (f"mp3_{SAMPLE_RATE}_32", f"pcm_{SAMPLE_RATE}"):
+                    r = await _measure(encoding, n_streams, session)
+                    print(
+                        f"{r['encoding']:>14} N={r['streams']:<3} frames={r['frames']:<6} "
+                        f"wall={r['wall_s']:.2f}s lag p50={r['lag_p50_ms']:.2f}ms "
+                        f"p99={r['lag_p99_ms']:.2f}ms max={r['lag_max_ms']:.2f}ms"
+                    )
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [1, 8, 32]
+    asyncio.run(main(counts))
@@ -21,7 +21,10 @@ from livekit.plugins import deepgram, elevenlabs, noise_cancellation, openai, si
 
 import emoji
 
+from scoring import AudioScoringPipeline, TappedVAD
 from silence import setup_say_on_silence
+from speculative import SpeculativeEnding
+from tts import AdaptiveTTSPolicy, CachedTTS, TTSTelemetry, tts_http_pool, tts_phrase_cache
 
 import checker as finesse_checker
 import hint as finesse_hint
@@ -90,13 +93,25 @@ class FinesseTutor(agents.Agent):
         self.session._last_checker = None
         self.session._hints = []
         self.session._checker = []
+        self.session._speculative_ending = SpeculativeEnding(self.session, self.ending_instructions())
         roleplay, script = self.split_opening(self.userdata.scenario_data["opening"])
         self.session.history.add_message(role="user", content=roleplay)
-        self.session.say(text=script, allow_interruptions=False, add_to_chat_ctx=True)
+        # the opening is the same for every session of a scenario, synthesize() serves it from the phrase cache
+        self.session.say(
+            text=script,
+            audio=self.synthesize_frames(script),
+            allow_interruptions=False,
+            add_to_chat_ctx=True,
+        )
+
+    async def synthesize_frames(self, text: str):
+        async with self.session.tts.synthesize(text) as stream:
+            async for ev in stream:
+                yield ev.frame
     
     async def on_user_turn_completed(self, turn_ctx: agents.ChatContext, new_message: agents.ChatMessage):
         logger.info("on_user_turn_completed")
-        await self.early_termination()
+        await self.early_termination(new_message)
     
     @retry(stop=stop_after_attempt(3))
     async def make_rpc_call(self, method, payload):
@@ -109,34 +124,50 @@ class FinesseTutor(agents.Agent):
                 payload=payload,
             )
     
-    async def early_termination(self):
+    def ending_instructions(self) -> dict[str, str]:
+        goal = self.userdata.scenario_data["goal"]
+        return {
+            "good": (
+                f"The dialogue has naturally progressed to a point where {goal} feels successfully addressed. "
+                f"Conclude the conversation with a strong, in-character statement that reflects your persona's "
+                f"unique perspective on this positive resolution. Make it a memorable final line, true to your "
+                f"character and the preceding interaction."
+            ),
+            "bad": (
+                f"The dialogue has unfortunately not led to achieving {goal}, or has reached a clear negative turning point. "
+                f"Deliver a final, impactful in-character statement that authentically expresses your persona's reaction to this unfavorable outcome. "
+                f"This should be a powerful line that is true to your character and the situation."
+            ),
+        }
+    
+    async def say_ending(self, kind: str, new_message: agents.ChatMessage | None = None):
+        # Prepared in the background by SpeculativeEnding when the checker saw this coming,
+        # only used if it was written after the user message that triggered the ending
+        prepared = await self.session._speculative_ending.take(kind, new_message)
+        if prepared is not None and prepared.frames:
+            await self.session.say(
+                prepared.text,
+                audio=prepared.audio(),
+                allow_interruptions=False,
+                add_to_chat_ctx=True,
+            ).wait_for_playout()
+        else:
+            await self.session.generate_reply(
+                instructions=self.ending_instructions()[kind],
+                allow_interruptions=False,
+            ).wait_for_playout()
+    
+    async def early_termination(self, new_message: agents.ChatMessage | None = None):
         logger.info(f"early_termination: {self.session._last_checker}")
         if self.session._last_checker is not None:
             if self.session._last_checker["is_goal_complete"]:
                 logger.info("Good ending")
-                goal = self.userdata.scenario_data["goal"]
-                await self.session.generate_reply(
-                    instructions=(
-                        f"The dialogue has naturally progressed to a point where {goal} feels successfully addressed. "
-                        f"Conclude the conversation with a strong, in-character statement that reflects your persona's "
-                        f"unique perspective on this positive resolution. Make it a memorable final line, true to your "
-                        f"character and the preceding interaction."
-                    ),
-                    allow_interruptions=False,
-                ).wait_for_playout()
+                await self.say_ending("good", new_message)
                 payload = {"message": "Congratulations! You have successfully completed the goal."}
                 await self.make_rpc_call(method="end_conversation", payload=json.dumps(payload))
             elif self.session._last_checker["is_bad_ending_triggered"]:
                 logger.info("Bad ending")
-                goal = self.userdata.scenario_data["goal"]
-                await self.session.generate_reply(
-                    instructions=(
-                        f"The dialogue has unfortunately not led to achieving {goal}, or has reached a clear negative turning point. "
-                        f"Deliver a final, impactful in-character statement that authentically expresses your persona's reaction to this unfavorable outcome. "
-                        f"This should be a powerful line that is true to your character and the situation."
-                    ),
-                    allow_interruptions=False,
-                ).wait_for_playout()
+                await self.say_ending("bad", new_message)
                 payload = {"message": "Unfortunately, the conversation has reached a bad ending. Please try again."}
                 await self.make_rpc_call(method="end_conversation", payload=json.dumps(payload))
     
@@ -181,6 +212,16 @@ async def entrypoint(ctx: agents.JobContext):
     mode = os.getenv("LIVEKIT_MODE")
     logger.info(f"Starting entrypoint with room_name: {room_name} and mode: {mode}")
 
+    # open the ElevenLabs connection while the room connects and the user joins;
+    # the pool outlives the job and is closed at process exit
+    tts_warmup_task = asyncio.create_task(tts_http_pool.warmup(os.getenv("ELEVENLABS_API_KEY")))
+
+    async def _cancel_tts_warmup():
+        tts_warmup_task.cancel()
+        await asyncio.gather(tts_warmup_task, return_exceptions=True)
+
+    ctx.add_shutdown_callback(_cancel_tts_warmup)
+
     await ctx.connect(auto_subscribe=agents.AutoSubscribe.AUDIO_ONLY)
     if mode != "console":
         await ctx.wait_for_participant()
@@ -233,13 +274,20 @@ async def entrypoint(ctx: agents.JobContext):
             model="gpt-4.1",
             api_key=os.getenv("OPENAI_API_KEY"),
         ),
-        "tts": elevenlabs.TTS(
-            voice_id=scenario_data['elevenlabs_voice_id'],
-            encoding="mp3_44100_96",
-            model="eleven_turbo_v2_5",
-            api_key=os.getenv("ELEVENLABS_API_KEY"),
+        "tts": CachedTTS(
+            elevenlabs.TTS(
+                voice_id=scenario_data['elevenlabs_voice_id'],
+                encoding="mp3_44100_96",
+                model="eleven_turbo_v2_5",
+                api_key=os.getenv("ELEVENLABS_API_KEY"),
+                http_session=tts_http_pool.session(),
+            ),
+            cache=tts_phrase_cache,
+            # long enough for scenario openings
+            max_phrase_chars=600,
         ),
-        "vad": silero.VAD.load(),
+        # the audio scoring pipeline reuses this VAD's end-of-speech events
+        "vad": TappedVAD(silero.VAD.load()),
         "allow_interruptions": True,
         "min_interruption_duration": 0.5,
         "min_endpointing_delay": 0.5,
@@ -248,6 +296,31 @@ async def entrypoint(ctx: agents.JobContext):
     }
     session = agents.AgentSession[SessionInfo](**agent_session_kwargs)
 
+    tts_telemetry = TTSTelemetry()
+    tts_telemetry.attach(agent_session_kwargs["tts"])
+    tts_policy = AdaptiveTTSPolicy(agent_session_kwargs["tts"], tts_telemetry)
+
+    async def _report_tts_telemetry():
+        key = tts_telemetry.key_for(agent_session_kwargs["tts"])
+        logger.info(f"TTS telemetry {key}: {tts_telemetry.stats(key)}, downgrades: {tts_policy.downgrades}")
+        logger.info(f"TTS phrase cache: {tts_phrase_cache.stats()}")
+        if mode == "console" or not (os.getenv("GRAFANA_URL") and os.getenv("GRAFANA_API_KEY")):
+            return
+        from vendors import Grafana
+        grafana = Grafana(
+            attributes={"room": room_name, "skill": skill, "scenario": scenario_name},
+            api_key=os.getenv("GRAFANA_API_KEY"),
+            url=os.getenv("GRAFANA_URL"),
+            mode=mode,
+        )
+        tts_telemetry.report(grafana)
+        agent_session_kwargs["tts"].report(grafana)
+        for step in tts_policy.downgrades:
+            grafana.add("tts_downgrade", "enum", json.dumps(step, sort_keys=True))
+        await grafana.push()
+
+    ctx.add_shutdown_callback(_report_tts_telemetry)
+
     setup_say_on_silence(ctx, session)
     @session.on("user_state_changed")
     def _on_user_state_changed(ev: agents.UserStateChangedEvent):
@@ -256,6 +329,12 @@ async def entrypoint(ctx: agents.JobContext):
     @session.on("agent_state_changed")
     def _on_agent_state_changed(ev: agents.AgentStateChangedEvent):
         logger.info(f"Agent state changed: {ev.old_state} -> {ev.new_state}")
+
+    @session.on("user_input_transcribed")
+    def _on_user_input_transcribed(ev: agents.UserInputTranscribedEvent):
+        # lets a likely ending be written for what the user is saying, before end of turn
+        if ev.is_final and ev.transcript:
+            session._speculative_ending.on_user_transcript(ev.transcript)
     
     @ctx.room.local_participant.register_rpc_method("postanalyzer")
     async def handle_postanalyzer(payload: dict):
@@ -300,6 +379,8 @@ async def entrypoint(ctx: agents.JobContext):
     @session.on("conversation_item_added")
     def on_conversation_item_added(event: agents.ConversationItemAddedEvent):
         logger.info(f"Conversation item added from {event.item.role}: {event.item.text_content}")
+        if event.item.role == 'user':
+            session._speculative_ending.on_user_message()
         if event.item.role == 'assistant':
             n_user_messages = len([e for e in session._chat_ctx.items if (e.type == 'message' and e.role == 'user')])
             is_agent_message = event.item.type == 'message' and event.item.role == 'assistant'
@@ -321,6 +402,7 @@ async def entrypoint(ctx: agents.JobContext):
                     )
                     session._last_checker = checker_result
                     session._checker.append(checker_result)
+                    session._speculative_ending.on_checker(checker_result, len(session._checker) - 1)
                     await agent.make_rpc_call(method="checker", payload=json.dumps(checker_result))
                 except Exception as e:
                     logger.error(f"Error getting checker result: {e}")
@@ -335,6 +417,25 @@ async def entrypoint(ctx: agents.JobContext):
     }
     await session.start(**session_start_kwargs)
 
+    async def _drop_speculative_ending():
+        await session._speculative_ending.aclose()
+
+    ctx.add_shutdown_callback(_drop_speculative_ending)
+
+    # pronunciation / delivery scoring runs alongside the conversation
+    if mode != "console" and os.getenv("ENGINE_URL_PREFIX") and os.getenv("ENGINE_API_KEY"):
+        from vendors import Engine
+        audio_scoring = AudioScoringPipeline(
+            Engine(os.getenv("ENGINE_URL_PREFIX"), os.getenv("ENGINE_API_KEY")),
+            agent_session_kwargs["vad"],
+            user_id=userdata.userid,
+            session_id=room_name,
+            codec=os.getenv("ENGINE_AUDIO_CODEC", "flac"),
+        )
+        audio_scoring.start()
+        session._audio_scoring = audio_scoring
+        ctx.add_shutdown_callback(audio_scoring.aclose)
+
 
 def run_livekit_worker(mode):
     assert mode in ["dev", "start", "console"]
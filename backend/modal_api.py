@@ -15,14 +15,21 @@ project_root = backend_dir.parent
 # Build image with all necessary files
 image = (
     modal.Image.debian_slim()
-    .pip_install("aiohttp", "pydantic", "fastapi[standard]")
+    .pip_install("aiohttp", "pydantic", "fastapi[standard]", "pillow")
+    .env({"SCENARIO_CACHE_DIR": "/scenario_cache"})
+    # Resize portraits to small WebP + base64 once, at image build time
+    .add_local_file(backend_dir / "photo_assets.py", "/root/photo_assets.py", copy=True)
+    .add_local_dir(project_root / "frontend/public/photos", "/photos", copy=True)
+    .run_commands("python /root/photo_assets.py /photos /photo_assets")
     .add_local_file(backend_dir / "scenario_selector.py", "/root/scenario_selector.py")
     .add_local_dir(project_root / "scenarios", "/scenarios")
-    .add_local_dir(project_root / "frontend/public/photos", "/photos")
 )
 
 app = modal.App("finesse-scenario-selector", image=image)
 
+# Generated custom scenario sets survive container restarts on this volume
+scenario_cache_volume = modal.Volume.from_name("finesse-scenario-cache", create_if_missing=True)
+
 # Secret
 if modal.is_local():
     api_key = os.getenv("FOPENAI_API_KEY", "")
@@ -31,50 +38,148 @@ else:
     local_secret = modal.Secret.from_dict({})
 
 
-@app.function(secrets=[local_secret], timeout=300)
-@modal.fastapi_endpoint(method="POST")
-async def get_scenarios(data: dict):
-    """POST /get_scenarios - Returns 3 scenarios with base64 images"""
-    import os
-    import base64
-    from pathlib import Path
-    from scenario_selector import select_or_generate_scenarios
-    
-    chat_history = data.get("chat_history", [])
-    api_key = os.getenv("FOPENAI_API_KEY")
+# Warm pool sizing: one container always up, each serving many concurrent requests
+# (handlers are I/O bound, mostly waiting on OpenAI)
+MIN_CONTAINERS = 1
+MAX_CONCURRENT_INPUTS = 32
+SCALEDOWN_WINDOW = 600
+
+
+@app.cls(
+    secrets=[local_secret],
+    timeout=300,
+    volumes={"/scenario_cache": scenario_cache_volume},
+    enable_memory_snapshot=True,
+    min_containers=MIN_CONTAINERS,
+    scaledown_window=SCALEDOWN_WINDOW,
+)
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
+class ScenarioSelector:
+    @modal.enter(snap=True)
+    def load(self):
+        """Import and parse everything static so it is captured in the memory snapshot"""
+        from photo_assets import PhotoAssetStore
+        from scenario_selector import preload_scenario_catalog
+        
+        preload_scenario_catalog()
+        self.photo_store = PhotoAssetStore(Path("/photo_assets"))
+        self.photo_store.load()
     
-    result = await select_or_generate_scenarios(
-        chat_history=chat_history,
-        openai_api_key=api_key,
-        generate_images=False  # Don't generate images for custom scenarios
-    )
+    @modal.enter(snap=False)
+    def connect(self):
+        """Per-container state that must not be snapshotted (secrets, sockets)"""
+        from scenario_selector import OpenAIClient, scenario_cache
+        
+        self.openai_client = OpenAIClient(os.getenv("FOPENAI_API_KEY"))
+        # Other containers write to the same volume: reload before reads, commit after writes
+        scenario_cache.volume = scenario_cache_volume
     
-    # For custom skills, extract skill name from scenarios
-    skill_name = result.skill
-    if result.is_custom and result.scenarios:
-        # Get skill name from first scenario
-        first_scenario = next(iter(result.scenarios.values()))
-        skill_name = first_scenario.skill
+    @modal.exit()
+    async def disconnect(self):
+        await self.openai_client.close()
     
-    scenarios_list = []
-    for scenario_id, scenario_data in result.scenarios.items():
+    def _scenario_payload(self, skill: str, is_custom: bool, scenario_id: str, scenario_data) -> dict:
         scenario_dict = scenario_data.model_dump()
         scenario_dict["id"] = scenario_id
         
-        if result.is_custom:
-            scenario_dict["image_base64"] = None
-        else:
+        asset = None if is_custom else self.photo_store.get(skill, scenario_id)
+        scenario_dict["image_base64"] = asset.image_base64 if asset else None
+        scenario_dict["image_mime"] = asset.mime if asset else None
+        return scenario_dict
+    
+    # label keeps the public URL of the former function endpoint
+    @modal.fastapi_endpoint(method="POST", label="finesse-scenario-selector-get-scenarios")
+    async def get_scenarios(self, data: dict):
+        """POST /get_scenarios - Returns 3 scenarios with base64 images"""
+        from scenario_selector import select_or_generate_scenarios
+        
+        chat_history = data.get("chat_history", [])
+        
+        result = await select_or_generate_scenarios(
+            chat_history=chat_history,
+            generate_images=False,  # Don't generate images for custom scenarios
+            openai_client=self.openai_client
+        )
+        
+        # For custom skills, extract skill name from scenarios
+        skill_name = result.skill
+        if result.is_custom and result.scenarios:
+            # Get skill name from first scenario
+            first_scenario = next(iter(result.scenarios.values()))
+            skill_name = first_scenario.skill
+        
+        scenarios_list = [
+            self._scenario_payload(result.skill, result.is_custom, scenario_id, scenario_data)
+            for scenario_id, scenario_data in result.scenarios.items()
+        ]
+        
+        return {
+            "skill": skill_name,
+            "is_custom": result.is_custom,
+            "scenarios": scenarios_list,
+            # pass back to /flag_scenarios to evict a low-quality custom set
+            "cache_key": result.cache_key
+        }
+    
+    @modal.fastapi_endpoint(method="POST", label="finesse-scenario-selector-get-scenarios-stream")
+    async def get_scenarios_stream(self, data: dict):
+        """
+        POST /get_scenarios_stream - Same as get_scenarios, as NDJSON:
+        one {"type": "scenario", ...} line per scenario as soon as it is ready
+        (custom scenarios are forwarded while the rest are still generating),
+        then a final {"type": "done", "skill": ..., "is_custom": ..., "cache_key": ...} line.
+        """
+        import asyncio
+        import json
+        from fastapi.responses import StreamingResponse
+        from scenario_selector import select_or_generate_scenarios
+        
+        chat_history = data.get("chat_history", [])
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def on_scenario_ready(scenario_id, scenario_data):
+            # Catalog scenarios carry their skill name; custom ones simply find no photo
+            payload = self._scenario_payload(scenario_data.skill, False, scenario_id, scenario_data)
+            await queue.put({"type": "scenario", "scenario": payload})
+        
+        async def run():
             try:
-                img_path = Path(f"/photos/{result.skill}/{scenario_id}.png")
-                with open(img_path, 'rb') as f:
-                    scenario_dict["image_base64"] = base64.b64encode(f.read()).decode('utf-8')
-            except:
-                scenario_dict["image_base64"] = None
+                result = await select_or_generate_scenarios(
+                    chat_history=chat_history,
+                    generate_images=False,
+                    openai_client=self.openai_client,
+                    on_scenario_ready=on_scenario_ready
+                )
+                skill_name = result.skill
+                if result.is_custom and result.scenarios:
+                    skill_name = next(iter(result.scenarios.values())).skill
+                await queue.put({
+                    "type": "done",
+                    "skill": skill_name,
+                    "is_custom": result.is_custom,
+                    "cache_key": result.cache_key
+                })
+            except Exception as e:
+                await queue.put({"type": "error", "error": str(e)})
         
-        scenarios_list.append(scenario_dict)
+        async def lines():
+            task = asyncio.create_task(run())
+            try:
+                while True:
+                    item = await queue.get()
+                    yield json.dumps(item) + "\n"
+                    if item["type"] != "scenario":
+                        break
+            finally:
+                task.cancel()
+        
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
     
-    return {
-        "skill": skill_name,
-        "is_custom": result.is_custom,
-        "scenarios": scenarios_list
-    }
+    @modal.fastapi_endpoint(method="POST", label="finesse-scenario-selector-flag-scenarios")
+    async def flag_scenarios(self, data: dict):
+        """POST /flag_scenarios - Evicts a low-quality cached custom set by the cache_key get_scenarios returned"""
+        from scenario_selector import scenario_cache
+        
+        cache_key = data.get("cache_key")
+        flagged = bool(cache_key) and await scenario_cache.flag(cache_key)
+        return {"flagged": flagged}
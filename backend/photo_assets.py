@@ -0,0 +1,135 @@
+"""
+Scenario Photo Assets
+Build step that turns the full-size scenario portraits into small WebP variants
+with precomputed base64 payloads, and the runtime loader that keeps them in memory.
+
+Build (runs once inside the Modal image build):
+    python photo_assets.py <photos_dir> <assets_dir>
+"""
+
+import base64
+import hashlib
+import json
+import sys
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+# Cards render at ~256px height, 512px width keeps them sharp on retina screens
+PHOTO_MAX_WIDTH = 512
+PHOTO_WEBP_QUALITY = 80
+MANIFEST_NAME = "manifest.json"
+
+
+# ============================================================================
+# Models
+# ============================================================================
+
+class PhotoAsset(BaseModel):
+    """One prebuilt scenario portrait"""
+    skill: str
+    scenario_id: str
+    mime: str
+    content_hash: str  # sha256 prefix of the encoded variant, usable for cache-busting URLs
+    width: int
+    height: int
+    size_bytes: int
+    image_base64: str
+
+
+# ============================================================================
+# Build
+# ============================================================================
+
+def build_photo_asset(
+    src_path: Path,
+    skill: str,
+    max_width: int = PHOTO_MAX_WIDTH,
+    quality: int = PHOTO_WEBP_QUALITY
+) -> PhotoAsset:
+    """Resize one PNG portrait and encode it as WebP"""
+    from PIL import Image
+
+    with Image.open(src_path) as img:
+        img = img.convert("RGB")
+        if img.width > max_width:
+            height = round(img.height * max_width / img.width)
+            img = img.resize((max_width, height), Image.Resampling.LANCZOS)
+        buf = BytesIO()
+        img.save(buf, format="WEBP", quality=quality, method=6)
+        width, height = img.size
+
+    data = buf.getvalue()
+    return PhotoAsset(
+        skill=skill,
+        scenario_id=src_path.stem,
+        mime="image/webp",
+        content_hash=hashlib.sha256(data).hexdigest()[:16],
+        width=width,
+        height=height,
+        size_bytes=len(data),
+        image_base64=base64.b64encode(data).decode("utf-8")
+    )
+
+
+def build_photo_assets(photos_dir: Path, assets_dir: Path) -> list[PhotoAsset]:
+    """
+    Build WebP variants for every /{skill}/{scenario_id}.png under photos_dir.
+
+    Writes {skill}/{scenario_id}.{content_hash}.webp files plus a manifest.json
+    holding every asset (with its base64 payload) to assets_dir.
+    """
+    assets = []
+    for src_path in sorted(photos_dir.glob("*/*.png")):
+        skill = src_path.parent.name
+        asset = build_photo_asset(src_path, skill)
+        out_path = assets_dir / skill / f"{asset.scenario_id}.{asset.content_hash}.webp"
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_bytes(base64.b64decode(asset.image_base64))
+        assets.append(asset)
+
+    manifest = [asset.model_dump() for asset in assets]
+    (assets_dir / MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+    return assets
+
+
+# ============================================================================
+# Runtime
+# ============================================================================
+
+class PhotoAssetStore:
+    """In-memory index of prebuilt photo assets, loaded once per process"""
+
+    def __init__(self, assets_dir: Path):
+        self.assets_dir = assets_dir
+        self._assets: Optional[dict[tuple[str, str], PhotoAsset]] = None
+
+    def load(self) -> None:
+        manifest_path = self.assets_dir / MANIFEST_NAME
+        assets = {}
+        if manifest_path.exists():
+            for item in json.loads(manifest_path.read_text(encoding="utf-8")):
+                asset = PhotoAsset(**item)
+                assets[(asset.skill, asset.scenario_id)] = asset
+        self._assets = assets
+
+    def get(self, skill: str, scenario_id: str) -> Optional[PhotoAsset]:
+        if self._assets is None:
+            self.load()
+        return self._assets.get((skill, scenario_id))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python photo_assets.py <photos_dir> <assets_dir>")
+        sys.exit(1)
+    built = build_photo_assets(Path(sys.argv[1]), Path(sys.argv[2]))
+    total = sum(asset.size_bytes for asset in built)
+    print(f"Built {len(built)} photo assets, {total / 1024:.0f} KiB total")
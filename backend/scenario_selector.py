@@ -4,11 +4,17 @@ Analyzes onboarding chat and either selects 3 random scenarios from existing ski
 or generates new custom scenarios with character images.
 """
 
+import asyncio
+import hashlib
 import json
+import math
 import os
 import random
+import re
+import shutil
+import time
 from pathlib import Path
-from typing import Literal, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Literal, Optional
 from datetime import datetime
 import base64
 
@@ -35,8 +41,23 @@ EXISTING_SKILLS = [
     "manipulationdefense"
 ]
 
-# Create temporary test images directory if it doesn't exist
-GENERATED_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+# Character image generation: at most this many gpt-image-1 calls in flight,
+# each one abandoned after IMAGE_GENERATION_TIMEOUT seconds
+IMAGE_GENERATION_CONCURRENCY = 3
+IMAGE_GENERATION_TIMEOUT = 90.0
+
+# Generated-scenario cache: near-duplicate custom skill requests reuse a stored set
+SCENARIO_CACHE_DIR = Path(os.getenv("SCENARIO_CACHE_DIR", str(Path(__file__).parent / "scenario_cache")))
+SCENARIO_CACHE_TTL = 7 * 24 * 3600  # seconds
+SCENARIO_CACHE_MAX_ENTRIES = 500
+SCENARIO_CACHE_SIMILARITY = 0.75  # cosine similarity of description embeddings
+SCENARIO_CACHE_REFRESH_PROBABILITY = 0.0  # chance a cache hit regenerates the set in background
+SCENARIO_CACHE_RELOAD_INTERVAL = 30.0  # seconds between re-reads of entries written by other containers
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Pooled HTTP connections to api.openai.com shared by all calls of one OpenAIClient
+OPENAI_POOL_SIZE = 32
+OPENAI_KEEPALIVE_TIMEOUT = 60  # seconds
 
 # Default voice IDs for generated characters
 DEFAULT_VOICE_IDS = {
@@ -78,6 +99,7 @@ class ScenarioSelectionResult(BaseModel):
     is_custom: bool
     scenarios: dict[str, ScenarioData]
     character_images: Optional[dict[str, str]] = None  # scenario_id -> image_url
+    cache_key: Optional[str] = None  # set for cached custom scenarios, returned by the API for flagging
 
 
 # ============================================================================
@@ -85,13 +107,40 @@ class ScenarioSelectionResult(BaseModel):
 # ============================================================================
 
 class OpenAIClient:
-    """Simple OpenAI API client for chat and image generation"""
+    """
+    Simple OpenAI API client for chat and image generation.
+    
+    Keeps one pooled keep-alive aiohttp session for its lifetime, created lazily
+    inside the running event loop. Call close() (or use `async with`) when done.
+    """
     
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.chat_url = "https://api.openai.com/v1/chat/completions"
         self.image_url = "https://api.openai.com/v1/images/generations"
-        
+        self.embedding_url = "https://api.openai.com/v1/embeddings"
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=OPENAI_POOL_SIZE,
+                keepalive_timeout=OPENAI_KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+    
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def __aenter__(self) -> "OpenAIClient":
+        return self
+    
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+    
     async def chat_completion(
         self,
         messages: list[dict[str, str]],
@@ -118,11 +167,71 @@ class OpenAIClient:
         if response_format:
             payload["response_format"] = response_format
             
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.chat_url, headers=headers, json=payload) as resp:
-                resp.raise_for_status()
-                data = await resp.json()
-                return data["choices"][0]["message"]["content"]
+        async with self._get_session().post(self.chat_url, headers=headers, json=payload) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+            return data["choices"][0]["message"]["content"]
+    
+    async def chat_completion_stream(
+        self,
+        messages: list[dict[str, str]],
+        model: str = "o3-mini",
+        temperature: float = 1.0,
+        reasoning_effort: Optional[str] = None,
+        response_format: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """Call OpenAI chat completion API with stream=True, yielding content deltas"""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True
+        }
+        
+        if reasoning_effort:
+            payload["reasoning_effort"] = reasoning_effort
+        
+        if response_format:
+            payload["response_format"] = response_format
+        
+        async with self._get_session().post(self.chat_url, headers=headers, json=payload) as resp:
+            resp.raise_for_status()
+            # Server-sent events, one "data: {...}" line per chunk
+            async for raw_line in resp.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                body = line[len("data:"):].strip()
+                if body == "[DONE]":
+                    break
+                chunk = json.loads(body)
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+    
+    async def embedding(self, text: str, model: str = EMBEDDING_MODEL) -> list[float]:
+        """Embed a short text with the OpenAI embeddings API"""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": model,
+            "input": text
+        }
+        
+        async with self._get_session().post(self.embedding_url, headers=headers, json=payload) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+            return data["data"][0]["embedding"]
     
     async def generate_image(
         self,
@@ -145,21 +254,82 @@ class OpenAIClient:
             "quality": quality
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.image_url, headers=headers, json=payload) as resp:
-                if resp.status != 200:
-                    error_data = await resp.json()
-                    raise Exception(f"DALL-E API Error {resp.status}: {error_data}")
-                data = await resp.json()
-                
-                # gpt-image-1 returns base64 encoded image
-                if "data" in data and len(data["data"]) > 0:
-                    if "b64_json" in data["data"][0]:
-                        return data["data"][0]["b64_json"]
-                    elif "url" in data["data"][0]:
-                        return data["data"][0]["url"]
-                
-                raise Exception(f"Unexpected API response structure: {data}")
+        async with self._get_session().post(self.image_url, headers=headers, json=payload) as resp:
+            if resp.status != 200:
+                error_data = await resp.json()
+                raise Exception(f"DALL-E API Error {resp.status}: {error_data}")
+            data = await resp.json()
+            
+            # gpt-image-1 returns base64 encoded image
+            if "data" in data and len(data["data"]) > 0:
+                if "b64_json" in data["data"][0]:
+                    return data["data"][0]["b64_json"]
+                elif "url" in data["data"][0]:
+                    return data["data"][0]["url"]
+            
+            raise Exception(f"Unexpected API response structure: {data}")
+
+
+class IncrementalJSONObjectParser:
+    """
+    Incremental parser for one streamed JSON object.
+    
+    feed() takes raw text chunks and returns the top-level (key, value) members
+    whose values have fully arrived, so `{"scenario_1": {...}, "scenario_2": ...`
+    yields scenario_1 as soon as its closing brace is seen. Each character is
+    scanned once; only completed members are handed to json.loads.
+    """
+    
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+    
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        text = self._text + chunk
+        members = []
+        
+        while self._pos < len(text):
+            ch = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                if self._depth > 0:
+                    self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = self._pos + 1
+            elif ch in "}]":
+                if self._depth == 1:
+                    members.extend(self._take_member(text, self._pos))
+                    self._member_start = self._pos + 1
+                self._depth -= 1
+            elif ch == "," and self._depth == 1:
+                members.extend(self._take_member(text, self._pos))
+                self._member_start = self._pos + 1
+            self._pos += 1
+        
+        # Only the member still being streamed needs to stay buffered
+        keep_from = min(self._member_start, self._pos)
+        self._text = text[keep_from:]
+        self._pos -= keep_from
+        self._member_start -= keep_from
+        return members
+    
+    def _take_member(self, text: str, end: int) -> list[tuple[str, object]]:
+        member = text[self._member_start:end].strip()
+        if not member:
+            return []
+        return list(json.loads("{" + member + "}").items())
 
 
 # ============================================================================
@@ -238,8 +408,21 @@ Examples:
     return SkillAnalysisResult(**data)
 
 
+# skill -> scenarios, filled on first load (or by preload_scenario_catalog)
+_scenario_catalog: dict[str, dict[str, ScenarioData]] = {}
+
+
+def preload_scenario_catalog() -> None:
+    """Parse every existing skill file up front, e.g. before a container snapshot"""
+    for skill in EXISTING_SKILLS:
+        load_scenarios_from_file(skill)
+
+
 def load_scenarios_from_file(skill: str) -> dict[str, ScenarioData]:
-    """Load scenarios from JSON file for given skill"""
+    """Load scenarios from JSON file for given skill (parsed once per process)"""
+    if skill in _scenario_catalog:
+        return dict(_scenario_catalog[skill])
+    
     file_path = SCENARIOS_DIR / f"{skill}.json"
     
     if not file_path.exists():
@@ -253,7 +436,8 @@ def load_scenarios_from_file(skill: str) -> dict[str, ScenarioData]:
     for scenario_id, scenario_dict in data.items():
         scenarios[scenario_id] = ScenarioData(**scenario_dict)
     
-    return scenarios
+    _scenario_catalog[skill] = scenarios
+    return dict(scenarios)
 
 
 def select_random_scenarios(
@@ -300,6 +484,75 @@ async def generate_custom_scenarios(
         Dictionary of scenario_id -> ScenarioData
     """
     
+    messages = _build_custom_scenarios_messages(custom_description, user_context, count)
+    
+    response = await openai_client.chat_completion(
+        messages=messages,
+        model="o3-mini",
+        temperature=1.0,
+        reasoning_effort="medium",
+        response_format={"type": "json_object"}
+    )
+    
+    data = json.loads(response)
+    
+    return {
+        scenario_id: _to_scenario_data(scenario_dict)
+        for scenario_id, scenario_dict in data.items()
+    }
+
+
+async def generate_custom_scenarios_stream(
+    custom_description: str,
+    user_context: str,
+    openai_client: OpenAIClient,
+    count: int = 3
+) -> AsyncIterator[tuple[str, ScenarioData]]:
+    """
+    Streaming variant of generate_custom_scenarios.
+    
+    Parses the JSON as it streams in and yields each scenario as soon as its
+    object is complete, so the first one is usable before the rest are written.
+    
+    Yields:
+        Tuples of (scenario_id, ScenarioData)
+    """
+    messages = _build_custom_scenarios_messages(custom_description, user_context, count)
+    parser = IncrementalJSONObjectParser()
+    
+    async for delta in openai_client.chat_completion_stream(
+        messages=messages,
+        model="o3-mini",
+        temperature=1.0,
+        reasoning_effort="medium",
+        response_format={"type": "json_object"}
+    ):
+        for scenario_id, scenario_dict in parser.feed(delta):
+            yield scenario_id, _to_scenario_data(scenario_dict)
+
+
+def _to_scenario_data(scenario_dict: dict) -> ScenarioData:
+    """Convert one generated scenario dict to ScenarioData, adding a default voice ID"""
+    # Normalize botgender to male/female only
+    botgender = scenario_dict.get("botgender", "male").lower()
+    if botgender not in ["male", "female"]:
+        # Default to male if invalid gender provided
+        botgender = "male"
+    scenario_dict["botgender"] = botgender
+    
+    # Add default voice ID based on gender
+    if "elevenlabs_voice_id" not in scenario_dict:
+        scenario_dict["elevenlabs_voice_id"] = DEFAULT_VOICE_IDS[botgender]
+    
+    return ScenarioData(**scenario_dict)
+
+
+def _build_custom_scenarios_messages(
+    custom_description: str,
+    user_context: str,
+    count: int
+) -> list[dict[str, str]]:
+    """Build the generation prompt for generate_custom_scenarios(_stream)"""
     # Load example scenarios for few-shot learning
     example_scenarios = []
     for skill in ["smalltalk", "negotiation"]:
@@ -388,33 +641,7 @@ CRITICAL:
         {"role": "user", "content": prompt}
     ]
     
-    response = await openai_client.chat_completion(
-        messages=messages,
-        model="o3-mini",
-        temperature=1.0,
-        reasoning_effort="medium",
-        response_format={"type": "json_object"}
-    )
-    
-    data = json.loads(response)
-    
-    # Convert to ScenarioData and add default voice IDs
-    scenarios = {}
-    for scenario_id, scenario_dict in data.items():
-        # Normalize botgender to male/female only
-        botgender = scenario_dict.get("botgender", "male").lower()
-        if botgender not in ["male", "female"]:
-            # Default to male if invalid gender provided
-            botgender = "male"
-        scenario_dict["botgender"] = botgender
-        
-        # Add default voice ID based on gender
-        if "elevenlabs_voice_id" not in scenario_dict:
-            scenario_dict["elevenlabs_voice_id"] = DEFAULT_VOICE_IDS[botgender]
-        
-        scenarios[scenario_id] = ScenarioData(**scenario_dict)
-    
-    return scenarios
+    return messages
 
 
 async def save_base64_image(b64_data: str, filename: str) -> str:
@@ -430,11 +657,16 @@ async def save_base64_image(b64_data: str, filename: str) -> str:
     """
     local_path = GENERATED_IMAGES_DIR / filename
     
-    # Decode base64 and save
-    image_data = base64.b64decode(b64_data)
+    def _write() -> None:
+        # Create temporary test images directory lazily, not at import time
+        GENERATED_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+        # Decode base64 and save
+        image_data = base64.b64decode(b64_data)
+        with open(local_path, 'wb') as f:
+            f.write(image_data)
     
-    with open(local_path, 'wb') as f:
-        f.write(image_data)
+    # Decoding a multi-megabyte PNG and writing it blocks, keep it off the event loop
+    await asyncio.to_thread(_write)
     
     return str(local_path)
 
@@ -489,14 +721,370 @@ Portrait orientation, vertical composition, focused on face and upper body."""
     return b64_image, local_path
 
 
+async def generate_character_images_stream(
+    scenarios: dict[str, ScenarioData],
+    openai_client: OpenAIClient,
+    max_concurrency: int = IMAGE_GENERATION_CONCURRENCY,
+    timeout: float = IMAGE_GENERATION_TIMEOUT
+) -> AsyncIterator[tuple[str, Optional[str]]]:
+    """
+    Generate character images for several scenarios concurrently.
+    
+    Yields as soon as each image is ready, in completion order. A failed or
+    timed out image is yielded with None so the caller can render a placeholder.
+    
+    Args:
+        scenarios: Dictionary of scenario_id -> ScenarioData
+        openai_client: OpenAI client instance
+        max_concurrency: Maximum number of image requests in flight
+        timeout: Per-image timeout in seconds
+        
+    Yields:
+        Tuples of (scenario_id, base64 image or None)
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    
+    async def _generate(scenario_id: str, scenario: ScenarioData) -> tuple[str, Optional[str]]:
+        async with semaphore:
+            try:
+                print(f"Generating image for {scenario_id} ({scenario.botname})...")
+                b64_data, local_path = await asyncio.wait_for(
+                    generate_character_image(
+                        character_description=scenario.character,
+                        character_name=scenario.botname,
+                        character_gender=scenario.botgender,
+                        openai_client=openai_client,
+                        scenario_id=scenario_id
+                    ),
+                    timeout=timeout
+                )
+                print(f"✓ Image generated for {scenario_id}")
+                print(f"  Saved to: {local_path}")
+                return scenario_id, b64_data
+            except asyncio.TimeoutError:
+                print(f"✗ Image generation for {scenario_id} timed out after {timeout}s")
+            except Exception as e:
+                print(f"✗ Failed to generate image for {scenario_id}:")
+                print(f"  Error: {e}")
+            # Continue without image
+            return scenario_id, None
+    
+    tasks = [
+        asyncio.create_task(_generate(scenario_id, scenario))
+        for scenario_id, scenario in scenarios.items()
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Consumer stopped early or was cancelled - don't leave requests running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# ============================================================================
+# Scenario Cache
+# ============================================================================
+
+_STOPWORDS = {
+    "a", "an", "the", "to", "of", "for", "in", "on", "at", "with", "and", "or",
+    "my", "me", "i", "how", "want", "learn", "practice", "better", "get", "be",
+    "is", "are", "about", "some", "someone", "people", "skill", "skills"
+}
+
+
+def normalize_description(text: str) -> str:
+    """Lowercase, drop punctuation and filler words, sort tokens"""
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return " ".join(sorted({t for t in tokens if t not in _STOPWORDS}))
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class CachedScenarioSet(BaseModel):
+    """One cached set of generated scenarios"""
+    key: str
+    description: str
+    normalized: str
+    context_hash: Optional[str] = None  # None for entries from before it was keyed, never matched
+    embedding: Optional[list[float]] = None
+    created_at: float
+    flagged: bool = False
+    scenarios: dict[str, ScenarioData]
+    images: dict[str, str] = Field(default_factory=dict)  # scenario_id -> png filename
+
+
+class ScenarioCache:
+    """
+    Persistent cache of generated scenario sets keyed by custom skill description.
+    Generation is also prompted with the user's chat context, so entries are only
+    served to requests with the same user_context (compared by hash).
+    
+    Each set lives in its own directory under SCENARIO_CACHE_DIR as entry.json plus
+    the character portraits. Lookup matches the normalized description exactly
+    first and falls back to embedding similarity above SCENARIO_CACHE_SIMILARITY.
+    Entries expire after SCENARIO_CACHE_TTL and are evicted when flagged.
+    
+    When root is a shared volume (a Modal Volume, set via `volume`), entries are
+    re-read every `reload_interval` seconds after `volume.reload()` so writes from
+    other containers show up, and every write is followed by `volume.commit()`.
+    """
+    
+    def __init__(
+        self,
+        root: Path = SCENARIO_CACHE_DIR,
+        ttl: float = SCENARIO_CACHE_TTL,
+        similarity: float = SCENARIO_CACHE_SIMILARITY,
+        max_entries: int = SCENARIO_CACHE_MAX_ENTRIES,
+        reload_interval: float = SCENARIO_CACHE_RELOAD_INTERVAL,
+        volume: Any = None
+    ):
+        self.root = root
+        self.ttl = ttl
+        self.similarity = similarity
+        self.max_entries = max_entries
+        self.reload_interval = reload_interval
+        self.volume = volume  # anything with blocking reload()/commit(), e.g. modal.Volume
+        self._entries: dict[str, CachedScenarioSet] | None = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+    
+    @staticmethod
+    def make_key(normalized: str, context_hash: str) -> str:
+        return hashlib.sha1(f"{normalized}\n{context_hash}".encode("utf-8")).hexdigest()[:16]
+    
+    @staticmethod
+    def context_hash(user_context: str) -> str:
+        return hashlib.sha1(user_context.strip().encode("utf-8")).hexdigest()[:16]
+    
+    def _load_all(self) -> dict[str, CachedScenarioSet]:
+        entries = {}
+        if not self.root.exists():
+            return entries
+        for entry_file in self.root.glob("*/entry.json"):
+            try:
+                entry = CachedScenarioSet.model_validate_json(entry_file.read_text(encoding="utf-8"))
+                entries[entry.key] = entry
+            except Exception as e:
+                print(f"Skipping unreadable cache entry {entry_file}: {e}")
+        return entries
+    
+    def _reload_all(self) -> dict[str, CachedScenarioSet]:
+        if self.volume is not None:
+            try:
+                self.volume.reload()
+            except Exception as e:
+                # e.g. a file on the volume is still open in another request
+                print(f"Scenario cache volume reload failed, reading local view: {e}")
+        return self._load_all()
+    
+    async def _ensure_loaded(self) -> dict[str, CachedScenarioSet]:
+        # Caller must hold self._lock
+        if self._entries is None or time.monotonic() - self._loaded_at >= self.reload_interval:
+            self._entries = await asyncio.to_thread(self._reload_all)
+            self._loaded_at = time.monotonic()
+        return self._entries
+    
+    async def _commit(self) -> None:
+        # Caller must hold self._lock
+        if self.volume is None:
+            return
+        try:
+            await asyncio.to_thread(self.volume.commit)
+        except Exception as e:
+            print(f"Scenario cache volume commit failed: {e}")
+    
+    def _is_live(self, entry: CachedScenarioSet) -> bool:
+        return not entry.flagged and time.time() - entry.created_at < self.ttl
+    
+    async def _embed(self, text: str, openai_client: Optional[OpenAIClient]) -> Optional[list[float]]:
+        if openai_client is None:
+            return None
+        try:
+            return await openai_client.embedding(text)
+        except Exception as e:
+            print(f"Embedding failed, cache falls back to exact match: {e}")
+            return None
+    
+    async def lookup(
+        self,
+        description: str,
+        user_context: str,
+        openai_client: Optional[OpenAIClient] = None
+    ) -> Optional[CachedScenarioSet]:
+        """Return the best live entry for a description generated with the same user_context, or None"""
+        normalized = normalize_description(description)
+        context_hash = self.context_hash(user_context)
+        async with self._lock:
+            entries = await self._ensure_loaded()
+            expired = [e for e in entries.values() if not self._is_live(e)]
+            for entry in expired:
+                await self._remove(entry.key)
+            if expired:
+                await self._commit()
+            
+            exact = entries.get(self.make_key(normalized, context_hash))
+            if exact is not None:
+                return exact
+            
+            candidates = [e for e in entries.values() if e.embedding and e.context_hash == context_hash]
+        
+        if not candidates:
+            return None
+        query = await self._embed(description, openai_client)
+        if query is None:
+            return None
+        
+        best_score, best = max(
+            ((_cosine(query, e.embedding), e) for e in candidates),
+            key=lambda pair: pair[0]
+        )
+        if best_score >= self.similarity and self._is_live(best):
+            return best
+        return None
+    
+    async def store(
+        self,
+        description: str,
+        user_context: str,
+        scenarios: dict[str, ScenarioData],
+        images: Optional[dict[str, str]] = None,
+        openai_client: Optional[OpenAIClient] = None
+    ) -> CachedScenarioSet:
+        """Store (or replace) the scenario set for a description and user_context, images as base64"""
+        normalized = normalize_description(description)
+        context_hash = self.context_hash(user_context)
+        key = self.make_key(normalized, context_hash)
+        embedding = await self._embed(description, openai_client)
+        entry = CachedScenarioSet(
+            key=key,
+            description=description,
+            normalized=normalized,
+            context_hash=context_hash,
+            embedding=embedding,
+            created_at=time.time(),
+            scenarios=scenarios,
+            images={scenario_id: f"{scenario_id}.png" for scenario_id in (images or {})}
+        )
+        
+        def _write() -> None:
+            entry_dir = self.root / key
+            entry_dir.mkdir(parents=True, exist_ok=True)
+            for scenario_id, b64_data in (images or {}).items():
+                with open(entry_dir / entry.images[scenario_id], 'wb') as f:
+                    f.write(base64.b64decode(b64_data))
+            tmp_path = entry_dir / "entry.json.tmp"
+            tmp_path.write_text(entry.model_dump_json(), encoding="utf-8")
+            os.replace(tmp_path, entry_dir / "entry.json")
+        
+        async with self._lock:
+            entries = await self._ensure_loaded()
+            await asyncio.to_thread(_write)
+            entries[key] = entry
+            while len(entries) > self.max_entries:
+                oldest = min(entries.values(), key=lambda e: e.created_at)
+                await self._remove(oldest.key)
+            await self._commit()
+        return entry
+    
+    async def add_image(self, key: str, scenario_id: str, b64_data: str) -> None:
+        """Attach a character image to an existing entry"""
+        async with self._lock:
+            entries = await self._ensure_loaded()
+            entry = entries.get(key)
+            if entry is None:
+                return
+            entry.images[scenario_id] = f"{scenario_id}.png"
+            
+            def _write() -> None:
+                entry_dir = self.root / key
+                if not entry_dir.is_dir():
+                    return  # evicted by another container since the last reload
+                with open(entry_dir / entry.images[scenario_id], 'wb') as f:
+                    f.write(base64.b64decode(b64_data))
+                tmp_path = entry_dir / "entry.json.tmp"
+                tmp_path.write_text(entry.model_dump_json(), encoding="utf-8")
+                os.replace(tmp_path, entry_dir / "entry.json")
+            
+            await asyncio.to_thread(_write)
+            await self._commit()
+    
+    async def load_images(self, entry: CachedScenarioSet) -> dict[str, str]:
+        """Read cached images back as base64"""
+        def _read() -> dict[str, str]:
+            images = {}
+            for scenario_id, filename in entry.images.items():
+                try:
+                    with open(self.root / entry.key / filename, 'rb') as f:
+                        images[scenario_id] = base64.b64encode(f.read()).decode('utf-8')
+                except OSError:
+                    pass
+            return images
+        return await asyncio.to_thread(_read)
+    
+    async def flag(self, key: str) -> bool:
+        """Mark a cached set as low quality and evict it, False for unknown keys"""
+        async with self._lock:
+            entries = await self._ensure_loaded()
+            # only keys of loaded entries, the key ends up in a path passed to rmtree
+            if key not in entries:
+                return False
+            await self._remove(key)
+            await self._commit()
+        return True
+    
+    async def _remove(self, key: str) -> None:
+        # Caller must hold self._lock
+        self._entries.pop(key, None)
+        await asyncio.to_thread(shutil.rmtree, self.root / key, True)
+
+
+scenario_cache = ScenarioCache()
+
+
 # ============================================================================
 # Main Function
 # ============================================================================
 
+_background_tasks: set[asyncio.Task] = set()
+
+
+async def _refresh_cached_scenarios(
+    analysis: SkillAnalysisResult,
+    openai_client: OpenAIClient,
+    close_client: bool = False
+) -> None:
+    """Regenerate a cached scenario set so repeat requests don't always see the same one"""
+    try:
+        scenarios = await generate_custom_scenarios(
+            custom_description=analysis.custom_description,
+            user_context=analysis.user_context,
+            openai_client=openai_client,
+            count=3
+        )
+        await scenario_cache.store(
+            analysis.custom_description, analysis.user_context, scenarios, openai_client=openai_client
+        )
+    except Exception as e:
+        print(f"Background scenario refresh failed: {e}")
+    finally:
+        if close_client:
+            await openai_client.close()
+
+
 async def select_or_generate_scenarios(
     chat_history: list[dict[str, str]],
     openai_api_key: str | None = None,
-    generate_images: bool = True
+    generate_images: bool = True,
+    on_image_ready: Optional[Callable[[str, Optional[str]], Awaitable[None]]] = None,
+    use_cache: bool = True,
+    openai_client: Optional[OpenAIClient] = None,
+    on_scenario_ready: Optional[Callable[[str, ScenarioData], Awaitable[None]]] = None
 ) -> ScenarioSelectionResult:
     """
     Main function: analyze chat and either select existing scenarios or generate new ones.
@@ -505,70 +1093,128 @@ async def select_or_generate_scenarios(
         chat_history: Onboarding chat history
         openai_api_key: OpenAI API key (if None, reads from FOPENAI_API_KEY env var)
         generate_images: Whether to generate character images for custom scenarios
+        on_image_ready: Optional async callback(scenario_id, b64_or_none), awaited as
+            soon as each character image finishes, before the whole set is done
+        use_cache: Whether to reuse/store custom scenario sets in scenario_cache
+        openai_client: Long-lived client to reuse; openai_api_key is ignored when given
+        on_scenario_ready: Optional async callback(scenario_id, scenario), awaited for each
+            scenario as soon as it is available (custom ones are streamed and parsed incrementally)
         
     Returns:
         ScenarioSelectionResult with selected/generated scenarios
     """
     
-    # Use FOPENAI_API_KEY if no key provided
-    if openai_api_key is None:
-        openai_api_key = os.getenv("FOPENAI_API_KEY")
-        if not openai_api_key:
-            raise ValueError("FOPENAI_API_KEY environment variable not set")
-    
-    client = OpenAIClient(openai_api_key)
-    
-    # Step 1: Analyze chat to determine skill
-    analysis = await analyze_chat_for_skill(chat_history, client)
+    owns_client = openai_client is None
+    if openai_client is not None:
+        client = openai_client
+    else:
+        # Use FOPENAI_API_KEY if no key provided
+        if openai_api_key is None:
+            openai_api_key = os.getenv("FOPENAI_API_KEY")
+            if not openai_api_key:
+                raise ValueError("FOPENAI_API_KEY environment variable not set")
+        
+        client = OpenAIClient(openai_api_key)
     
-    # Step 2: Select or generate scenarios
-    if analysis.is_custom:
-        # Generate custom scenarios
-        scenarios = await generate_custom_scenarios(
-            custom_description=analysis.custom_description,
-            user_context=analysis.user_context,
-            openai_client=client,
-            count=3
-        )
+    try:
+        # Step 1: Analyze chat to determine skill
+        analysis = await analyze_chat_for_skill(chat_history, client)
         
-        # Generate character images if requested
-        character_images = {}
-        if generate_images:
-            for scenario_id, scenario in scenarios.items():
-                try:
-                    print(f"Generating image for {scenario_id} ({scenario.botname})...")
-                    b64_data, local_path = await generate_character_image(
-                        character_description=scenario.character,
-                        character_name=scenario.botname,
-                        character_gender=scenario.botgender,
+        # Step 2: Select or generate scenarios
+        if analysis.is_custom:
+            cached = (
+                await scenario_cache.lookup(analysis.custom_description, analysis.user_context, client)
+                if use_cache else None
+            )
+            
+            if cached is not None:
+                print(f"Scenario cache hit for '{analysis.custom_description}' -> '{cached.description}'")
+                scenarios = cached.scenarios
+                cache_key = cached.key
+                character_images = await scenario_cache.load_images(cached)
+                if on_scenario_ready is not None:
+                    for scenario_id, scenario in scenarios.items():
+                        await on_scenario_ready(scenario_id, scenario)
+                if on_image_ready is not None:
+                    for scenario_id, b64_data in character_images.items():
+                        await on_image_ready(scenario_id, b64_data)
+                if random.random() < SCENARIO_CACHE_REFRESH_PROBABILITY:
+                    # Keep cached sets varied: replace this one in the background
+                    task = asyncio.create_task(
+                        _refresh_cached_scenarios(analysis, client, close_client=owns_client)
+                    )
+                    owns_client = False  # the refresh task closes it
+                    _background_tasks.add(task)
+                    task.add_done_callback(_background_tasks.discard)
+            else:
+                # Generate custom scenarios
+                if on_scenario_ready is not None:
+                    # Stream so each scenario reaches the caller as soon as it is parsed
+                    scenarios = {}
+                    async for scenario_id, scenario in generate_custom_scenarios_stream(
+                        custom_description=analysis.custom_description,
+                        user_context=analysis.user_context,
                         openai_client=client,
-                        scenario_id=scenario_id
+                        count=3
+                    ):
+                        scenarios[scenario_id] = scenario
+                        await on_scenario_ready(scenario_id, scenario)
+                else:
+                    scenarios = await generate_custom_scenarios(
+                        custom_description=analysis.custom_description,
+                        user_context=analysis.user_context,
+                        openai_client=client,
+                        count=3
                     )
-                    character_images[scenario_id] = b64_data  # Store base64
-                    print(f"✓ Image generated for {scenario_id}")
-                    print(f"  Saved to: {local_path}")
-                except Exception as e:
-                    print(f"✗ Failed to generate image for {scenario_id}:")
-                    print(f"  Error: {e}")
-                    # Continue without image
-        
-        return ScenarioSelectionResult(
-            skill=analysis.skill,
-            is_custom=True,
-            scenarios=scenarios,
-            character_images=character_images if character_images else None
-        )
-    
-    else:
-        # Select random from existing
-        scenarios = select_random_scenarios(analysis.skill, count=3)
+                character_images = {}
+                cache_key = None
+                if use_cache:
+                    try:
+                        entry = await scenario_cache.store(
+                            analysis.custom_description, analysis.user_context, scenarios, openai_client=client
+                        )
+                        cache_key = entry.key
+                    except Exception as e:
+                        print(f"Failed to cache generated scenarios: {e}")
+            
+            # Generate character images if requested (only the ones the cache doesn't have)
+            if generate_images:
+                missing = {
+                    scenario_id: scenario for scenario_id, scenario in scenarios.items()
+                    if scenario_id not in character_images
+                }
+                async for scenario_id, b64_data in generate_character_images_stream(missing, client):
+                    if b64_data is not None:
+                        character_images[scenario_id] = b64_data  # Store base64
+                        if cache_key is not None:
+                            await scenario_cache.add_image(cache_key, scenario_id, b64_data)
+                    if on_image_ready is not None:
+                        await on_image_ready(scenario_id, b64_data)
+            
+            return ScenarioSelectionResult(
+                skill=analysis.skill,
+                is_custom=True,
+                scenarios=scenarios,
+                character_images=character_images if character_images else None,
+                cache_key=cache_key
+            )
         
-        return ScenarioSelectionResult(
-            skill=analysis.skill,
-            is_custom=False,
-            scenarios=scenarios,
-            character_images=None
-        )
+        else:
+            # Select random from existing
+            scenarios = select_random_scenarios(analysis.skill, count=3)
+            if on_scenario_ready is not None:
+                for scenario_id, scenario in scenarios.items():
+                    await on_scenario_ready(scenario_id, scenario)
+            
+            return ScenarioSelectionResult(
+                skill=analysis.skill,
+                is_custom=False,
+                scenarios=scenarios,
+                character_images=None
+            )
+    finally:
+        if owns_client:
+            await client.close()
 
 
 # ============================================================================
@@ -0,0 +1,263 @@
+import asyncio
+import datetime
+import io
+import logging
+import wave
+from typing import TYPE_CHECKING, Literal
+
+import numpy as np
+from livekit import agents, rtc
+
+if TYPE_CHECKING:
+    from vendors.engine import Engine
+
+try:
+    import av
+except ImportError:  # optional, chunks are sent as WAV
+    av = None
+
+logger = logging.getLogger(__name__)
+
+AudioCodec = Literal["flac", "opus", "wav"]
+
+_CONTAINERS = {
+    "flac": ("flac", "flac", "chunk.flac", "audio/flac"),
+    "opus": ("ogg", "libopus", "chunk.ogg", "audio/ogg"),
+}
+
+
+def _encode_wav(pcm: bytes, sample_rate: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buf.getvalue()
+
+
+def encode_chunk(pcm: bytes, sample_rate: int, codec: AudioCodec) -> tuple[bytes, str, str]:
+    """Mono s16 PCM -> (file bytes, filename, content type); WAV when PyAV is missing"""
+    if codec == "wav" or av is None:
+        return _encode_wav(pcm, sample_rate), "chunk.wav", "audio/wav"
+    container_format, encoder, filename, content_type = _CONTAINERS[codec]
+    buf = io.BytesIO()
+    with av.open(buf, mode="w", format=container_format) as container:
+        stream = container.add_stream(encoder, rate=sample_rate, layout="mono")
+        if codec == "opus":
+            stream.bit_rate = 24000  # speech, ~3 KB/s
+        frame = av.AudioFrame.from_ndarray(np.frombuffer(pcm, dtype=np.int16).reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = sample_rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buf.getvalue(), filename, content_type
+
+
+class TappedVAD(agents.vad.VAD):
+    """
+    Wraps the session's VAD and re-emits its END_OF_SPEECH events as
+    "end_of_speech", so other consumers get the user's utterances without
+    running a second VAD over the same microphone.
+    """
+
+    def __init__(self, vad: agents.vad.VAD):
+        super().__init__(capabilities=vad.capabilities)
+        self._vad = vad
+        self._label = vad._label
+        vad.on("metrics_collected", lambda metrics: self.emit("metrics_collected", metrics))
+
+    @property
+    def model(self) -> str:
+        return self._vad.model
+
+    @property
+    def provider(self) -> str:
+        return self._vad.provider
+
+    def stream(self) -> "_TappedVADStream":
+        return _TappedVADStream(self, self._vad.stream())
+
+
+class _TappedVADStream:
+    """Forwards to the wrapped VADStream, emitting END_OF_SPEECH events on the TappedVAD"""
+
+    def __init__(self, tap: TappedVAD, stream: agents.vad.VADStream):
+        self._tap = tap
+        self._stream = stream
+
+    def push_frame(self, frame: rtc.AudioFrame) -> None:
+        self._stream.push_frame(frame)
+
+    def flush(self) -> None:
+        self._stream.flush()
+
+    def end_input(self) -> None:
+        self._stream.end_input()
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+    def __aiter__(self) -> "_TappedVADStream":
+        return self
+
+    async def __anext__(self) -> agents.vad.VADEvent:
+        ev = await self._stream.__anext__()
+        if ev.type == agents.vad.VADEventType.END_OF_SPEECH and ev.frames:
+            try:
+                self._tap.emit("end_of_speech", ev)
+            except Exception as e:
+                logger.error(f"❌ end_of_speech listener failed | {e}")
+        return ev
+
+
+class AudioScoringPipeline:
+    """
+    Takes the user's utterances from the session's VAD end-of-speech events
+    (see TappedVAD), cuts them into chunks (consecutive utterances are merged
+    up to `min_chunk_seconds`, long ones split at `max_chunk_seconds`),
+    encodes them in a worker thread and uploads them to the scoring engine
+    with at most `max_concurrency` requests in flight, while the conversation
+    goes on.
+
+    `total_chunks` / `submitted_chunks` are the counters expected by
+    `Backend.complete_session`.
+    """
+
+    def __init__(
+        self,
+        engine: "Engine",
+        vad: TappedVAD,
+        *,
+        user_id: str,
+        session_id: str,
+        codec: AudioCodec = "flac",
+        sample_rate: int = 16000,
+        min_chunk_seconds: float = 3.0,
+        max_chunk_seconds: float = 20.0,
+        max_concurrency: int = 3,
+        max_pending: int = 32,
+        callback_url: str | None = None,
+    ):
+        self.engine = engine
+        self.vad = vad
+        self.user_id = user_id
+        self.session_id = session_id
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.min_chunk_seconds = min_chunk_seconds
+        self.max_chunk_seconds = max_chunk_seconds
+        self.max_pending = max_pending
+        self.callback_url = callback_url
+        self.total_chunks = 0
+        self.submitted_chunks = 0
+        self.failed_chunks = 0
+        self.bytes_pcm = 0
+        self.bytes_sent = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._buffer: list[bytes] = []
+        self._buffer_samples = 0
+        self._buffer_started_at: datetime.datetime | None = None
+        self._uploads: set[asyncio.Task] = set()
+        self._started = False
+
+    def start(self) -> None:
+        """Listen to the session's end-of-speech events"""
+        if not self._started:
+            self.vad.on("end_of_speech", self._on_end_of_speech)
+            self._started = True
+
+    def _on_end_of_speech(self, ev: agents.vad.VADEvent) -> None:
+        self._add_speech(ev.frames, ev.silence_duration)
+
+    def _resample(self, frames: list[rtc.AudioFrame]) -> list[rtc.AudioFrame]:
+        """Session input (mono, room input rate) -> self.sample_rate"""
+        if frames[0].sample_rate == self.sample_rate:
+            return frames
+        resampler = rtc.AudioResampler(frames[0].sample_rate, self.sample_rate)
+        out = [resampled for frame in frames for resampled in resampler.push(frame)]
+        out.extend(resampler.flush())
+        return out
+
+    def _add_speech(self, frames: list[rtc.AudioFrame], silence_duration: float) -> None:
+        pcm = b"".join(bytes(frame.data) for frame in self._resample(frames))
+        n_samples = len(pcm) // 2
+        if self._buffer_started_at is None:
+            duration = n_samples / self.sample_rate
+            self._buffer_started_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+                seconds=duration + silence_duration
+            )
+        max_samples = int(self.max_chunk_seconds * self.sample_rate)
+        while n_samples:
+            take = min(n_samples, max_samples - self._buffer_samples)
+            self._buffer.append(pcm[: 2 * take])
+            self._buffer_samples += take
+            pcm, n_samples = pcm[2 * take :], n_samples - take
+            if self._buffer_samples >= max_samples:
+                self._emit()
+        if self._buffer_samples >= self.min_chunk_seconds * self.sample_rate:
+            self._emit()
+        if not self._buffer:
+            self._buffer_started_at = None
+
+    def _emit(self) -> None:
+        if not self._buffer:
+            return
+        pcm, started_at = b"".join(self._buffer), self._buffer_started_at
+        duration = self._buffer_samples / self.sample_rate
+        self._buffer, self._buffer_samples = [], 0
+        # the rest of a split utterance follows right after, the next utterance sets its own start
+        self._buffer_started_at = started_at + datetime.timedelta(seconds=duration)
+        index = self.total_chunks
+        self.total_chunks += 1
+        if len(self._uploads) >= self.max_pending:
+            self.failed_chunks += 1
+            logger.error(f"❌ audio scoring backlog full, chunk {index} dropped")
+            return
+        task = asyncio.create_task(self._upload(index, started_at, pcm))
+        self._uploads.add(task)
+        task.add_done_callback(self._uploads.discard)
+
+    async def _upload(self, index: int, started_at: datetime.datetime, pcm: bytes):
+        try:
+            audio_file, filename, content_type = await asyncio.to_thread(
+                encode_chunk, pcm, self.sample_rate, self.codec
+            )
+            async with self._semaphore:
+                await self.engine.score_chunk(
+                    user_id=self.user_id,
+                    session_id=self.session_id,
+                    index=index,
+                    started_at=started_at,
+                    audio_file=audio_file,
+                    callback_url=self.callback_url,
+                    filename=filename,
+                    content_type=content_type,
+                )
+            self.submitted_chunks += 1
+            self.bytes_pcm += len(pcm)
+            self.bytes_sent += len(audio_file)
+            logger.info(f"✅ DONE to submit audio chunk {index} | {len(pcm)}->{len(audio_file)}B")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed_chunks += 1
+            logger.error(f"❌ FAILED to submit audio chunk {index} | {e}")
+
+    async def aclose(self, timeout: float = 15.0) -> None:
+        """Stop listening, submit the last partial chunk and wait for uploads in flight"""
+        if self._started:
+            self.vad.off("end_of_speech", self._on_end_of_speech)
+            self._started = False
+        self._emit()
+        uploads = list(self._uploads)
+        if uploads:
+            _, pending = await asyncio.wait(uploads, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        logger.info(
+            f"Audio scoring: {self.submitted_chunks}/{self.total_chunks} chunks submitted"
+            f" | {self.failed_chunks} failed | {self.bytes_pcm}->{self.bytes_sent}B"
+        )
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Literal
+
+from livekit import agents, rtc
+
+logger = logging.getLogger(__name__)
+
+EndingKind = Literal["good", "bad"]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+@dataclass
+class PreparedEnding:
+    kind: EndingKind
+    text: str
+    checker_index: int
+    last_user_message_id: str | None = None  # latest user message in the context it was written from
+    user_text: str | None = None  # user utterance not committed yet that it answers
+    frames: list[rtc.AudioFrame] = field(default_factory=list)
+
+    async def audio(self) -> AsyncIterator[rtc.AudioFrame]:
+        for frame in self.frames:
+            yield frame
+
+    def answers(self, user_message: agents.ChatMessage | None) -> bool:
+        """Whether the line was written after `user_message`, the turn that triggers the ending"""
+        if user_message is None:
+            return True
+        if self.user_text is not None:
+            return _normalize(self.user_text) == _normalize(user_message.text_content or "")
+        return self.last_user_message_id == user_message.id
+
+
+class SpeculativeEnding:
+    """
+    Prepares the final in-character line (text + audio) in the background as
+    soon as the checker suggests an ending is coming, so the ending can start
+    playing instantly instead of waiting for LLM + TTS round trips. While an
+    ending is likely, every final user transcript restarts the speculation
+    with that utterance, so the line answers what the user just said.
+
+    A prepared ending is only used while it is at most `max_age` checker
+    results old and was written after the user message that triggers the
+    ending; otherwise it is dropped. `take` waits at most `wait_budget`
+    seconds for one still in flight, then gives up so the ending is generated
+    the normal way. At most `max_speculations` are started per session.
+    """
+
+    def __init__(
+        self,
+        session: agents.AgentSession,
+        instructions: dict[EndingKind, str],
+        *,
+        progress_threshold: int = 7,
+        progress_drop: int = 3,
+        max_speculations: int = 6,
+        max_age: int = 1,
+        timeout: float = 20.0,
+        wait_budget: float = 0.5,
+    ):
+        self.session = session
+        self.instructions = instructions
+        self.progress_threshold = progress_threshold
+        self.progress_drop = progress_drop
+        self.max_speculations = max_speculations
+        self.max_age = max_age
+        self.timeout = timeout
+        self.wait_budget = wait_budget
+        self.n_started = 0
+        self._prepared: dict[EndingKind, PreparedEnding] = {}
+        self._tasks: dict[EndingKind, tuple[asyncio.Task, str | None]] = {}
+        self._likely: dict[EndingKind, int] = {}  # kind -> checker index that suggested it
+        self._user_text = ""  # final transcripts of the user turn in progress
+
+    def on_checker(self, checker_result: dict, checker_index: int):
+        """Call with every new checker result; starts speculation when an ending looks likely"""
+        progress = checker_result.get("progress_towards_goal")
+        previous = checker_result.get("previous_progress_towards_goal")
+        self._likely = {}
+        if checker_result.get("is_goal_complete") or (
+            progress is not None and progress >= self.progress_threshold
+        ):
+            self._likely["good"] = checker_index
+        if checker_result.get("is_bad_ending_triggered") or (
+            progress is not None and previous is not None and previous - progress >= self.progress_drop
+        ):
+            self._likely["bad"] = checker_index
+        for kind, index in self._likely.items():
+            self._speculate(kind, index, self._user_text or None)
+
+    def on_user_transcript(self, transcript: str):
+        """Call with every final user transcript; re-speculates likely endings with it"""
+        self._user_text = f"{self._user_text} {transcript}".strip()
+        for kind, index in self._likely.items():
+            if self._is_fresh(index):
+                self._speculate(kind, index, self._user_text)
+
+    def on_user_message(self):
+        """Call once the user's message is committed to the chat context"""
+        self._user_text = ""
+
+    async def take(self, kind: EndingKind, user_message: agents.ChatMessage | None = None) -> PreparedEnding | None:
+        """
+        Return the prepared ending if it is fresh and answers `user_message`,
+        waiting up to `wait_budget` for one already in flight
+        """
+        task, _ = self._tasks.get(kind, (None, None))
+        if task is not None and not task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(task), self.wait_budget)
+            except asyncio.TimeoutError:
+                logger.info(f"Speculative {kind} ending not ready in {self.wait_budget}s")
+                task.cancel()
+                return None
+            except Exception:
+                pass
+        prepared = self._prepared.pop(kind, None)
+        if prepared is None or not self._is_fresh(prepared.checker_index):
+            logger.info(f"No fresh speculative {kind} ending")
+            return None
+        if not prepared.answers(user_message):
+            logger.info(f"Speculative {kind} ending predates the user's last message")
+            return None
+        logger.info(f"Using speculative {kind} ending: {prepared.text}")
+        return prepared
+
+    async def aclose(self):
+        tasks = [task for task, _ in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._prepared.clear()
+
+    def _is_fresh(self, checker_index: int) -> bool:
+        return len(self.session._checker) - 1 - checker_index < self.max_age
+
+    def _speculate(self, kind: EndingKind, checker_index: int, user_text: str | None = None):
+        prepared = self._prepared.get(kind)
+        if prepared is not None and prepared.checker_index == checker_index and prepared.user_text == user_text:
+            return
+        task, task_user_text = self._tasks.get(kind, (None, None))
+        if task is not None and not task.done():
+            if task_user_text == user_text:
+                return
+        if self.n_started >= self.max_speculations:
+            return
+        if task is not None and not task.done():
+            task.cancel()  # written before the user's latest words
+        self.n_started += 1
+        logger.info(f"Speculating {kind} ending ({self.n_started}/{self.max_speculations})")
+        self._tasks[kind] = (asyncio.create_task(self._prepare(kind, checker_index, user_text)), user_text)
+
+    async def _prepare(self, kind: EndingKind, checker_index: int, user_text: str | None):
+        try:
+            prepared = await asyncio.wait_for(self._generate(kind, checker_index, user_text), self.timeout)
+            if self._is_fresh(checker_index):
+                self._prepared[kind] = prepared
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Speculative {kind} ending failed: {e}")
+
+    async def _generate(self, kind: EndingKind, checker_index: int, user_text: str | None) -> PreparedEnding:
+        chat_ctx = self.session.current_agent.chat_ctx.copy()
+        last_user_message_id = next(
+            (item.id for item in reversed(chat_ctx.items) if item.type == "message" and item.role == "user"), None
+        )
+        if user_text:
+            chat_ctx.add_message(role="user", content=user_text)
+        chat_ctx.add_message(role="system", content=self.instructions[kind])
+
+        chunks = []
+        async with self.session.llm.chat(chat_ctx=chat_ctx) as stream:
+            async for chunk in stream:
+                if chunk.delta and chunk.delta.content:
+                    chunks.append(chunk.delta.content)
+        text = "".join(chunks).strip()
+
+        prepared = PreparedEnding(
+            kind=kind,
+            text=text,
+            checker_index=checker_index,
+            last_user_message_id=last_user_message_id,
+            user_text=user_text,
+        )
+        if text:
+            async with self.session.tts.synthesize(text) as stream:
+                async for ev in stream:
+                    prepared.frames.append(ev.frame)
+        return prepared
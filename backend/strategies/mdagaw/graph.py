@@ -0,0 +1,168 @@
+"""
+Compiled MDAGAW scenario graph.
+
+`ScenarioGraph` indexes a scenario once (state order, branch membership,
+outgoing / incoming transitions, initial states, fork groups, prompts) and
+`ScenarioFrontier` keeps the set of checkable transitions up to date as
+states are visited, so a turn only touches the current frontier instead of
+rescanning every state against every other state.
+
+Both scenario layouts are supported: states nested by branch
+(`{"states": {branch: {state: {...}}}}`) and flat states carrying their
+branch as an attribute, usually with a START state whose transitions lead
+to the initial states (`{"states": {state: {"branch": ..., ...}}}`).
+"""
+from typing import Any
+
+
+def _is_state(entry: dict) -> bool:
+    # flat states carry string fields (name, addprompt, branch), branches only hold state dicts
+    return any(not isinstance(value, dict) for value in entry.values())
+
+
+class ScenarioGraph:
+    def __init__(self, scenario: dict):
+        self.scenario = scenario
+        self.states: dict[str, dict] = {}
+        self.branch: dict[str, str | None] = {}
+        for key, entry in scenario["states"].items():
+            if _is_state(entry):
+                self._add_state(key, entry, entry.get("branch"))
+            else:
+                for state_name, state_data in entry.items():
+                    self._add_state(state_name, state_data, key)
+        self.terminals: dict[str, dict] = scenario.get("tstates", {})
+        self.order = {name: i for i, name in enumerate(self.states)}
+
+        self.outgoing: dict[str, list[tuple[str, dict]]] = {name: [] for name in self.states}
+        self.incoming: dict[str, list[str]] = {}
+        self.fork_groups: dict[str, list[str]] = {}
+        for name, data in self.states.items():
+            for target, transition in (data.get("transitions") or {}).items():
+                self.outgoing[name].append((target, transition))
+                self.incoming.setdefault(target, []).append(name)
+                if transition.get("type") == "fork":
+                    self.fork_groups.setdefault(name, []).append(target)
+
+        # states without incoming transitions are activated by their own condition
+        self.initial = [
+            name for name, data in self.states.items() if name not in self.incoming and "condition" in data
+        ]
+        self.prompts = {
+            name: data["addprompt"] for name, data in self.states.items() if data.get("addprompt")
+        }
+        for name, data in self.terminals.items():
+            if data.get("addprompt"):
+                self.prompts[name] = data["addprompt"]
+
+    def _add_state(self, name: str, data: dict, branch: str | None) -> None:
+        if name not in self.states:  # first occurrence wins, as in the per-branch lookups
+            self.states[name] = data
+            self.branch[name] = branch
+
+
+class ScenarioFrontier:
+    """
+    Active frontier of one conversation: transitions out of visited states
+    that are not blocked, initial states not yet visited and terminal states
+    not yet reached. `visited` is the scenario's `visited_states` list and is
+    appended to by `fire`; entries appended elsewhere are picked up by `sync`.
+    """
+
+    def __init__(self, graph: ScenarioGraph, visited: list[str]):
+        self.graph = graph
+        self.visited = visited
+        self._visited_set: set[str] = set()
+        self._n_synced = 0
+        # key -> (position in scenario order, transition data, source)
+        self._candidates: dict[str, tuple[tuple[int, int], dict, str]] = {}
+        for name in graph.initial:
+            self._candidates[f"INITIAL:{name}"] = (
+                (graph.order[name], 0),
+                {
+                    "condition": graph.states[name]["condition"],
+                    "type": "parallel",
+                    "shortDesc": f"Activate initial state {name}",
+                },
+                "INITIAL",
+            )
+        for i, (name, data) in enumerate(graph.terminals.items()):
+            if "condition" in data:
+                self._candidates[f"GLOBAL:{name}"] = (
+                    (len(graph.order) + i, 0),
+                    {"condition": data["condition"], "isPositive": name == "SUCCESS", "shortDesc": f"Reach {name}"},
+                    "GLOBAL",
+                )
+        self.sync()
+
+    def sync(self) -> None:
+        for name in self.visited[self._n_synced :]:
+            self._visit(name)
+        self._n_synced = len(self.visited)
+
+    def _visit(self, name: str) -> None:
+        if name in self._visited_set:
+            return
+        self._visited_set.add(name)
+        self._candidates.pop(f"INITIAL:{name}", None)
+        self._candidates.pop(f"GLOBAL:{name}", None)
+        position = self.graph.order.get(name)
+        for j, (target, transition) in enumerate(self.graph.outgoing.get(name, ())):
+            if transition.get("isBlocked"):
+                continue
+            self._candidates[f"{name}:{target}"] = (
+                (position, j + 1),
+                {
+                    "condition": transition["condition"],
+                    "isPositive": target == "SUCCESS" or transition.get("isPositive", True),
+                    "type": transition["type"],
+                    "shortDesc": transition.get("shortDesc", f"Transition to {target}"),
+                },
+                name,
+            )
+
+    def candidates(self) -> tuple[dict[str, dict], dict[str, str]]:
+        """`(all_transitions, transition_sources)` in scenario order"""
+        self.sync()
+        ordered = sorted(self._candidates.items(), key=lambda item: item[1][0])
+        return {key: data for key, (_, data, _) in ordered}, {key: source for key, (_, _, source) in ordered}
+
+    def fire(self, source: str | None, target: str) -> None:
+        """Visit `target`; a fork transition blocks the other arrows of its source"""
+        self.sync()
+        if target not in self._visited_set:
+            self.visited.append(target)
+            self.sync()
+        if source in self.graph.fork_groups:
+            transitions = self.graph.states[source]["transitions"]
+            if transitions.get(target, {}).get("type") == "fork":
+                for other in transitions:
+                    if other != target:
+                        transitions[other]["isBlocked"] = True
+                        self._candidates.pop(f"{source}:{other}", None)
+
+    def state_prompts(self) -> list[str]:
+        """Prompts of the visited branch states, for transition checks"""
+        self.sync()
+        return [self.graph.states[name]["addprompt"] for name in self.visited if name != "START"
+                and name in self.graph.states and "addprompt" in self.graph.states[name]]
+
+    def accumulated_prompts(self) -> list[str]:
+        """Prompts of all visited states (terminal prompts take precedence), for the response"""
+        self.sync()
+        return [self.graph.prompts[name] for name in self.visited if name != "START" and name in self.graph.prompts]
+
+
+def scenario_graph(scenario: dict[str, Any]) -> ScenarioGraph:
+    """Compiled graph of a scenario, reusing the session's one when there is a session"""
+    frontier = scenario.get("_frontier")
+    return frontier.graph if frontier is not None else ScenarioGraph(scenario)
+
+
+def scenario_frontier(scenario: dict[str, Any]) -> ScenarioFrontier:
+    """Frontier of a scenario session, compiled on first use and kept in the scenario"""
+    frontier = scenario.get("_frontier")
+    if frontier is None or frontier.visited is not scenario["visited_states"]:
+        frontier = ScenarioFrontier(ScenarioGraph(scenario), scenario["visited_states"])
+        scenario["_frontier"] = frontier
+    return frontier
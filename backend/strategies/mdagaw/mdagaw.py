@@ -7,6 +7,8 @@ import transition
 import checker
 from pathlib import Path
 
+from graph import scenario_frontier, scenario_graph
+
 
 # ROLEPLAY_SYSTEM_PROMPT_ADDITION = """
 # Keep your responses concise - no more than 1 short sentences <= 10 words.
@@ -57,21 +59,20 @@ def generate_mermaid_diagram(scenario, visited_states=None):
     mermaid = ["```mermaid", "graph TD"]
     
     # Process states from all branches
+    graph = scenario_graph(scenario)
     branch_states = {}
     
     # Add states from branches
-    for branch_name, branch_states_dict in scenario["states"].items():
-        if branch_name not in branch_states:
-            branch_states[branch_name] = []
-            
-        for state_name, state_data in branch_states_dict.items():
-            branch_states[branch_name].append(state_name)
-            
-            # Node style based on state
-            if state_name in visited_states:
-                mermaid.append(f"    {state_name}[{state_name}]:::visited")
-            else:
-                mermaid.append(f"    {state_name}[{state_name}]")
+    for state_name in graph.states:
+        branch_name = graph.branch[state_name]
+        if branch_name is not None:
+            branch_states.setdefault(branch_name, []).append(state_name)
+        
+        # Node style based on state
+        if state_name in visited_states:
+            mermaid.append(f"    {state_name}[{state_name}]:::visited")
+        else:
+            mermaid.append(f"    {state_name}[{state_name}]")
     
     # Add terminal states
     for state_name, state_data in scenario["tstates"].items():
@@ -96,42 +97,25 @@ def generate_mermaid_diagram(scenario, visited_states=None):
         mermaid.append("    end")
     
     # Process transitions from branches
-    for branch_name, branch_states_dict in scenario["states"].items():
-        for state_name, state_data in branch_states_dict.items():
-            if "transitions" not in state_data:
+    for state_name, transitions in graph.outgoing.items():
+        for target, transition_data in transitions:
+            # Skip blocked transitions
+            if "isBlocked" in transition_data and transition_data["isBlocked"]:
                 continue
-                
-            for target, transition_data in state_data["transitions"].items():
-                # Skip blocked transitions
-                if "isBlocked" in transition_data and transition_data["isBlocked"]:
-                    continue
-                
-                # Arrow style based on transition type
-                transition_type = transition_data["type"]
-                arrow_style = "-->" if transition_type == "parallel" else "==>"
-                
-                # Arrow label - transition condition
-                condition = transition_data["condition"]
-                arrow_label = f"|{condition}|"
-                mermaid.append(f"    {state_name} {arrow_style}{arrow_label} {target}")
+            
+            # Arrow style based on transition type
+            transition_type = transition_data["type"]
+            arrow_style = "-->" if transition_type == "parallel" else "==>"
+            
+            # Arrow label - transition condition
+            condition = transition_data["condition"]
+            arrow_label = f"|{condition}|"
+            mermaid.append(f"    {state_name} {arrow_style}{arrow_label} {target}")
     
     # Add implicit transitions from START to initial states in each branch
-    for branch_name, branch_states_dict in scenario["states"].items():
-        for state_name, state_data in branch_states_dict.items():
-            if "condition" in state_data:
-                has_incoming = False
-                
-                # Check if state has any incoming transitions
-                for _, other_states in scenario["states"].items():
-                    for _, other_state_data in other_states.items():
-                        if "transitions" in other_state_data:
-                            if state_name in other_state_data["transitions"]:
-                                has_incoming = True
-                                break
-                
-                if not has_incoming:
-                    condition = state_data["condition"]
-                    mermaid.append(f"    START -->|{condition}| {state_name}")
+    for state_name in graph.initial:
+        condition = graph.states[state_name]["condition"]
+        mermaid.append(f"    START -->|{condition}| {state_name}")
     
     # Add implicit transitions to terminal states
     for state_name, state_data in scenario["tstates"].items():
@@ -316,6 +300,7 @@ def active_states_to_html(scenario):
     """
     
     # Find all active non-terminal states
+    graph = scenario_frontier(scenario).graph
     active_non_terminal_states = []
     for state_name in active_states:
         if state_name == "START":
@@ -324,15 +309,12 @@ def active_states_to_html(scenario):
         if state_name in ["SUCCESS", "FAIL"]:
             continue
             
-        # Find state data in branches
-        for branch_name, branch_states in scenario["states"].items():
-            if state_name in branch_states:
-                active_non_terminal_states.append({
-                    "name": state_name,
-                    "branch": branch_name,
-                    "data": branch_states[state_name]
-                })
-                break
+        if state_name in graph.states:
+            active_non_terminal_states.append({
+                "name": state_name,
+                "branch": graph.branch[state_name],
+                "data": graph.states[state_name]
+            })
     
     # If no active states yet, show initial branch states
     if not active_non_terminal_states:
@@ -342,26 +324,15 @@ def active_states_to_html(scenario):
         </div>
         """
         
-        # Find initial states
-        initial_states = []
-        for branch_name, branch_states in scenario["states"].items():
-            for state_name, state_data in branch_states.items():
-                # Check if this is an initial state (no incoming transitions)
-                has_incoming = False
-                
-                for _, other_branch_states in scenario["states"].items():
-                    for _, other_state_data in other_branch_states.items():
-                        if "transitions" in other_state_data:
-                            if state_name in other_state_data["transitions"]:
-                                has_incoming = True
-                                break
-                
-                if not has_incoming and "condition" in state_data:
-                    initial_states.append({
-                        "name": state_name,
-                        "branch": branch_name,
-                        "condition": state_data["condition"]
-                    })
+        # Initial states (no incoming transitions)
+        initial_states = [
+            {
+                "name": state_name,
+                "branch": graph.branch[state_name],
+                "condition": graph.states[state_name]["condition"]
+            }
+            for state_name in graph.initial
+        ]
         
         if initial_states:
             html += """
@@ -554,69 +525,9 @@ def response(
 ):
     messages.append({"role": "user", "content": user_message})
 
-    # Collect all potential transitions from active states
-    active_states = scenario["visited_states"]
-    
-    all_transitions = {}
-    transition_sources = {}
-    
-    # Collect transitions from regular states in branches
-    for branch_name, branch_states in scenario["states"].items():
-        for state_name, state_data in branch_states.items():
-            if state_name not in active_states:
-                # Check for initial states with activation conditions
-                if "condition" in state_data:
-                    has_incoming = False
-                    
-                    # Check if this state has any incoming transitions
-                    for _, other_branch_states in scenario["states"].items():
-                        for _, other_state_data in other_branch_states.items():
-                            if "transitions" in other_state_data:
-                                if state_name in other_state_data["transitions"]:
-                                    has_incoming = True
-                                    break
-                    
-                    if not has_incoming:
-                        # This is an initial branch state
-                        transition_key = f"INITIAL:{state_name}"
-                        all_transitions[transition_key] = {
-                            "condition": state_data["condition"],
-                            "type": "parallel",
-                            "shortDesc": f"Activate initial state {state_name}"
-                        }
-                        transition_sources[transition_key] = "INITIAL"
-                
-                continue  # Skip inactive states
-                
-            if "transitions" not in state_data:
-                continue
-                
-            for target, transition_data in state_data["transitions"].items():
-                # Skip blocked transitions
-                if "isBlocked" in transition_data and transition_data["isBlocked"]:
-                    continue
-                
-                # Add this potential transition
-                transition_key = f"{state_name}:{target}"
-                all_transitions[transition_key] = {
-                    "condition": transition_data["condition"],
-                    "isPositive": target == "SUCCESS" or transition_data.get("isPositive", True),
-                    "type": transition_data["type"],
-                    "shortDesc": transition_data.get("shortDesc", f"Transition to {target}")
-                }
-                transition_sources[transition_key] = state_name
-    
-    # Add terminal state conditions if not already visited
-    if "tstates" in scenario:
-        for terminal_state, terminal_data in scenario["tstates"].items():
-            if terminal_state not in scenario["visited_states"] and "condition" in terminal_data:
-                transition_key = f"GLOBAL:{terminal_state}"
-                all_transitions[transition_key] = {
-                    "condition": terminal_data["condition"],
-                    "isPositive": terminal_state == "SUCCESS",
-                    "shortDesc": f"Reach {terminal_state}"
-                }
-                transition_sources[transition_key] = "GLOBAL"
+    # Collect all potential transitions from the active frontier
+    frontier = scenario_frontier(scenario)
+    all_transitions, transition_sources = frontier.candidates()
     
     # Make transition checks
     transitions_to_check = {}
@@ -635,14 +546,8 @@ def response(
         state_prompt = ""
         
         # Get additional prompts from active states
-        for active_state in active_states:
-            if active_state == "START":
-                continue
-                
-            for branch_name, branch_states in scenario["states"].items():
-                if active_state in branch_states:
-                    if "addprompt" in branch_states[active_state]:
-                        state_prompt += "\n\n" + branch_states[active_state]["addprompt"]
+        for addprompt in frontier.state_prompts():
+            state_prompt += "\n\n" + addprompt
         
         transitionjson = transition.transition(
             chat_context=messages,
@@ -666,9 +571,8 @@ def response(
                     from_state = transition_sources[key]
                     break
             
-            # Add the target state to visited states
-            if target_state not in scenario["visited_states"]:
-                scenario["visited_states"].append(target_state)
+            # Add the target state to visited states, a fork blocks the other transitions of its source
+            frontier.fire(from_state, target_state)
             
             # Handle special case for initial state transitions
             if from_state == "INITIAL":
@@ -679,18 +583,7 @@ def response(
                 </div>
                 """
             
-            # Handle fork transitions
             elif from_state != "GLOBAL":
-                for branch_name, branch_states in scenario["states"].items():
-                    if from_state in branch_states:
-                        source_state = branch_states[from_state]
-                        if "transitions" in source_state and target_state in source_state["transitions"]:
-                            if source_state["transitions"][target_state].get("type") == "fork":
-                                # Block other transitions from this fork state
-                                for other_target in source_state["transitions"]:
-                                    if other_target != target_state:
-                                        source_state["transitions"][other_target]["isBlocked"] = True
-            
                 # Create transition info HTML for regular transitions
                 transition_info_html = f"""
                 <div style='background-color:#4CAF50; color:white; padding:12px; border-radius:6px; margin-top:10px;'>
@@ -723,26 +616,8 @@ def response(
         accumulated_prompt += "\n\n" + scenario["negprompt"]
     
     # Add prompts from visited states
-    for state_name in scenario["visited_states"]:
-        if state_name == "START":
-            continue
-        
-        state_prompt = None
-        
-        # Get prompt from terminal states
-        if state_name in ["SUCCESS", "FAIL"] and "tstates" in scenario:
-            if "addprompt" in scenario["tstates"][state_name]:
-                state_prompt = scenario["tstates"][state_name]["addprompt"]
-        
-        # Or from branch states
-        if not state_prompt:
-            for branch_name, branch_states in scenario["states"].items():
-                if state_name in branch_states and "addprompt" in branch_states[state_name]:
-                    state_prompt = branch_states[state_name]["addprompt"]
-                    break
-        
-        if state_prompt:
-            accumulated_prompt += "\n\n" + state_prompt
+    for state_prompt in frontier.accumulated_prompts():
+        accumulated_prompt += "\n\n" + state_prompt
     
     # Add roleplay system prompt
     system_prompt = accumulated_prompt + "\n\n" + ROLEPLAY_SYSTEM_PROMPT_ADDITION
@@ -1,14 +1,27 @@
 import asyncio
+import atexit
+import base64
+import hashlib
+import json
 import logging
 import os
+import re
+import struct
+import time
 import weakref
-from typing import AsyncIterable
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterable, Literal, Protocol
 
 import aiohttp
 
 from livekit import rtc
-from livekit.agents import Agent, APITimeoutError, APIStatusError, APIConnectionError, tts, utils, tokenize
+from livekit.agents import Agent, APIError, APITimeoutError, APIStatusError, APIConnectionError, tts, utils, tokenize
+from livekit.agents.metrics import TTSMetrics
+from livekit.agents.tts.stream_adapter import DEFAULT_STREAM_ADAPTER_API_CONNECT_OPTIONS
 from livekit.agents.voice import ModelSettings
+from livekit.agents.voice.io import TimedString
 from livekit.plugins.elevenlabs.tts import (
     API_BASE_URL_V1, DEFAULT_VOICE_ID, DEFAULT_API_CONNECT_OPTIONS, NOT_GIVEN,
     APIConnectOptions, ChunkedStream, SynthesizeStream, TTS, TTSEncoding,
@@ -20,6 +33,17 @@ from livekit.plugins.elevenlabs.tts import (
 
 logger = logging.getLogger("livekit.agents")
 
+# Smaller first chunk than the plugin default (80) so the first audio starts sooner
+LOW_LATENCY_CHUNK_LENGTH_SCHEDULE = [50, 90, 120, 160]
+# ElevenLabs caps the multi-context websocket inactivity timeout at 180s
+MULTI_STREAM_INACTIVITY_TIMEOUT = 180
+# Process-level HTTP pool for ElevenLabs, shared by every TTS created in a worker process
+TTS_HTTP_POOL_SIZE = 32
+TTS_HTTP_POOL_SIZE_PER_HOST = 16
+TTS_HTTP_KEEPALIVE_TIMEOUT = 60
+# Idle pings keep a pooled connection open between turns, below the keep-alive timeout
+TTS_HTTP_HEALTH_INTERVAL = 45
+
 
 class AdapterStreamingFalseNextTextTTS:
     async def tts_node(
@@ -27,18 +51,16 @@ class AdapterStreamingFalseNextTextTTS:
         text: AsyncIterable[str],
         model_settings: ModelSettings
     ) -> AsyncIterable[rtc.AudioFrame]:
-        if isinstance(self.tts, StreamingFalseNextTextTTS):
+        activity = self._get_activity_or_raise()
+        assert activity.tts is not None, "tts_node called but no TTS node is available"
+        if activity.tts.capabilities.streaming:
             async for frame in Agent.default.tts_node(self, text, model_settings):
                 yield frame
         else:
-            # wrapped tts w SingleSentenceTokenizer
-            activity = self._get_activity_or_raise()
-            assert activity.tts is not None, "tts_node called but no TTS node is available"
-            wrapped_tts = activity.tts
-            if not activity.tts.capabilities.streaming:
-                wrapped_tts = tts.StreamAdapter(
-                    tts=wrapped_tts, sentence_tokenizer=SingleSentenceTokenizer()
-                )
+            # start on the first clause, synthesize later chunks ahead of playout
+            wrapped_tts = PipelinedStreamAdapter(
+                tts=activity.tts, sentence_tokenizer=AdaptiveChunkTokenizer()
+            )
             async with wrapped_tts.stream() as stream:
                 async def _forward_input():
                     async for chunk in text:
@@ -71,79 +93,413 @@ class SingleSentenceTokenizer(tokenize.tokenizer.SentenceTokenizer):
         )
 
 
+_CLAUSE_END = re.compile(r"[,;:\u2014.!?\u2026]+[\"')\]]*\s")
+_SENTENCE_END = re.compile(r"[.!?\u2026]+[\"')\]]*\s")
+
+
+class AdaptiveChunkTokenizer(tokenize.tokenizer.SentenceTokenizer):
+    """
+    Splits a reply for non-streaming TTS so synthesis can start early:
+    the first chunk is the first clause with at least `first_min_words`
+    words (or `first_max_words` words if no clause ends by then), later
+    chunks batch whole sentences up to at least `min_chunk_chars`.
+    """
+
+    def __init__(
+        self,
+        *,
+        first_min_words: int = 4,
+        first_max_words: int = 12,
+        min_chunk_chars: int = 80,
+    ) -> None:
+        self._first_min_words = first_min_words
+        self._first_max_words = first_max_words
+        self._min_chunk_chars = min_chunk_chars
+
+    def tokenize(self, text: str, *, language: str | None = None) -> list[str]:
+        chunks, rest, _ = self._take_chunks(text + " ", first_done=False)
+        return chunks + ([rest.strip()] if rest.strip() else [])
+
+    def stream(self, *, language: str | None = None) -> "AdaptiveChunkStream":
+        return AdaptiveChunkStream(self)
+
+    def _take_chunks(self, buf: str, first_done: bool) -> tuple[list[str], str, bool]:
+        chunks = []
+        if not first_done:
+            for match in _CLAUSE_END.finditer(buf):
+                if len(buf[:match.end()].split()) >= self._first_min_words:
+                    chunks.append(buf[:match.end()].strip())
+                    buf, first_done = buf[match.end():], True
+                    break
+            else:
+                head = re.match(rf"\s*(?:\S+\s+){{{self._first_max_words}}}", buf)
+                if head is not None:
+                    chunks.append(head.group().strip())
+                    buf, first_done = buf[head.end():], True
+            if not first_done:
+                return chunks, buf, first_done
+
+        while True:
+            cut = None
+            for match in _SENTENCE_END.finditer(buf):
+                cut = match.end()
+                if cut >= self._min_chunk_chars:
+                    break
+            if cut is None or cut < self._min_chunk_chars:
+                return chunks, buf, first_done
+            chunks.append(buf[:cut].strip())
+            buf = buf[cut:]
+
+
+class AdaptiveChunkStream(tokenize.tokenizer.SentenceStream):
+    def __init__(self, tokenizer: AdaptiveChunkTokenizer) -> None:
+        super().__init__()
+        self._tokenizer = tokenizer
+        self._buf = ""
+        self._first_done = False
+        self._segment_id = utils.shortuuid()
+
+    def push_text(self, text: str) -> None:
+        self._check_not_closed()
+        self._buf += text
+        chunks, self._buf, self._first_done = self._tokenizer._take_chunks(self._buf, self._first_done)
+        for chunk in chunks:
+            self._event_ch.send_nowait(tokenize.TokenData(token=chunk, segment_id=self._segment_id))
+
+    def flush(self) -> None:
+        self._check_not_closed()
+        if self._buf.strip():
+            self._event_ch.send_nowait(
+                tokenize.TokenData(token=self._buf.strip(), segment_id=self._segment_id)
+            )
+        self._buf = ""
+        self._first_done = False
+        self._segment_id = utils.shortuuid()
+
+    def end_input(self) -> None:
+        self.flush()
+        self._do_close()
+
+    async def aclose(self) -> None:
+        self._do_close()
+
+
+class PipelinedStreamAdapter(tts.StreamAdapter):
+    """
+    StreamAdapter that requests up to `max_in_flight` chunks concurrently
+    and plays them back in order. StreamingFalseNextTextTTS chunks also get
+    the already-requested text of their segment as previous_text.
+    """
+
+    def __init__(
+        self,
+        *,
+        tts: tts.TTS,
+        sentence_tokenizer: tokenize.SentenceTokenizer,
+        max_in_flight: int = 3,
+    ) -> None:
+        super().__init__(tts=tts, sentence_tokenizer=sentence_tokenizer)
+        self._max_in_flight = max_in_flight
+
+    def stream(
+        self,
+        *,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> "PipelinedStreamAdapterWrapper":
+        return PipelinedStreamAdapterWrapper(
+            tts=self,
+            conn_options=conn_options,
+            wrapped_tts=self._wrapped_tts,
+            sentence_tokenizer=self._sentence_tokenizer,
+            max_in_flight=self._max_in_flight,
+        )
+
+
+class PipelinedStreamAdapterWrapper(tts.SynthesizeStream):
+    def __init__(
+        self,
+        *,
+        tts: tts.TTS,
+        conn_options: APIConnectOptions,
+        wrapped_tts: tts.TTS,
+        sentence_tokenizer: tokenize.SentenceTokenizer,
+        max_in_flight: int,
+    ) -> None:
+        # the chunk requests retry on their own, a retry here would replay consumed input
+        super().__init__(tts=tts, conn_options=DEFAULT_STREAM_ADAPTER_API_CONNECT_OPTIONS)
+        self._wrapped_tts = wrapped_tts
+        self._wrapped_tts_conn_options = conn_options
+        self._sent_stream = sentence_tokenizer.stream()
+        self._max_in_flight = max_in_flight
+
+    async def _metrics_monitor_task(self, event_aiter) -> None:
+        pass  # the wrapped TTS reports its own metrics
+
+    def _synthesize(self, text: str, previous_text: str) -> ChunkedStream:
+        conn_options = self._wrapped_tts_conn_options
+        if isinstance(self._wrapped_tts, StreamingFalseNextTextTTS) and previous_text:
+            return self._wrapped_tts.synthesize(text, conn_options=conn_options, previous_text=previous_text)
+        return self._wrapped_tts.synthesize(text, conn_options=conn_options)
+
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
+            sample_rate=self._tts.sample_rate,
+            num_channels=self._tts.num_channels,
+            mime_type="audio/pcm",
+            stream=True,
+        )
+        output_emitter.start_segment(segment_id=utils.shortuuid())
+
+        # ChunkedStreams start their request on creation, so creating them
+        # ahead of playout is what pipelines the requests
+        pending_ch = utils.aio.Chan[ChunkedStream]()
+        in_flight = asyncio.Semaphore(self._max_in_flight)
+
+        async def _forward_input():
+            async for data in self._input_ch:
+                if isinstance(data, self._FlushSentinel):
+                    self._sent_stream.flush()
+                    continue
+                self._sent_stream.push_text(data)
+            self._sent_stream.end_input()
+
+        async def _schedule():
+            segment_id, previous = None, []
+            try:
+                async for ev in self._sent_stream:
+                    if ev.segment_id != segment_id:
+                        segment_id, previous = ev.segment_id, []
+                    await in_flight.acquire()
+                    self._mark_started()
+                    pending_ch.send_nowait(self._synthesize(ev.token, " ".join(previous)))
+                    previous.append(ev.token)
+            finally:
+                pending_ch.close()
+
+        async def _playout():
+            duration = 0.0
+            async for stream in pending_ch:
+                try:
+                    output_emitter.push_timed_transcript(
+                        TimedString(text=stream.input_text + " ", start_time=duration)
+                    )
+                    async for audio in stream:
+                        output_emitter.push(audio.frame.data.tobytes())
+                        duration += audio.frame.duration
+                    output_emitter.flush()
+                finally:
+                    in_flight.release()
+                    await stream.aclose()
+
+        tasks = [
+            asyncio.create_task(_forward_input()),
+            asyncio.create_task(_schedule()),
+            asyncio.create_task(_playout()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await utils.aio.cancel_and_wait(*tasks)
+            # drop chunks requested but never played (interruption)
+            while True:
+                try:
+                    stream = pending_ch.recv_nowait()
+                except utils.aio.channel.ChanEmpty:
+                    break
+                except utils.aio.channel.ChanClosed:
+                    break
+                await stream.aclose()
+
+
+def _mime_type(opts: _TTSOptions) -> str:
+    """pcm_* audio is sliced into frames by the AudioEmitter as is, everything else is decoded as mp3"""
+    return "audio/pcm" if opts.encoding.startswith("pcm_") else "audio/mp3"
+
+
+async def _synthesize_chunks(
+    session: aiohttp.ClientSession,
+    opts: _TTSOptions,
+    text: str,
+    *,
+    next_text: NotGivenOr[str],
+    previous_text: NotGivenOr[str],
+    conn_options: APIConnectOptions,
+) -> AsyncIterable[bytes]:
+    """One /stream request with next_text/previous_text, yields the encoded audio as it arrives"""
+    voice_settings = (
+        _strip_nones(dataclasses.asdict(opts.voice_settings))
+        if is_given(opts.voice_settings)
+        else None
+    )
+    
+    data = {
+        "text": text,
+        "model_id": opts.model,
+        "voice_settings": voice_settings,
+    }
+    
+    if is_given(next_text):
+        data["text"] = f"\"{data['text']}\""
+        data["next_text"] = next_text
+        logger.info(f"data: {data}")
+    
+    if is_given(previous_text):
+        data["previous_text"] = previous_text
+
+    try:
+        async with session.post(
+            _synthesize_url(opts),
+            headers={"xi-api-key": opts.api_key},
+            json=data,
+            timeout=aiohttp.ClientTimeout(
+                total=30,
+                sock_connect=conn_options.timeout,
+            ),
+        ) as resp:
+            resp.raise_for_status()
+            if not resp.content_type.startswith("audio/"):
+                content = await resp.text()
+                raise APIError(message="11labs returned non-audio data", body=content)
+            async for bytes_data, _ in resp.content.iter_chunks():
+                yield bytes_data
+    except asyncio.TimeoutError as e:
+        raise APITimeoutError() from e
+    except aiohttp.ClientResponseError as e:
+        raise APIStatusError(
+            message=e.message,
+            status_code=e.status,
+            request_id=None,
+            body=None,
+        ) from e
+    except APIError:
+        raise
+    except Exception as e:
+        raise APIConnectionError() from e
+
+
 class ExtendedChunkedStream(ChunkedStream):
-    async def _run(self) -> None:
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
         """We added next_text to the data dictionary"""
-        request_id = utils.shortuuid()
-        voice_settings = (
-            _strip_nones(dataclasses.asdict(self._opts.voice_settings))
-            if is_given(self._opts.voice_settings)
-            else None
-        )
-        
-        data = {
-            "text": self._input_text,
-            "model_id": self._opts.model,
-            "voice_settings": voice_settings,
-        }
-        
-        next_text = getattr(self._tts, '_next_text', NOT_GIVEN)
-        if is_given(next_text):
-            data["text"] = f"\"{data['text']}\""
-            data["next_text"] = next_text
-            logger.info(f"data: {data}")
-            
-        decoder = utils.codecs.AudioStreamDecoder(
+        previous_text = getattr(self, '_previous_text', NOT_GIVEN)
+        if not is_given(previous_text):
+            previous_text = getattr(self._tts, '_previous_text', NOT_GIVEN)
+
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
             sample_rate=self._opts.sample_rate,
             num_channels=1,
+            mime_type=_mime_type(self._opts),
         )
+        async for bytes_data in _synthesize_chunks(
+            self._tts._ensure_session(),
+            self._opts,
+            self._input_text,
+            next_text=getattr(self._tts, '_next_text', NOT_GIVEN),
+            previous_text=previous_text,
+            conn_options=self._conn_options,
+        ):
+            output_emitter.push(bytes_data)
+        output_emitter.flush()
+
+
+class TTSHTTPPool:
+    """
+    aiohttp session shared by all ElevenLabs TTS instances of the process,
+    so a new room reuses an open TLS connection instead of opening its own.
+    aiohttp sessions are bound to an event loop, so one session is kept per
+    running loop (a thread-executor worker runs each job on its own loop).
+    """
+
+    def __init__(
+        self,
+        *,
+        base_url: str = API_BASE_URL_V1,
+        limit: int = TTS_HTTP_POOL_SIZE,
+        limit_per_host: int = TTS_HTTP_POOL_SIZE_PER_HOST,
+        keepalive_timeout: float = TTS_HTTP_KEEPALIVE_TIMEOUT,
+        health_interval: float = TTS_HTTP_HEALTH_INTERVAL,
+    ) -> None:
+        self.base_url = base_url
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.health_interval = health_interval
+        self._sessions = weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]()
+        self._health_tasks = weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]()
+
+    def session(self) -> aiohttp.ClientSession:
+        """Session for the running loop, (re)created if missing or closed"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+                enable_cleanup_closed=True,
+            )
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[loop] = session
+        return session
 
-        decode_task = None
+    async def ping(self, api_key: str | None = None) -> bool:
+        """Cheap authenticated request that opens (or keeps open) a pooled connection"""
+        api_key = api_key or os.environ.get("ELEVEN_API_KEY") or os.environ.get("ELEVENLABS_API_KEY")
+        headers = {"xi-api-key": api_key} if api_key else {}
         try:
-            async with self._session.post(
-                _synthesize_url(self._opts),
-                headers={"xi-api-key": self._opts.api_key},
-                json=data,
-                timeout=aiohttp.ClientTimeout(
-                    total=30,
-                    sock_connect=self._conn_options.timeout,
-                ),
+            async with self.session().get(
+                f"{self.base_url}/models",
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=10),
             ) as resp:
-                if not resp.content_type.startswith("audio/"):
-                    content = await resp.text()
-                    print(f"11labs returned non-audio data: {content}")
-                    return
-
-                async def _decode_loop():
-                    try:
-                        async for bytes_data, _ in resp.content.iter_chunks():
-                            decoder.push(bytes_data)
-                    finally:
-                        decoder.end_input()
-
-                decode_task = asyncio.create_task(_decode_loop())
-                emitter = tts.SynthesizedAudioEmitter(
-                    event_ch=self._event_ch,
-                    request_id=request_id,
-                )
-                async for frame in decoder:
-                    emitter.push(frame)
-                emitter.flush()
-        except asyncio.TimeoutError as e:
-            raise APITimeoutError() from e
-        except aiohttp.ClientResponseError as e:
-            raise APIStatusError(
-                message=e.message,
-                status_code=e.status,
-                request_id=None,
-                body=None,
-            ) from e
+                await resp.read()
+                return resp.status < 500
         except Exception as e:
-            raise APIConnectionError() from e
-        finally:
-            if decode_task:
-                await utils.aio.gracefully_cancel(decode_task)
-            await decoder.aclose()
+            logger.warning(f"ElevenLabs HTTP pool ping failed: {e}")
+            return False
+
+    async def warmup(self, api_key: str | None = None) -> None:
+        """Open a connection ahead of the first utterance and keep it healthy while idle"""
+        t0 = time.perf_counter()
+        ok = await self.ping(api_key)
+        logger.info(f"ElevenLabs HTTP pool warmup {'ok' if ok else 'failed'} in {time.perf_counter() - t0:.3f}s")
+        loop = asyncio.get_running_loop()
+        task = self._health_tasks.get(loop)
+        if task is None or task.done():
+            self._health_tasks[loop] = asyncio.create_task(self._health_loop(api_key))
+
+    async def _health_loop(self, api_key: str | None) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            # a failed ping is only logged: the session is held by every TTS built from
+            # session(), closing it would break them; the connector drops dead sockets itself
+            await self.ping(api_key)
+
+    async def aclose(self) -> None:
+        """Close the session of the running loop"""
+        loop = asyncio.get_running_loop()
+        task = self._health_tasks.pop(loop, None)
+        if task is not None:
+            await utils.aio.cancel_and_wait(task)
+        session = self._sessions.pop(loop, None)
+        if session is not None:
+            await session.close()
+
+    def close_at_exit(self) -> None:
+        """Close the sessions of loops that are no longer running, registered with atexit"""
+        for loop in list(self._sessions.keys()):
+            if loop.is_closed() or loop.is_running():
+                continue
+            try:
+                loop.run_until_complete(self.aclose())
+            except Exception as e:
+                logger.warning(f"ElevenLabs HTTP pool close at exit failed: {e}")
+
+
+tts_http_pool = TTSHTTPPool()
+atexit.register(tts_http_pool.close_at_exit)
 
 
 class StreamingFalseNextTextTTS(TTS):
@@ -164,6 +520,8 @@ class StreamingFalseNextTextTTS(TTS):
         http_session: aiohttp.ClientSession | None = None,
         language: NotGivenOr[str] = NOT_GIVEN,
         next_text: NotGivenOr[str] = NOT_GIVEN,
+        enable_logging: bool = True,
+        apply_text_normalization: Literal["auto", "off", "on"] = "auto",
     ) -> None:
         """
         Create a new instance of ElevenLabs TTS.
@@ -181,6 +539,8 @@ class StreamingFalseNextTextTTS(TTS):
             chunk_length_schedule (NotGivenOr[list[int]]): Schedule for chunk lengths, ranging from 50 to 500. Defaults are [120, 160, 250, 290].
             http_session (aiohttp.ClientSession | None): Custom HTTP session for API requests. Optional.
             language (NotGivenOr[str]): Language code for the TTS model, as of 10/24/24 only valid for "eleven_turbo_v2_5".
+            enable_logging (bool): Enable logging of the request. When set to false, zero retention mode will be used. Defaults to True.
+            apply_text_normalization (Literal["auto", "off", "on"]): Text normalization mode. Defaults to "auto".
         """  # noqa: E501
 
         """streaming = False and add next_text"""
@@ -221,11 +581,25 @@ class StreamingFalseNextTextTTS(TTS):
             word_tokenizer=word_tokenizer,
             chunk_length_schedule=chunk_length_schedule,
             enable_ssml_parsing=enable_ssml_parsing,
+            enable_logging=enable_logging,
             language=language,
             inactivity_timeout=inactivity_timeout,
+            # no word alignment is requested, words are sent one by one (not auto_mode)
+            sync_alignment=False,
+            apply_text_normalization=apply_text_normalization,
+            preferred_alignment="normalized",
+            auto_mode=False,
         )
         self._session = http_session
         self._streams = weakref.WeakSet[SynthesizeStream]()
+        # used by the plugin's update_options/aclose, this class never opens the plugin's websocket
+        self._current_connection = None
+        self._connection_lock = asyncio.Lock()
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if not self._session:
+            self._session = tts_http_pool.session()
+        return self._session
     
     def update_options(
         self,
@@ -235,6 +609,7 @@ class StreamingFalseNextTextTTS(TTS):
         model: NotGivenOr[str] = NOT_GIVEN,
         language: NotGivenOr[str] = NOT_GIVEN,
         next_text: NotGivenOr[str] = NOT_GIVEN,
+        encoding: NotGivenOr[TTSEncoding | str] = NOT_GIVEN,
     ) -> None:
         super().update_options(
             voice_id=voice_id,
@@ -244,17 +619,860 @@ class StreamingFalseNextTextTTS(TTS):
         )
         if is_given(next_text):
             self._next_text = next_text
+        if is_given(encoding):
+            # the output sample rate is fixed at construction
+            assert _sample_rate_from_format(encoding) == self.sample_rate, "encoding must keep the sample rate"
+            self._opts.encoding = encoding
     
     def synthesize(
         self,
         text: str,
         *,
         conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        previous_text: NotGivenOr[str] = NOT_GIVEN,
     ) -> ExtendedChunkedStream:
-        return ExtendedChunkedStream(
+        stream = ExtendedChunkedStream(
             tts=self,
             input_text=text,
             conn_options=conn_options,
-            opts=self._opts,
-            session=self._ensure_session(),
         )
+        stream._previous_text = previous_text
+        return stream
+
+
+class _MultiStreamConnection:
+    """
+    One ElevenLabs multi-context websocket, kept open for a whole session.
+    Every utterance gets its own context_id; audio is routed to the
+    utterance's queue as bytes, None marks the end, an exception a failure.
+    """
+
+    def __init__(self, opts: _TTSOptions, session: aiohttp.ClientSession) -> None:
+        self._opts = opts
+        self._session = session
+        self._ws: aiohttp.ClientWebSocketResponse | None = None
+        self._recv_task: asyncio.Task | None = None
+        self._contexts: dict[str, asyncio.Queue] = {}
+        self._send_lock = asyncio.Lock()
+
+    @property
+    def closed(self) -> bool:
+        return self._ws is None or self._ws.closed
+
+    async def connect(self) -> None:
+        self._ws = await self._session.ws_connect(
+            _multi_stream_url(self._opts),
+            headers={"xi-api-key": self._opts.api_key},
+        )
+        self._recv_task = asyncio.create_task(self._recv_loop())
+
+    def open_context(self, context_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._contexts[context_id] = queue
+        return queue
+
+    async def send(self, packet: dict) -> None:
+        async with self._send_lock:
+            await self._ws.send_str(json.dumps(packet))
+
+    async def drop_context(self, context_id: str) -> None:
+        """Stop generation for an interrupted utterance and ignore its remaining audio"""
+        if self._contexts.pop(context_id, None) is not None and not self.closed:
+            await self.send({"context_id": context_id, "close_context": True})
+
+    async def _recv_loop(self) -> None:
+        error: Exception = APIConnectionError("11labs websocket closed")
+        try:
+            while True:
+                msg = await self._ws.receive()
+                if msg.type in (
+                    aiohttp.WSMsgType.CLOSED,
+                    aiohttp.WSMsgType.CLOSE,
+                    aiohttp.WSMsgType.CLOSING,
+                ):
+                    break
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    logger.warning("unexpected 11labs message type %s", msg.type)
+                    continue
+
+                data = json.loads(msg.data)
+                context_id = data.get("contextId")
+                queue = self._contexts.get(context_id)
+                if data.get("error"):
+                    api_error = APIStatusError(
+                        message=data["error"], status_code=500, request_id=context_id, body=None
+                    )
+                    if not context_id:
+                        # not tied to a context: the socket itself is unusable
+                        error = api_error
+                        break
+                    if queue is None:
+                        # dropped or already finished context, the others are unaffected
+                        logger.warning(f"11labs error for closed context {context_id}: {data['error']}")
+                        continue
+                    queue.put_nowait(api_error)
+                    self._contexts.pop(context_id, None)
+                    continue
+                if queue is None:
+                    continue  # dropped context
+                if data.get("audio"):
+                    queue.put_nowait(base64.b64decode(data["audio"]))
+                if data.get("isFinal"):
+                    queue.put_nowait(None)
+                    self._contexts.pop(context_id, None)
+        except Exception as e:
+            error = APIConnectionError(f"11labs websocket failed: {e}")
+        finally:
+            # Utterances still open cannot finish on this socket
+            for queue in self._contexts.values():
+                queue.put_nowait(error)
+            self._contexts.clear()
+
+    async def aclose(self) -> None:
+        if not self.closed:
+            try:
+                await self.send({"close_socket": True})
+            except Exception:
+                pass
+            await self._ws.close()
+        if self._recv_task:
+            await utils.aio.gracefully_cancel(self._recv_task)
+
+
+class NextTextSynthesizeStream(tts.SynthesizeStream):
+    """
+    Streams LLM text into an ElevenLabs context word by word as it arrives.
+    Each flushed segment is one context on the TTS's shared websocket; the
+    websocket protocol has no next_text/previous_text, so segments spoken
+    while next_text is set go through ExtendedChunkedStream instead.
+    """
+
+    def __init__(
+        self,
+        *,
+        tts: "StreamingNextTextTTS",
+        conn_options: APIConnectOptions,
+    ):
+        super().__init__(tts=tts, conn_options=conn_options)
+        self._opts = tts._opts
+
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        request_id = utils.shortuuid()
+        output_emitter.initialize(
+            request_id=request_id,
+            sample_rate=self._opts.sample_rate,
+            num_channels=1,
+            mime_type=_mime_type(self._opts),
+            stream=True,
+        )
+        segments_ch = utils.aio.Chan[tokenize.WordStream]()
+
+        @utils.log_exceptions(logger=logger)
+        async def _tokenize_input():
+            """tokenize text from the input_ch to words, one word stream per segment"""
+            word_stream = None
+            async for data in self._input_ch:
+                if isinstance(data, str):
+                    if word_stream is None:
+                        word_stream = self._opts.word_tokenizer.stream()
+                        segments_ch.send_nowait(word_stream)
+                    word_stream.push_text(data)
+                elif isinstance(data, self._FlushSentinel):
+                    if word_stream is not None:
+                        word_stream.end_input()
+                    word_stream = None
+            if word_stream is not None:
+                word_stream.end_input()
+            segments_ch.close()
+
+        @utils.log_exceptions(logger=logger)
+        async def _process_segments():
+            async for word_stream in segments_ch:
+                if is_given(self._tts._next_text):
+                    await self._run_http(word_stream, output_emitter)
+                else:
+                    await self._run_ws(word_stream, output_emitter)
+
+        tasks = [
+            asyncio.create_task(_tokenize_input()),
+            asyncio.create_task(_process_segments()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.TimeoutError as e:
+            raise APITimeoutError() from e
+        except aiohttp.ClientResponseError as e:
+            raise APIStatusError(
+                message=e.message,
+                status_code=e.status,
+                request_id=request_id,
+                body=None,
+            ) from e
+        except APIError:
+            raise
+        except Exception as e:
+            raise APIConnectionError() from e
+        finally:
+            await utils.aio.gracefully_cancel(*tasks)
+
+    async def _run_ws(self, word_stream: tokenize.WordStream, output_emitter: tts.AudioEmitter) -> None:
+        connection = await self._tts._multi_stream_connection(self._conn_options.timeout)
+        context_id = utils.shortuuid()
+        queue = connection.open_context(context_id)
+        spoken: list[str] = []
+        finished = False
+
+        # first packet of a context carries its settings
+        init_pkt = {
+            "text": " ",
+            "context_id": context_id,
+            "voice_settings": _strip_nones(dataclasses.asdict(self._opts.voice_settings))
+            if is_given(self._opts.voice_settings)
+            else None,
+            "generation_config": {
+                "chunk_length_schedule": self._opts.chunk_length_schedule
+                if is_given(self._opts.chunk_length_schedule)
+                else LOW_LATENCY_CHUNK_LENGTH_SCHEDULE
+            },
+        }
+        await connection.send(init_pkt)
+        output_emitter.start_segment(segment_id=context_id)
+
+        @utils.log_exceptions(logger=logger)
+        async def send_task():
+            async for data in word_stream:
+                spoken.append(data.token)
+                self._mark_started()
+                await connection.send({"text": f"{data.token} ", "context_id": context_id})
+            # generate whatever is buffered, then let the server finish the context
+            await connection.send({"context_id": context_id, "flush": True})
+            await connection.send({"context_id": context_id, "close_context": True})
+
+        @utils.log_exceptions(logger=logger)
+        async def recv_task():
+            nonlocal finished
+            while True:
+                item = await queue.get()
+                if item is None:
+                    finished = True
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                output_emitter.push(item)
+
+        tasks = [
+            asyncio.create_task(send_task()),
+            asyncio.create_task(recv_task()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await utils.aio.gracefully_cancel(*tasks)
+            output_emitter.end_segment()
+            if not finished:
+                # interrupted or failed: don't pay for audio nobody will hear
+                try:
+                    await connection.drop_context(context_id)
+                except Exception:
+                    pass
+            if spoken:
+                self._tts._previous_text = " ".join(spoken)
+
+    async def _run_http(self, word_stream: tokenize.WordStream, output_emitter: tts.AudioEmitter) -> None:
+        text = " ".join([data.token async for data in word_stream])
+        if not text.strip():
+            return
+        self._mark_started()
+        output_emitter.start_segment(segment_id=utils.shortuuid())
+        try:
+            async for bytes_data in _synthesize_chunks(
+                self._tts._ensure_session(),
+                self._opts,
+                text,
+                next_text=self._tts._next_text,
+                previous_text=self._tts._previous_text,
+                conn_options=self._conn_options,
+            ):
+                output_emitter.push(bytes_data)
+        finally:
+            output_emitter.end_segment()
+        self._tts._previous_text = text
+
+
+class StreamingNextTextTTS(StreamingFalseNextTextTTS):
+    """
+    Streaming variant of StreamingFalseNextTextTTS: keeps one ElevenLabs
+    multi-context websocket per session and synthesizes LLM text as it
+    arrives instead of waiting for the whole reply. Each utterance's text
+    is kept as previous_text for the HTTP (next_text) path.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        kwargs.setdefault("inactivity_timeout", MULTI_STREAM_INACTIVITY_TIMEOUT)
+        super().__init__(**kwargs)
+        self._capabilities = tts.TTSCapabilities(streaming=True)
+        self._previous_text: NotGivenOr[str] = NOT_GIVEN
+        self._connection: _MultiStreamConnection | None = None
+        self._stale_connections: list[_MultiStreamConnection] = []
+        self._connection_lock = asyncio.Lock()
+
+    async def _close_stale_connections(self) -> None:
+        while self._stale_connections:
+            connection = self._stale_connections.pop()
+            try:
+                await connection.aclose()
+            except Exception as e:
+                logger.warning(f"closing replaced 11labs websocket failed: {e}")
+
+    async def _multi_stream_connection(self, timeout: float) -> _MultiStreamConnection:
+        async with self._connection_lock:
+            await self._close_stale_connections()
+            if self._connection is None or self._connection.closed:
+                connection = _MultiStreamConnection(self._opts, self._ensure_session())
+                await asyncio.wait_for(connection.connect(), timeout)
+                self._connection = connection
+            return self._connection
+
+    def update_options(self, **kwargs) -> None:
+        super().update_options(**kwargs)
+        if any(is_given(kwargs.get(k, NOT_GIVEN)) for k in ("voice_id", "model", "language", "encoding")):
+            # voice/model/language/encoding are fixed per websocket, reconnect on next utterance;
+            # the old socket is closed there (or in aclose), this method is sync
+            if self._connection is not None:
+                self._stale_connections.append(self._connection)
+                self._connection = None
+
+    def stream(
+        self,
+        *,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> NextTextSynthesizeStream:
+        stream = NextTextSynthesizeStream(tts=self, conn_options=conn_options)
+        self._streams.add(stream)
+        return stream
+
+    async def aclose(self) -> None:
+        await super().aclose()
+        await self._close_stale_connections()
+        if self._connection is not None:
+            await self._connection.aclose()
+            self._connection = None
+
+
+def _multi_stream_url(opts: _TTSOptions) -> str:
+    url = (
+        f"{opts.base_url}/text-to-speech/{opts.voice_id}/multi-stream-input?"
+        f"model_id={opts.model}&output_format={opts.encoding}&"
+        f"enable_ssml_parsing={str(opts.enable_ssml_parsing).lower()}&"
+        f"inactivity_timeout={opts.inactivity_timeout}"
+    )
+    if is_given(opts.language):
+        url += f"&language_code={opts.language}"
+    return url
+
+
+@dataclass
+class CachedPhrase:
+    """Decoded 16-bit PCM of one synthesized phrase"""
+    pcm: bytes
+    sample_rate: int
+    num_channels: int
+
+    _HEADER = struct.Struct("<IH")
+
+    def to_bytes(self) -> bytes:
+        return self._HEADER.pack(self.sample_rate, self.num_channels) + self.pcm
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CachedPhrase":
+        sample_rate, num_channels = cls._HEADER.unpack_from(data)
+        return cls(pcm=data[cls._HEADER.size:], sample_rate=sample_rate, num_channels=num_channels)
+
+
+class PhraseAudioStore(Protocol):
+    """Second cache tier, persists phrases across jobs and processes"""
+
+    async def get(self, key: str) -> CachedPhrase | None: ...
+
+    async def put(self, key: str, phrase: CachedPhrase) -> None: ...
+
+
+class DiskPhraseStore:
+    def __init__(self, root: str | Path) -> None:
+        self._root = Path(root)
+
+    async def get(self, key: str) -> CachedPhrase | None:
+        path = self._root / f"{key}.pcm"
+
+        def _read() -> bytes | None:
+            try:
+                return path.read_bytes()
+            except FileNotFoundError:
+                return None
+
+        data = await asyncio.to_thread(_read)
+        return CachedPhrase.from_bytes(data) if data else None
+
+    async def put(self, key: str, phrase: CachedPhrase) -> None:
+        path = self._root / f"{key}.pcm"
+
+        def _write() -> None:
+            self._root.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(phrase.to_bytes())
+            os.replace(tmp_path, path)
+
+        await asyncio.to_thread(_write)
+
+
+class S3PhraseStore:
+    """Stores phrases through vendors.s3.AsyncS3 (JSON objects with base64 PCM)"""
+
+    def __init__(self, s3, prefix: str = "tts_cache") -> None:
+        self._s3 = s3
+        self._prefix = prefix
+
+    async def get(self, key: str) -> CachedPhrase | None:
+        data = await self._s3.load_file(f"{self._prefix}/{key}.json")
+        if not data:
+            return None
+        return CachedPhrase.from_bytes(base64.b64decode(data["phrase"]))
+
+    async def put(self, key: str, phrase: CachedPhrase) -> None:
+        await self._s3.save_file(
+            f"{self._prefix}/{key}.json",
+            {"phrase": base64.b64encode(phrase.to_bytes()).decode("ascii")},
+        )
+
+
+class PhraseAudioCache:
+    """
+    Process-wide cache of synthesized phrases: an in-memory LRU of decoded
+    PCM bounded by max_bytes, backed by an optional PhraseAudioStore.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int = 64 * 1024 * 1024,
+        store: PhraseAudioStore | None = None,
+    ) -> None:
+        self._max_bytes = max_bytes
+        self._store = store
+        self._memory: OrderedDict[str, CachedPhrase] = OrderedDict()
+        self._memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def make_key(
+        *,
+        voice_id: str,
+        model: str,
+        voice_settings: dict | None,
+        text: str,
+        next_text: str | None,
+        encoding: str = "",
+    ) -> str:
+        payload = json.dumps(
+            [voice_id, model, voice_settings, normalize_phrase(text), next_text, encoding],
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "bytes_saved": self.bytes_saved,
+            "memory_bytes": self._memory_bytes,
+            "memory_entries": len(self._memory),
+        }
+
+    async def get(self, key: str) -> CachedPhrase | None:
+        phrase = self._memory.get(key)
+        if phrase is not None:
+            self._memory.move_to_end(key)
+        elif self._store is not None:
+            try:
+                phrase = await self._store.get(key)
+            except Exception as e:
+                logger.warning(f"tts cache store read failed: {e}")
+            if phrase is not None:
+                self._remember(key, phrase)
+
+        if phrase is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.bytes_saved += len(phrase.pcm)
+        return phrase
+
+    async def put(self, key: str, phrase: CachedPhrase) -> None:
+        self._remember(key, phrase)
+        if self._store is not None:
+            try:
+                await self._store.put(key, phrase)
+            except Exception as e:
+                logger.warning(f"tts cache store write failed: {e}")
+
+    def _remember(self, key: str, phrase: CachedPhrase) -> None:
+        if len(phrase.pcm) > self._max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old.pcm)
+        self._memory[key] = phrase
+        self._memory_bytes += len(phrase.pcm)
+        while self._memory_bytes > self._max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.pcm)
+
+
+def normalize_phrase(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class CachedChunkedStream(tts.ChunkedStream):
+    """Plays a phrase from the cache, or synthesizes it with the wrapped TTS and stores it"""
+
+    def __init__(
+        self,
+        *,
+        tts: "CachedTTS",
+        input_text: str,
+        conn_options: APIConnectOptions,
+    ) -> None:
+        super().__init__(tts=tts, input_text=input_text, conn_options=conn_options)
+        self._cached_tts = tts
+
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        cached_tts = self._cached_tts
+        key = cached_tts._cache_key(self._input_text)
+
+        phrase = await cached_tts._cache.get(key) if key else None
+        if phrase is not None:
+            cached_tts.hits += 1
+            cached_tts.bytes_saved += len(phrase.pcm)
+            output_emitter.initialize(
+                request_id=utils.shortuuid(),
+                sample_rate=phrase.sample_rate,
+                num_channels=phrase.num_channels,
+                mime_type="audio/pcm",
+            )
+            output_emitter.push(phrase.pcm)
+            output_emitter.flush()
+            return
+
+        if key:
+            cached_tts.misses += 1
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
+            sample_rate=cached_tts.sample_rate,
+            num_channels=cached_tts.num_channels,
+            mime_type="audio/pcm",
+        )
+        # retries are handled by this stream, not the inner one
+        inner_options = dataclasses.replace(self._conn_options, max_retry=0)
+        pcm = bytearray()
+        async with cached_tts._tts.synthesize(self._input_text, conn_options=inner_options) as stream:
+            async for ev in stream:
+                data = ev.frame.data.tobytes()
+                output_emitter.push(data)
+                pcm += data
+        output_emitter.flush()
+
+        if key and pcm:
+            await cached_tts._cache.put(
+                key,
+                CachedPhrase(pcm=bytes(pcm), sample_rate=cached_tts.sample_rate, num_channels=cached_tts.num_channels),
+            )
+
+
+class CachedTTS(tts.TTS):
+    """
+    Wraps any TTS and serves repeated short phrases (fallback apologies,
+    goodbyes, silence nudges, fillers) from a PhraseAudioCache instead of
+    re-synthesizing them. Only synthesize() is cached; stream() is passed through,
+    so callers that want the cache (the worker's opening script, SpeculativeEnding)
+    synthesize the whole phrase and hand the frames to session.say(audio=...).
+    hits/misses/bytes_saved count this instance only, for per-session reporting.
+    """
+
+    def __init__(
+        self,
+        tts: tts.TTS,
+        *,
+        cache: PhraseAudioCache,
+        max_phrase_chars: int = 160,
+    ) -> None:
+        super().__init__(
+            capabilities=tts.capabilities,
+            sample_rate=tts.sample_rate,
+            num_channels=tts.num_channels,
+        )
+        self._tts = tts
+        self._cache = cache
+        self._max_phrase_chars = max_phrase_chars
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._tts.on("metrics_collected", lambda metrics: self.emit("metrics_collected", metrics))
+        self._tts.on("error", lambda error: self.emit("error", error))
+
+    def _cache_key(self, text: str) -> str | None:
+        """None means the phrase is too long to be worth caching"""
+        if len(text) > self._max_phrase_chars:
+            return None
+        opts = getattr(self._tts, "_opts", None)
+        voice_settings = getattr(opts, "voice_settings", NOT_GIVEN)
+        next_text = getattr(self._tts, "_next_text", NOT_GIVEN)
+        return self._cache.make_key(
+            voice_id=getattr(opts, "voice_id", self._tts.label),
+            model=getattr(opts, "model", ""),
+            voice_settings=_strip_nones(dataclasses.asdict(voice_settings))
+            if is_given(voice_settings)
+            else None,
+            text=text,
+            next_text=next_text if is_given(next_text) else None,
+            encoding=getattr(opts, "encoding", ""),
+        )
+
+    def synthesize(
+        self,
+        text: str,
+        *,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> CachedChunkedStream:
+        return CachedChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+    def stream(
+        self,
+        *,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> tts.SynthesizeStream:
+        return self._tts.stream(conn_options=conn_options)
+
+    @property
+    def model(self) -> str:
+        return self._tts.model
+
+    @property
+    def provider(self) -> str:
+        return self._tts.provider
+
+    def report(self, grafana) -> None:
+        """Export this instance's cache counters through vendors.grafana.Grafana"""
+        total = self.hits + self.misses
+        grafana.add("tts_cache_hits", "gauge", self.hits)
+        grafana.add("tts_cache_misses", "gauge", self.misses)
+        grafana.add("tts_cache_hit_rate", "gauge", self.hits / total if total else 0.0)
+        grafana.add("tts_cache_bytes_saved", "gauge", self.bytes_saved, "By")
+
+    def prewarm(self) -> None:
+        self._tts.prewarm()
+
+    def update_options(self, **kwargs) -> None:
+        self._tts.update_options(**kwargs)
+
+    async def aclose(self) -> None:
+        await self._tts.aclose()
+
+
+tts_phrase_cache = PhraseAudioCache()
+
+
+# Session-level latency budget: step down to a faster model/encoding above it
+TTS_TTFB_BUDGET = 0.8
+TTS_TELEMETRY_WINDOW = 20
+TTS_POLICY_MIN_SAMPLES = 5
+# Applied in order, steps that don't change anything or change the sample rate are skipped
+TTS_DOWNGRADE_LADDER: list[dict[str, str]] = [
+    {"model": "eleven_flash_v2_5"},
+    {"encoding": "mp3_44100_64"},
+    {"encoding": "mp3_44100_32"},
+]
+
+
+def _unwrap_tts(tts_instance: tts.TTS) -> tts.TTS:
+    # CachedTTS and other wrappers keep the ElevenLabs options on the wrapped TTS
+    while not hasattr(tts_instance, "_opts") and hasattr(tts_instance, "_tts"):
+        tts_instance = tts_instance._tts
+    return tts_instance
+
+
+def _tts_opts(tts_instance: tts.TTS):
+    return getattr(_unwrap_tts(tts_instance), "_opts", None)
+
+
+def _encoding_bytes_per_second(encoding: str) -> float:
+    """Payload size per audio second, mp3 is CBR so it follows from the bitrate"""
+    parts = encoding.split("_")
+    if parts[0] == "pcm":
+        return int(parts[1]) * 2
+    if parts[0] == "mp3" and len(parts) == 3:
+        return int(parts[2]) * 1000 / 8
+    return 128 * 1000 / 8  # plain mp3_44100 is 128 kbps
+
+
+@dataclass
+class TTSSample:
+    ttfb: float
+    duration: float
+    audio_duration: float
+    bytes: int
+    error: bool = False
+
+
+class TTSTelemetry:
+    """
+    Time-to-first-byte, synth time, payload bytes and errors per
+    (voice_id, model, encoding), fed from the TTS `metrics_collected` and
+    `error` events. Keeps a rolling window per key plus running totals.
+    One instance per session, so reports only carry that session's samples.
+    """
+
+    def __init__(self, *, window: int = TTS_TELEMETRY_WINDOW) -> None:
+        self._window = window
+        self._samples: dict[tuple[str, str, str], deque[TTSSample]] = {}
+        self._totals: dict[tuple[str, str, str], dict[str, float]] = {}
+
+    @staticmethod
+    def key_for(tts_instance: tts.TTS) -> tuple[str, str, str]:
+        opts = _tts_opts(tts_instance)
+        return (
+            str(getattr(opts, "voice_id", tts_instance.label)),
+            str(getattr(opts, "model", "")),
+            str(getattr(opts, "encoding", "")),
+        )
+
+    def attach(self, tts_instance: tts.TTS) -> None:
+        def _on_metrics(ev: TTSMetrics) -> None:
+            key = self.key_for(tts_instance)
+            self.record(
+                key,
+                TTSSample(
+                    ttfb=ev.ttfb,
+                    duration=ev.duration,
+                    audio_duration=ev.audio_duration,
+                    bytes=int(ev.audio_duration * _encoding_bytes_per_second(key[2])),
+                ),
+            )
+
+        def _on_error(ev) -> None:
+            self.record(self.key_for(tts_instance), TTSSample(-1.0, 0.0, 0.0, 0, error=True))
+
+        tts_instance.on("metrics_collected", _on_metrics)
+        tts_instance.on("error", _on_error)
+
+    def record(self, key: tuple[str, str, str], sample: TTSSample) -> None:
+        self._samples.setdefault(key, deque(maxlen=self._window)).append(sample)
+        totals = self._totals.setdefault(key, {"requests": 0, "errors": 0, "bytes": 0, "audio_seconds": 0.0})
+        totals["requests"] += 1
+        totals["errors"] += sample.error
+        totals["bytes"] += sample.bytes
+        totals["audio_seconds"] += sample.audio_duration
+
+    def stats(self, key: tuple[str, str, str]) -> dict[str, float]:
+        samples = self._samples.get(key, ())
+        ttfbs = sorted(s.ttfb for s in samples if not s.error and s.ttfb >= 0)
+        durations = sorted(s.duration for s in samples if not s.error)
+        return {
+            "samples": len(samples),
+            "ttfb_p50": ttfbs[len(ttfbs) // 2] if ttfbs else 0.0,
+            "ttfb_p95": ttfbs[min(len(ttfbs) - 1, int(len(ttfbs) * 0.95))] if ttfbs else 0.0,
+            "duration_p50": durations[len(durations) // 2] if durations else 0.0,
+            "error_rate": sum(s.error for s in samples) / len(samples) if samples else 0.0,
+            **self._totals.get(key, {}),
+        }
+
+    def report(self, grafana) -> None:
+        """Export per-voice stats of this session through vendors.grafana.Grafana"""
+        for key in self._samples:
+            voice_id, model, encoding = key
+            attributes = {"voice_id": voice_id, "tts_model": model, "tts_encoding": encoding}
+            stats = self.stats(key)
+            grafana.add("tts_ttfb_p50", "gauge", stats["ttfb_p50"], "s", attributes=attributes)
+            grafana.add("tts_ttfb_p95", "gauge", stats["ttfb_p95"], "s", attributes=attributes)
+            grafana.add("tts_synth_duration_p50", "gauge", stats["duration_p50"], "s", attributes=attributes)
+            grafana.add("tts_requests", "gauge", stats["requests"], attributes=attributes)
+            grafana.add("tts_errors", "gauge", stats["errors"], attributes=attributes)
+            grafana.add("tts_bytes", "gauge", stats["bytes"], "By", attributes=attributes)
+
+
+
+class AdaptiveTTSPolicy:
+    """
+    Steps one TTS instance down TTS_DOWNGRADE_LADDER while the rolling
+    median TTFB of its current (voice, model, encoding) exceeds the budget.
+    Switching changes the telemetry key, so every step is judged on fresh
+    samples only. Applied steps are kept in `downgrades` for reporting.
+    """
+
+    def __init__(
+        self,
+        tts_instance: tts.TTS,
+        telemetry: TTSTelemetry,
+        *,
+        ttfb_budget: float = TTS_TTFB_BUDGET,
+        min_samples: int = TTS_POLICY_MIN_SAMPLES,
+        ladder: list[dict[str, str]] | None = None,
+    ) -> None:
+        self.tts = tts_instance
+        self.telemetry = telemetry
+        self.ttfb_budget = ttfb_budget
+        self.min_samples = min_samples
+        self.ladder = list(TTS_DOWNGRADE_LADDER if ladder is None else ladder)
+        if isinstance(_unwrap_tts(tts_instance), StreamingFalseNextTextTTS):
+            # raw PCM is sliced into frames by the AudioEmitter, skipping mp3 decoding entirely
+            self.ladder = [step for step in self.ladder if "encoding" not in step]
+            self.ladder.append({"encoding": f"pcm_{tts_instance.sample_rate}"})
+        self.downgrades: list[dict[str, str]] = []
+        # registered after telemetry.attach, so the sample is already recorded
+        tts_instance.on("metrics_collected", self._on_metrics)
+
+    def _on_metrics(self, ev: TTSMetrics) -> None:
+        stats = self.telemetry.stats(self.telemetry.key_for(self.tts))
+        if stats["samples"] < self.min_samples or stats["ttfb_p50"] <= self.ttfb_budget:
+            return
+        while self.ladder:
+            step = self.ladder.pop(0)
+            if self._apply(step):
+                logger.warning(
+                    f"🟡 TTS ttfb p50 {stats['ttfb_p50']:.3f}s over {self.ttfb_budget:.3f}s budget, switching to {step}"
+                )
+                self.downgrades.append(step)
+                return
+
+    def _apply(self, step: dict[str, str]) -> bool:
+        target = _unwrap_tts(self.tts)
+        opts = getattr(target, "_opts", None)
+        if opts is None:
+            return False
+        model = step.get("model")
+        encoding = step.get("encoding")
+        if model is not None and model != opts.model:
+            self.tts.update_options(model=model)
+            return True
+        if encoding is not None and encoding != opts.encoding:
+            if _sample_rate_from_format(encoding) != self.tts.sample_rate:
+                return False
+            if isinstance(target, StreamingFalseNextTextTTS):
+                target.update_options(encoding=encoding)
+            else:
+                # the plugin's update_options has no encoding, so retire its open websocket
+                # the same way update_options does, it keeps the old output_format otherwise
+                opts.encoding = encoding
+                connection = getattr(target, "_current_connection", None)
+                if connection is not None:
+                    connection.mark_non_current()
+                    target._current_connection = None
+            return True
+        return False
@@ -19,9 +19,20 @@ from .memory import (
     UpdatableMemoryJSON,
     UserProfile,
 )
+from .memory_ingest import MemoryIngestQueue, MemoryMessage
+from .memory_retrieval import MemoryRetriever
 from .s3 import AsyncS3
 from .zep import ZepMemory
 
+
+def __getattr__(name: str):
+    # numpy and the local store are only imported by users of the local backend
+    if name == 'LocalMemory':
+        from .local_memory import LocalMemory
+
+        return LocalMemory
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 __all__ = [
     'Backend',
     'Engine',
@@ -44,4 +55,8 @@ __all__ = [
     'UpdatableMemoryJSON',
     'Mem0Memory',
     'ZepMemory',
+    'MemoryRetriever',
+    'MemoryIngestQueue',
+    'MemoryMessage',
+    'LocalMemory',
 ]
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import logging
 import time
+import weakref
+from collections import OrderedDict
 from typing import Annotated, Any, Literal
 
 import aiohttp
@@ -38,19 +41,413 @@ ExpAB = Annotated[bool | None, BeforeValidator(_coerce_boolish)]
 ExpABCPlus = Annotated[T | None, WrapValidator(_coerce_enumish)]
 
 
+# ============================================================================
+# Local evaluation
+# ============================================================================
+
+# condition operators evaluated in process, flags using anything else are assigned remotely
+LOCAL_OPERATORS = {"is", "is not", "contains", "does not contain"}
+# the only property of the evaluation target, flags selecting anything else are assigned remotely
+LOCAL_SELECTOR = ["context", "user", "user_id"]
+
+
+def _murmur3_32(data: bytes, seed: int = 0) -> int:
+    """MurmurHash3 x86_32, the bucketing hash of Amplitude Experiment"""
+    c1, c2, mask = 0xCC9E2D51, 0x1B873593, 0xFFFFFFFF
+    h = seed
+    n_blocks = len(data) // 4
+    for i in range(n_blocks):
+        k = int.from_bytes(data[4 * i : 4 * i + 4], "little")
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        k = (k * c2) & mask
+        h ^= k
+        h = ((h << 13) | (h >> 19)) & mask
+        h = (h * 5 + 0xE6546B64) & mask
+    tail = data[4 * n_blocks :]
+    if tail:
+        k = int.from_bytes(tail, "little")
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        k = (k * c2) & mask
+        h ^= k
+    h ^= len(data)
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & mask
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & mask
+    h ^= h >> 16
+    return h
+
+
+def _select(target: dict, selector: list[str] | None) -> Any:
+    value: Any = target
+    for key in selector or []:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _match_condition(target: dict, condition: dict) -> bool:
+    op, values = condition.get("op"), [str(v) for v in condition.get("values") or []]
+    value = _select(target, condition.get("selector"))
+    if value is None:
+        if op == "is":
+            return "(none)" in values
+        if op == "is not":
+            return "(none)" not in values
+        return False
+    value = str(value)
+    if op == "is":
+        return value in values
+    if op == "is not":
+        return value not in values
+    if op == "contains":
+        return any(v.lower() in value.lower() for v in values)
+    if op == "does not contain":
+        return all(v.lower() not in value.lower() for v in values)
+    return False
+
+
+def _bucket(target: dict, segment: dict) -> str | None:
+    bucket = segment.get("bucket")
+    if not bucket:
+        return segment.get("variant")
+    bucketing_value = _select(target, bucket.get("selector"))
+    if bucketing_value in (None, ""):
+        return segment.get("variant")
+    h = _murmur3_32(f"{bucket.get('salt', '')}/{bucketing_value}".encode("utf-8"))
+    allocation_value, distribution_value = h % 100, h // 100
+    for allocation in bucket.get("allocations") or []:
+        start, end = allocation["range"]
+        if start <= allocation_value < end:
+            for distribution in allocation.get("distributions") or []:
+                start, end = distribution["range"]
+                if start <= distribution_value < end:
+                    return distribution["variant"]
+    return segment.get("variant")
+
+
+def evaluate_flag(flag: dict, user_id: str) -> str | None:
+    """Variant key of a flag for a user, None when off / not in the experiment"""
+    target = {"context": {"user": {"user_id": user_id}}}
+    for segment in flag.get("segments") or []:
+        conditions = segment.get("conditions")
+        if conditions and not any(all(_match_condition(target, c) for c in group) for group in conditions):
+            continue
+        variant_key = _bucket(target, segment)
+        if variant_key is None:
+            continue
+        variant = (flag.get("variants") or {}).get(variant_key) or {}
+        if (variant.get("metadata") or {}).get("default"):
+            return None
+        return variant.get("key", variant_key)
+    return None
+
+
+def _is_local(flag: dict) -> bool:
+    if flag.get("dependencies"):
+        return False
+    for segment in flag.get("segments") or []:
+        bucket = segment.get("bucket")
+        if bucket and bucket.get("selector") != LOCAL_SELECTOR:
+            return False
+        for group in segment.get("conditions") or []:
+            for condition in group:
+                if condition.get("op") not in LOCAL_OPERATORS or condition.get("selector") != LOCAL_SELECTOR:
+                    return False
+    return True
+
+
+class AmplitudeFlags:
+    """
+    Flag configs of one deployment, refreshed every `poll_interval` seconds
+    in the background and evaluated in process. Assignments are cached per
+    (user, flag) until the configs change.
+    """
+
+    _shared: dict[str, AmplitudeFlags] = {}
+
+    def __init__(
+        self,
+        api_key: str,
+        url: str = "https://api.lab.amplitude.com/sdk/v2/flags",
+        poll_interval: float = 60.0,
+        max_cached_assignments: int = 10000,
+    ):
+        self.api_key = api_key
+        self.url = url
+        self.poll_interval = poll_interval
+        self.max_cached_assignments = max_cached_assignments
+        self.flags: dict[str, dict] | None = None
+        self._local: dict[str, bool] = {}
+        self._assignments: OrderedDict[tuple[str, str], str | None] = OrderedDict()
+        self._poll_task: asyncio.Task | None = None
+        self._ready: asyncio.Event | None = None
+
+    @classmethod
+    def shared(cls, api_key: str) -> AmplitudeFlags:
+        flags = cls._shared.get(api_key)
+        if flags is None:
+            flags = cls._shared[api_key] = cls(api_key)
+        return flags
+
+    @property
+    def ready(self) -> bool:
+        return self.flags is not None
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._poll_task is not None and not self._poll_task.done() and self._poll_task.get_loop() is loop:
+            return
+        self._ready = asyncio.Event()
+        if self.ready:
+            self._ready.set()
+        self._poll_task = asyncio.create_task(self._poll_loop())
+
+    async def wait_ready(self, timeout: float) -> bool:
+        self.start()
+        if not self.ready:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except TimeoutError:
+                pass
+        return self.ready
+
+    async def refresh(self) -> None:
+        async with _session().get(
+            self.url,
+            headers={"Authorization": f"Api-Key {self.api_key}"},
+            timeout=aiohttp.ClientTimeout(total=10),
+        ) as response:
+            response.raise_for_status()
+            flags = {flag["key"]: flag for flag in await response.json()}
+        if flags != self.flags:
+            self._local = {key: _is_local(flag) for key, flag in flags.items()}
+            self._assignments.clear()
+            self.flags = flags
+            logger.info(
+                f"✅ amplitude flag configs updated | {len(flags)} flags"
+                f" | {sum(self._local.values())} evaluated locally"
+            )
+        self._ready.set()
+
+    async def _poll_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"🟡 amplitude flag configs refresh failed | {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def evaluate(self, user_id: str, flag_keys: list[str]) -> tuple[dict[str, str], list[str]]:
+        """Variants of the locally evaluable flags, plus the keys that need remote assignment"""
+        vardata, remote = {}, []
+        for key in flag_keys:
+            flag = self.flags.get(key)
+            if flag is None:
+                continue  # unknown flag, off
+            if not self._local[key]:
+                remote.append(key)
+                continue
+            cache_key = (user_id, key)
+            if cache_key in self._assignments:
+                self._assignments.move_to_end(cache_key)
+                variant = self._assignments[cache_key]
+            else:
+                variant = self._assignments[cache_key] = evaluate_flag(flag, user_id)
+                while len(self._assignments) > self.max_cached_assignments:
+                    self._assignments.popitem(last=False)
+            if variant is not None:
+                vardata[key] = variant
+        return vardata, remote
+
+    async def aclose(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            await asyncio.gather(self._poll_task, return_exceptions=True)
+            self._poll_task = None
+
+
+class AmplitudeExposures:
+    """
+    Process-wide exposure event buffer, uploaded in bulk every
+    `flush_interval` seconds or once `max_batch` events are queued.
+    """
+
+    _shared: dict[str, AmplitudeExposures] = {}
+
+    def __init__(
+        self,
+        api_key: str,
+        url: str = "https://api2.amplitude.com/2/httpapi",
+        flush_interval: float = 10.0,
+        max_batch: int = 500,
+        max_buffer: int = 10000,
+    ):
+        self.api_key = api_key
+        self.url = url
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_buffer = max_buffer
+        self.n_dropped = 0
+        self._events: list[dict] = []
+        self._flush_task: asyncio.Task | None = None
+        self._full: asyncio.Event | None = None
+
+    @classmethod
+    def shared(cls, api_key: str) -> AmplitudeExposures:
+        exposures = cls._shared.get(api_key)
+        if exposures is None:
+            exposures = cls._shared[api_key] = cls(api_key)
+        return exposures
+
+    def put(self, events: list[dict]) -> None:
+        self._events.extend(events)
+        if len(self._events) > self.max_buffer:
+            n_dropped = len(self._events) - self.max_buffer
+            del self._events[:n_dropped]
+            self.n_dropped += n_dropped
+            logger.warning(f"🟡 amplitude exposure buffer full | dropped {n_dropped} events")
+        loop = asyncio.get_running_loop()
+        if self._flush_task is None or self._flush_task.done() or self._flush_task.get_loop() is not loop:
+            self._full = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if len(self._events) >= self.max_batch:
+            self._full.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        while self._events:
+            batch = self._events[: self.max_batch]
+            del self._events[: self.max_batch]
+            try:
+                await _request_with_retry(
+                    context="exposure",
+                    url=self.url,
+                    json_data={"api_key": self.api_key, "events": batch},
+                    method="POST",
+                    timeout=5,
+                    sleep=1.0,
+                )
+            except asyncio.CancelledError:
+                self._events[:0] = batch
+                raise
+            except Exception:
+                # already logged, keep the events for the next flush
+                self._events[:0] = batch
+                return
+
+    async def aclose(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+_sessions = weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]()
+
+
+def _session() -> aiohttp.ClientSession:
+    """Session shared by all Amplitude requests of the running loop"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _sessions[loop] = aiohttp.ClientSession()
+    return session
+
+
+async def _request_with_retry(
+    context: str,
+    url: str,
+    headers: dict = {},
+    params: dict = {},
+    json_data: dict = {},
+    method: Literal["GET", "POST"] = "GET",
+    n_retries: int = 3,
+    timeout: int = 1,
+    sleep: float = 0.01,
+):
+    """Make HTTP request with retry logic"""
+    assert method in ["GET", "POST"], "Invalid method"
+    for attempt in range(1, n_retries + 1):
+        try:
+            if method == "GET":
+                async with _session().get(
+                    url,
+                    headers=headers,
+                    params=params,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                ) as response:
+                    response.raise_for_status()
+                    out = await response.json()
+            elif method == "POST":
+                async with _session().post(
+                    url,
+                    headers={"Content-Type": "application/json"},
+                    params=params,
+                    json=json_data,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                ) as response:
+                    response.raise_for_status()
+                    out = await response.json()
+            logger.info(f"✅ amplitude API {context} request completed")
+            return out
+        except Exception as e:
+            if attempt == n_retries:
+                logger.error(f"❌ amplitude API {context} error | {e}")
+                raise e
+            else:
+                logger.warning(
+                    f"🔄 amplitude API {context} on attempt {attempt}/{n_retries} | {e}"
+                )
+                await asyncio.sleep(sleep)
+
+
 class Amplitude:
     """
     Amplitude API client for experiments.
+
+    With `local_evaluation` the flag configs are polled in the background and
+    assignments are computed in process (falling back to the remote vardata
+    endpoint only for flags using unsupported targeting), and exposures are
+    buffered and uploaded in bulk. Call `Amplitude.aclose_shared()` on
+    shutdown to flush them.
     """
 
-    def __init__(self, user_id: str, api_key: str):
+    def __init__(
+        self,
+        user_id: str,
+        api_key: str,
+        local_evaluation: bool = False,
+        ready_timeout: float = 2.0,
+    ):
         self.user_id = user_id
         self.api_key = api_key
+        self.local_evaluation = local_evaluation
+        self.ready_timeout = ready_timeout
         self._vardata: dict[str, str] | None = None
         self._assigment_url: str = "https://api.lab.amplitude.com/v1"
         self._exposure_url: str = "https://api2.amplitude.com/2/httpapi"
         self._assigment_task: asyncio.Task | None = None
         self._exposure_task: asyncio.Task | None = None
+        if local_evaluation:
+            with contextlib.suppress(RuntimeError):  # no running loop yet, started on assign
+                AmplitudeFlags.shared(api_key).start()
 
     @property
     def vardata(self) -> dict[str, str]:
@@ -67,41 +464,25 @@ class Amplitude:
         timeout: int = 1,
         sleep: float = 0.01,
     ):
-        """Make HTTP request with retry logic"""
-        assert method in ["GET", "POST"], "Invalid method"
-        for attempt in range(1, n_retries + 1):
-            try:
-                async with aiohttp.ClientSession() as S:
-                    if method == "GET":
-                        async with S.get(
-                            url,
-                            headers={"Authorization": f"Api-Key {self.api_key}"},
-                            params=params,
-                            timeout=aiohttp.ClientTimeout(total=timeout),
-                        ) as response:
-                            response.raise_for_status()
-                            out = await response.json()
-                    elif method == "POST":
-                        async with S.post(
-                            url,
-                            headers={"Content-Type": "application/json"},
-                            params=params,
-                            json=json_data,
-                            timeout=aiohttp.ClientTimeout(total=timeout),
-                        ) as response:
-                            response.raise_for_status()
-                            out = await response.json()
-                    logger.info(f"✅ amplitude API {context} request completed")
-                    return out
-            except Exception as e:
-                if attempt == n_retries:
-                    logger.error(f"❌ amplitude API {context} error | {e}")
-                    raise e
-                else:
-                    logger.warning(
-                        f"🔄 amplitude API {context} on attempt {attempt}/{n_retries} | {e}"
-                    )
-                    await asyncio.sleep(sleep)
+        return await _request_with_retry(
+            context=context,
+            url=url,
+            headers={"Authorization": f"Api-Key {self.api_key}"},
+            params=params,
+            json_data=json_data,
+            method=method,
+            n_retries=n_retries,
+            timeout=timeout,
+            sleep=sleep,
+        )
+
+    async def _remote_vardata(self, experiments: list[str]) -> dict[str, str]:
+        url = f"{self._assigment_url}/vardata"  # could be also /flags for configs
+        params = {"user_id": self.user_id, "flag_keys": ",".join(experiments)}
+        data = await self._request_with_retry(
+            context="assigment", url=url, params=params, method="GET"
+        )
+        return {flag_key: variant.get("key") for flag_key, variant in data.items()}
 
     def assign(self, experiments: list[str]) -> asyncio.Task:
         async def _assigment_task():
@@ -109,38 +490,46 @@ class Amplitude:
                 self._vardata = {}
                 return
             t1 = time.time()
-            url = f"{self._assigment_url}/vardata"  # could be also /flags for configs
-            params = {"user_id": self.user_id, "flag_keys": ",".join(experiments)}
-            data = await self._request_with_retry(
-                context="assigment", url=url, params=params, method="GET"
-            )
-            self._vardata = {flag_key: variant.get("key") for flag_key, variant in data.items()}
+            flags = AmplitudeFlags.shared(self.api_key) if self.local_evaluation else None
+            if flags is not None and await flags.wait_ready(self.ready_timeout):
+                vardata, remote = flags.evaluate(self.user_id, experiments)
+                if remote:
+                    vardata.update(await self._remote_vardata(remote))
+                self._vardata = vardata
+            else:
+                self._vardata = await self._remote_vardata(experiments)
             t2 = time.time()
-            logger.info(f"`assigment` amplitude task completed in {t2 - t1:.1f}s")
+            logger.info(f"`assigment` amplitude task completed in {t2 - t1:.3f}s")
 
         if self._assigment_task is None:
             self._assigment_task = asyncio.create_task(_assigment_task())
         return self._assigment_task
 
+    def _exposure_events(self) -> list[dict]:
+        events = []
+        for flag_key, variant in self._vardata.items():
+            events.append(
+                {
+                    "user_id": str(self.user_id),
+                    "event_type": "$exposure",
+                    "event_properties": {"flag_key": flag_key, "variant": variant},
+                    "time": int(time.time() * 1000),
+                }
+            )
+        return events
+
     def expose(self) -> asyncio.Task:
         async def _exposure_task():
             if not self._vardata:
                 return
+            if self.local_evaluation:
+                AmplitudeExposures.shared(self.api_key).put(self._exposure_events())
+                return
             t1 = time.time()
             url = self._exposure_url
-            events = []
-            for flag_key, variant in self._vardata.items():
-                events.append(
-                    {
-                        "user_id": str(self.user_id),
-                        "event_type": "$exposure",
-                        "event_properties": {"flag_key": flag_key, "variant": variant},
-                        "time": int(time.time() * 1000),
-                    }
-                )
             payload = {
                 "api_key": self.api_key,
-                "events": events,
+                "events": self._exposure_events(),
             }
             await self._request_with_retry(
                 context="exposure", url=url, json_data=payload, method="POST"
@@ -151,3 +540,14 @@ class Amplitude:
         if self._exposure_task is None:
             self._exposure_task = asyncio.create_task(_exposure_task())
         return self._exposure_task
+
+    @staticmethod
+    async def aclose_shared():
+        """Flush buffered exposures, stop flag polling and close the running loop's session"""
+        for exposures in AmplitudeExposures._shared.values():
+            await exposures.aclose()
+        for flags in AmplitudeFlags._shared.values():
+            await flags.aclose()
+        session = _sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
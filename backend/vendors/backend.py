@@ -1,11 +1,56 @@
+import asyncio
 import datetime
-from typing import Any
+import gzip
+import json
+import logging
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Literal
 
 import httpx
 import httpx_retries
 
+logger = logging.getLogger(__name__)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+@dataclass
+class _TranscriptState:
+    """What the backend has acknowledged for one session's transcript"""
+
+    seq: int = 0
+    lengths: dict[str, int] = field(default_factory=dict)
+    tails: dict[str, str] = field(default_factory=dict)  # key -> json of the last acked item
+    scalars: dict[str, str] = field(default_factory=dict)  # key -> json of the acked value
+    pending: dict[str, Any] | None = None
+    task: asyncio.Task | None = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    completed: bool = False  # queued updates are dropped once the session is completed
+
 
 class Backend:
+    """
+    Webhook client of the main backend.
+
+    - `compress`: gzip request bodies above `compress_min_bytes`.
+    - `delta_transcripts`: after the first full PUT, transcript updates only
+      carry the items appended to each list (and changed scalar values) with
+      a sequence number, see `_transcript_payload`. Needs the
+      `/webhooks/tutor/transcript-delta` endpoint on the backend.
+    - `queue_transcript_update` coalesces updates on a `debounce` window and
+      retries them in the background.
+    - `outbox`: failed webhooks (first name, complete session) are parked in
+      a bounded outbox and retried with backoff until delivered or `aclose`
+      instead of raising. Session completion carries an `Idempotency-Key` so
+      a replay of a request that did go through is not applied twice.
+
+    Transcript state is kept for at most `max_sessions` sessions, the least
+    recently updated idle ones are dropped first (their next update is sent in full).
+    """
+
     def __init__(
         self,
         base_url: str,
@@ -13,6 +58,14 @@ class Backend:
         *,
         n_tries: int = 3,
         timeout: float = 10,
+        compress: bool = False,
+        compress_min_bytes: int = 1024,
+        delta_transcripts: bool = False,
+        debounce: float = 1.0,
+        outbox: bool = False,
+        outbox_size: int = 100,
+        outbox_max_delay: float = 60.0,
+        max_sessions: int = 1000,
     ) -> None:
         super().__init__()
         self._client = httpx.AsyncClient(
@@ -26,22 +79,158 @@ class Backend:
                 ),
             ),
             timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
         )
+        self.compress = compress
+        self.compress_min_bytes = compress_min_bytes
+        self.delta_transcripts = delta_transcripts
+        self.debounce = debounce
+        self.outbox = outbox
+        self.outbox_size = outbox_size
+        self.outbox_max_delay = outbox_max_delay
+        self.bytes_sent = 0
+        self.bytes_raw = 0
+        self.max_sessions = max_sessions
+        self._transcripts: OrderedDict[str, _TranscriptState] = OrderedDict()
+        self._outbox: deque[tuple[Literal['POST', 'PUT'], str, dict[str, Any], float, dict[str, str] | None]] = deque()
+        self._outbox_task: asyncio.Task | None = None
 
-    async def update_first_name(
+    async def _request(
         self,
-        user_id: str,
-        first_name: str,
-        *,
-        timeout: float = 5,
+        method: Literal['POST', 'PUT'],
+        url: str,
+        payload: dict[str, Any],
+        timeout: float,
+        headers: dict[str, str] | None = None,
     ) -> None:
-        response = await self._client.put(
-            url='/webhooks/tutor/first-name',
-            json={'user_id': user_id, 'first_name': first_name},
-            timeout=timeout,
-        )
+        body = _dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.bytes_raw += len(body)
+        if self.compress and len(body) >= self.compress_min_bytes:
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+        self.bytes_sent += len(body)
+        response = await self._client.request(method, url, content=body, headers=headers, timeout=timeout)
         response.raise_for_status()
 
+    async def _request_or_park(
+        self,
+        method: Literal['POST', 'PUT'],
+        url: str,
+        payload: dict[str, Any],
+        timeout: float,
+        headers: dict[str, str] | None = None,
+    ) -> bool:
+        """Raises on failure, unless the outbox is enabled: then parks the request and returns False"""
+        try:
+            await self._request(method, url, payload, timeout, headers)
+            return True
+        except Exception as e:
+            if not self.outbox:
+                raise
+            logger.error(f'❌ FAILED backend {method} {url}, parked in outbox | {e}')
+            self._park(method, url, payload, timeout, headers)
+            return False
+
+    # ============================================================================
+    # Outbox
+    # ============================================================================
+
+    def _park(
+        self,
+        method: Literal['POST', 'PUT'],
+        url: str,
+        payload: dict[str, Any],
+        timeout: float,
+        headers: dict[str, str] | None,
+    ) -> None:
+        if len(self._outbox) >= self.outbox_size:
+            dropped = self._outbox.popleft()
+            logger.error(f'❌ backend outbox full, dropped {dropped[0]} {dropped[1]}')
+        self._outbox.append((method, url, payload, timeout, headers))
+        if self._outbox_task is None or self._outbox_task.done():
+            self._outbox_task = asyncio.create_task(self._drain_outbox())
+
+    async def _drain_outbox(self) -> None:
+        delay = 1.0
+        while self._outbox:
+            await asyncio.sleep(delay)
+            if await self._send_outbox():
+                delay = 1.0
+            else:
+                delay = min(delay * 2, self.outbox_max_delay)
+
+    async def _send_outbox(self) -> bool:
+        """Send parked requests in order, stops at the first failure"""
+        while self._outbox:
+            method, url, payload, timeout, headers = self._outbox[0]
+            try:
+                await self._request(method, url, payload, timeout, headers)
+            except Exception as e:
+                logger.warning(f'🟡 backend outbox retry failed | {len(self._outbox)} pending | {e}')
+                return False
+            self._outbox.popleft()
+            logger.info(f'✅ DONE backend {method} {url} from outbox')
+        return True
+
+    async def aclose(self) -> None:
+        """Flush queued transcript updates and the outbox (one last attempt), then close the client"""
+        for session_id in list(self._transcripts):
+            await self.flush_transcript(session_id)
+        if self._outbox_task is not None:
+            self._outbox_task.cancel()
+            await asyncio.gather(self._outbox_task, return_exceptions=True)
+        if not await self._send_outbox():
+            logger.error(f'❌ backend outbox not delivered on close | {len(self._outbox)} requests lost')
+        await self._client.aclose()
+
+    # ============================================================================
+    # Transcript
+    # ============================================================================
+
+    def _transcript_payload(
+        self, session_id: str, state: _TranscriptState, transcript: dict[str, Any]
+    ) -> tuple[str, dict[str, Any], dict[str, int], dict[str, str], dict[str, str]] | None:
+        """
+        Delta mode: endpoint, payload and the state to commit once acknowledged;
+        None when nothing changed. List values are treated as append-only, a
+        delta is `{'seq', 'base_seq', 'append': {key: new items}, 'set': {key: value}}`;
+        anything else (first update, shrunk or edited list) is sent in full.
+        """
+        lengths, tails, scalars = {}, {}, {}
+        append, changed = {}, {}
+        full = state.seq == 0
+        for key, value in transcript.items():
+            if isinstance(value, list):
+                lengths[key] = len(value)
+                tails[key] = _dumps(value[-1]) if value else ''
+                n = state.lengths.get(key, 0)
+                if len(value) < n or (n and _dumps(value[n - 1]) != state.tails.get(key)):
+                    full = True
+                elif len(value) > n:
+                    append[key] = value[n:]
+            else:
+                scalars[key] = _dumps(value)
+                if scalars[key] != state.scalars.get(key):
+                    changed[key] = value
+        if set(state.lengths) - set(lengths) or set(state.scalars) - set(scalars):
+            full = True  # a key was removed
+        if not full and not append and not changed:
+            return None
+
+        seq = state.seq + 1
+        if full:
+            return (
+                '/webhooks/tutor/transcript',
+                {'session_id': session_id, 'transcript': transcript, 'seq': seq},
+                lengths, tails, scalars,
+            )
+        return (
+            '/webhooks/tutor/transcript-delta',
+            {'session_id': session_id, 'seq': seq, 'base_seq': state.seq, 'append': append, 'set': changed},
+            lengths, tails, scalars,
+        )
+
     async def update_transcript(
         self,
         session_id: str,
@@ -49,12 +238,108 @@ class Backend:
         *,
         timeout: float = 5,
     ) -> None:
-        response = await self._client.put(
-            url='/webhooks/tutor/transcript',
-            json={'session_id': session_id, 'transcript': transcript},
-            timeout=timeout,
+        state = self._transcript_state(session_id)
+        async with state.lock:
+            if not self.delta_transcripts:
+                await self._request(
+                    'PUT',
+                    '/webhooks/tutor/transcript',
+                    {'session_id': session_id, 'transcript': transcript},
+                    timeout,
+                )
+                return
+            update = self._transcript_payload(session_id, state, transcript)
+            if update is None:
+                return
+            url, payload, lengths, tails, scalars = update
+            await self._request('PUT', url, payload, timeout)
+            state.seq, state.lengths, state.tails, state.scalars = payload['seq'], lengths, tails, scalars
+
+    def _transcript_state(self, session_id: str) -> _TranscriptState:
+        state = self._transcripts.get(session_id)
+        if state is None:
+            self._evict_transcripts()
+            state = self._transcripts[session_id] = _TranscriptState()
+        self._transcripts.move_to_end(session_id)
+        return state
+
+    def _evict_transcripts(self) -> None:
+        # sessions that never complete would otherwise keep their state for the life of the process
+        for session_id in list(self._transcripts):
+            if len(self._transcripts) < self.max_sessions:
+                return
+            state = self._transcripts[session_id]
+            if state.pending is None and (state.task is None or state.task.done()) and not state.lock.locked():
+                del self._transcripts[session_id]
+
+    def queue_transcript_update(self, session_id: str, transcript: dict[str, Any]) -> None:
+        """Non-blocking update, coalesced with the ones following within `debounce` seconds"""
+        state = self._transcript_state(session_id)
+        if state.completed:
+            return
+        state.pending = transcript
+        if state.task is None or state.task.done():
+            state.task = asyncio.create_task(self._send_queued_transcript(session_id, state))
+
+    async def _send_queued_transcript(self, session_id: str, state: _TranscriptState) -> None:
+        delay = self.debounce
+        while state.pending is not None:
+            await asyncio.sleep(delay)
+            transcript, state.pending = state.pending, None
+            try:
+                await self.update_transcript(session_id, transcript)
+                delay = self.debounce
+            except Exception as e:
+                # nothing was acked, the next attempt carries the accumulated delta
+                if state.pending is None:
+                    state.pending = transcript
+                delay = min(max(delay, 1.0) * 2, self.outbox_max_delay)
+                logger.warning(f'🟡 FAILED to update transcript, retrying in {delay:.0f}s | {session_id} | {e}')
+
+    async def _cancel_queued_transcript(self, session_id: str) -> None:
+        """Drop the queued transcript update of a session, superseded by a newer full transcript"""
+        state = self._transcripts.get(session_id)
+        if state is None:
+            return
+        state.pending = None
+        if state.task is not None and not state.task.done():
+            state.task.cancel()
+            await asyncio.gather(state.task, return_exceptions=True)
+
+    async def flush_transcript(self, session_id: str) -> None:
+        """Send the queued transcript update of a session right away"""
+        state = self._transcripts.get(session_id)
+        if state is None:
+            return
+        if state.task is not None and not state.task.done():
+            state.task.cancel()
+            await asyncio.gather(state.task, return_exceptions=True)
+        transcript, state.pending = state.pending, None
+        if transcript is not None:
+            try:
+                await self.update_transcript(session_id, transcript)
+            except Exception as e:
+                logger.error(f'❌ FAILED to flush transcript | {session_id} | {e}')
+                state.pending = transcript
+
+    # ============================================================================
+    # Webhooks
+    # ============================================================================
+
+    async def update_first_name(
+        self,
+        user_id: str,
+        first_name: str,
+        *,
+        timeout: float = 5,
+    ) -> bool:
+        """Raises on failure; with the outbox enabled, False when the request was parked instead"""
+        return await self._request_or_park(
+            'PUT',
+            '/webhooks/tutor/first-name',
+            {'user_id': user_id, 'first_name': first_name},
+            timeout,
         )
-        response.raise_for_status()
 
     async def complete_session(
         self,
@@ -75,27 +360,45 @@ class Backend:
         use_new_storage: bool,
         *,
         timeout: float = 10,
-    ) -> None:
-        """Complete a session and return the response data."""
-        response = await self._client.post(
-            url='/webhooks/tutor/complete-session',
-            json={
-                'user_id': user_id,
-                'session_id': session_id,
-                'stop_reason': stop_reason,
-                'total_chunks': total_chunks,
-                'submitted_chunks': submitted_chunks,
-                'started_at': started_at.isoformat(),
-                'finished_at': finished_at.isoformat(),
-                'name': name,
-                'summary': summary,
-                'highlights': highlights,
-                'transcript': transcript,
-                'is_scenario_completed': is_scenario_completed,
-                'scenario_score': scenario_score,
-                'scenario_feedback': scenario_feedback,
-                'use_new_storage': use_new_storage,
-            },
-            timeout=timeout,
+    ) -> bool:
+        """
+        Complete a session. Raises on failure; with the outbox enabled, False
+        when the request was parked instead. In delta mode the transcript is
+        synced through the transcript endpoints first and referenced by
+        `transcript_seq`. A queued transcript update of the session is dropped
+        first, and later ones are ignored.
+        """
+        payload = {
+            'user_id': user_id,
+            'session_id': session_id,
+            'stop_reason': stop_reason,
+            'total_chunks': total_chunks,
+            'submitted_chunks': submitted_chunks,
+            'started_at': started_at.isoformat(),
+            'finished_at': finished_at.isoformat(),
+            'name': name,
+            'summary': summary,
+            'highlights': highlights,
+            'transcript': transcript,
+            'is_scenario_completed': is_scenario_completed,
+            'scenario_score': scenario_score,
+            'scenario_feedback': scenario_feedback,
+            'use_new_storage': use_new_storage,
+        }
+        self._transcript_state(session_id).completed = True
+        await self._cancel_queued_transcript(session_id)
+        if self.delta_transcripts:
+            try:
+                await self.update_transcript(session_id, transcript, timeout=timeout)
+                payload['transcript'] = None
+                payload['transcript_seq'] = self._transcripts[session_id].seq
+            except Exception as e:
+                logger.warning(f'🟡 FAILED to sync transcript, completing with the full one | {e}')
+        # the completed state is kept so late queued updates are ignored, it is evicted like idle ones
+        return await self._request_or_park(
+            'POST',
+            '/webhooks/tutor/complete-session',
+            payload,
+            timeout,
+            headers={'Idempotency-Key': f'complete-session:{session_id}'},
         )
-        response.raise_for_status()
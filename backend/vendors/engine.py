@@ -36,9 +36,11 @@ class Engine:
         audio_file: bytes,
         *,
         callback_url: str | None = None,
+        filename: str = 'chunk.wav',
+        content_type: str = 'audio/wav',
         timeout: float = 15,
     ) -> None:
-        files = {'audio_file': ('chunk.wav', audio_file, 'audio/wav')}
+        files = {'audio_file': (filename, audio_file, content_type)}
         params: dict[str, str | int] = {
             'user_id': user_id,
             'session_id': session_id,
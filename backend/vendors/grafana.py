@@ -1,9 +1,11 @@
 import asyncio
 import contextlib
+import gzip
+import json
 import logging
+import math
 import random
 import time
-from collections import defaultdict
 from collections.abc import Generator
 from typing import Literal
 
@@ -11,39 +13,166 @@ import aiohttp
 
 logger = logging.getLogger(__name__)
 
+MetricKind = Literal["gauge", "enum", "histogram", "counter", "event"]
+
+# OTLP aggregation temporality, histograms are exported cumulatively since their first sample
+AGGREGATION_TEMPORALITY_CUMULATIVE = 2
+# 2**3 = 8 buckets per power of two, ~9% relative error per bucket
+HISTOGRAM_SCALE = 3
+HISTOGRAM_MAX_BUCKETS = 160
+
+
+class _Series:
+    __slots__ = ("kind", "attrs", "start_ns", "time_ns", "value", "count", "exported_count", "samples")
+
+    def __init__(self, kind: MetricKind, attrs: list[dict], now_ns: int):
+        self.kind = kind
+        self.attrs = attrs
+        self.start_ns = now_ns
+        self.time_ns = now_ns
+        self.value: float | str = 0.0
+        self.count = 0
+        self.exported_count = 0
+        # (time, value) of the gauge / enum / event samples not pushed yet
+        self.samples: list[tuple[int, float | str]] = []
+
+
+class _Histogram:
+    """
+    Base-2 exponential histogram (OTLP ExponentialHistogram) over positive
+    values; zero and negative values go to the zero bucket. Bucket i holds
+    (base**i, base**(i+1)] with base = 2**(2**-scale). When the buckets
+    would span more than max_buckets the scale is halved, merging pairs.
+    """
+
+    __slots__ = (
+        "kind", "attrs", "start_ns", "time_ns", "scale", "max_buckets",
+        "offset", "counts", "zero_count", "count", "sum", "min", "max", "exported_count",
+    )
+
+    def __init__(self, attrs: list[dict], now_ns: int, scale: int = HISTOGRAM_SCALE, max_buckets: int = HISTOGRAM_MAX_BUCKETS):
+        self.kind = "histogram"
+        self.attrs = attrs
+        self.start_ns = now_ns
+        self.time_ns = now_ns
+        self.scale = scale
+        self.max_buckets = max_buckets
+        self.offset = 0
+        self.counts: list[int] = []
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.exported_count = 0
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log2(value) * 2.0 ** self.scale) - 1
+
+    def record(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= 0.0:
+            self.zero_count += 1
+            return
+
+        index = self._index(value)
+        if not self.counts:
+            self.offset = index
+            self.counts.append(0)
+        while True:
+            low = min(self.offset, index)
+            high = max(self.offset + len(self.counts) - 1, index)
+            if high - low + 1 <= self.max_buckets:
+                break
+            self._downscale()
+            index = self._index(value)
+        if index < self.offset:
+            self.counts[:0] = [0] * (self.offset - index)
+            self.offset = index
+        elif index >= self.offset + len(self.counts):
+            self.counts.extend([0] * (index - self.offset - len(self.counts) + 1))
+        self.counts[index - self.offset] += 1
+
+    def _downscale(self) -> None:
+        # halving the resolution maps bucket i to i >> 1
+        merged: dict[int, int] = {}
+        for i, c in enumerate(self.counts):
+            merged[(self.offset + i) >> 1] = merged.get((self.offset + i) >> 1, 0) + c
+        self.scale -= 1
+        self.offset = min(merged)
+        self.counts = [merged.get(i, 0) for i in range(self.offset, max(merged) + 1)]
+
 
 class Grafana:
+    """
+    Aggregating OTLP metrics client. Every (name, attributes) pair keeps one
+    compact series: gauges, enums and events keep their samples until pushed
+    (one gauge data point each, as before), counters a running total exported
+    as a gauge, histograms an exponential histogram. `push` (or the `start`
+    background task) exports the series that changed since the last push.
+    """
+
     def __init__(
         self,
         attributes: dict[str, str],
         api_key: str,
         url: str,
         mode: str,
+        flush_interval: float = 30.0,
     ):
         self.attributes = attributes
         self.api_key = api_key
         self.url = url
-        self.metrics: dict[str, list[dict]] = defaultdict(list)
-        self.kinds: dict[str, Literal["gauge", "enum", "histogram", "counter", "event"]] = {}
         self.mode = mode
+        self.flush_interval = flush_interval
+        self.kinds: dict[str, MetricKind] = {}
+        self.units: dict[str, str] = {}
+        # name -> {extra attributes key -> series}, None is the instance attributes only
+        self.series: dict[str, dict[tuple | None, _Series | _Histogram]] = {}
+        self._base_attrs = self._to_otlp_attrs(attributes)
+        self._interned_attrs: dict[tuple, list[dict]] = {}
+        self._session: aiohttp.ClientSession | None = None
+        self._flush_task: asyncio.Task | None = None
+
+    @staticmethod
+    def _to_otlp_attrs(attributes: dict[str, str]) -> list[dict]:
+        return [{"key": k, "value": {"stringValue": str(v)}} for k, v in attributes.items()]
+
+    def _attrs_for(self, attributes: dict[str, str] | None) -> tuple[tuple | None, list[dict]]:
+        if not attributes:
+            return None, self._base_attrs
+        key = tuple(sorted(attributes.items()))
+        attrs = self._interned_attrs.get(key)
+        if attrs is None:
+            attrs = self._to_otlp_attrs({**self.attributes, **attributes})
+            self._interned_attrs[key] = attrs
+        return key, attrs
 
     def add_once(
         self,
         name: str,
-        kind: Literal["gauge", "enum", "histogram", "counter", "event"],
+        kind: MetricKind,
         value: float | int | str = 1,
         unit: str = "",
+        attributes: dict[str, str] | None = None,
     ):
-        self._add(name, kind, value, unit, add_once=True)
+        self._add(name, kind, value, unit, add_once=True, attributes=attributes)
 
     def add(
         self,
         name: str,
-        kind: Literal["gauge", "enum", "histogram", "counter", "event"],
+        kind: MetricKind,
         value: float | int | str = 1,
         unit: str = "",
+        attributes: dict[str, str] | None = None,
     ):
-        self._add(name, kind, value, unit, add_once=False)
+        """`attributes` are added to the instance-wide attributes of this series only"""
+        self._add(name, kind, value, unit, add_once=False, attributes=attributes)
 
     @contextlib.contextmanager
     def gauge_time_seconds(
@@ -72,138 +201,197 @@ class Grafana:
     def _add(
         self,
         name: str,
-        kind: Literal["gauge", "enum", "histogram", "counter", "event"],
+        kind: MetricKind,
         value: float | int | str = 1,
         unit: str = "",
         add_once: bool = False,
+        attributes: dict[str, str] | None = None,
     ):
-        timestamp_ns = int(time.time() * 1e9)
-        if add_once and (name in self.metrics):
+        if add_once and (name in self.series):
             return
-        attrs = [{"key": k, "value": {"stringValue": str(v)}} for k, v in self.attributes.items()]
-
-        if kind == "gauge":
-            assert isinstance(value, int | float), f"{name}: value must be a number"
-            data_point = {
-                "asDouble": float(value),
-                "timeUnixNano": timestamp_ns,
-                "startTimeUnixNano": timestamp_ns,
-                "attributes": attrs,
-            }
-            metric_data = {
-                "name": name,
-                "unit": unit,
-                "gauge": {"dataPoints": [data_point]},
-            }
-
-        if kind == "event":
-            data_point = {
-                "asDouble": 1.0,
-                "timeUnixNano": timestamp_ns,
-                "startTimeUnixNano": timestamp_ns,
-                "attributes": attrs,
-            }
-            metric_data = {
-                "name": name,
-                "unit": unit,
-                "gauge": {"dataPoints": [data_point]},
-            }
-
-        elif kind == "enum":
+        assert self.kinds.setdefault(name, kind) == kind, f"Metric {name} has wrong kind"
+        if kind == "enum":
             assert isinstance(value, str), f"{name}: enum value must be a string"
-            attrs.append({"key": name, "value": {"stringValue": value}})
-            data_point = {
-                "asInt": 1,
-                "timeUnixNano": timestamp_ns,
-                "startTimeUnixNano": timestamp_ns,
-                "attributes": attrs,
-            }
-            metric_data = {
-                "name": name,
-                "unit": unit,
-                "gauge": {"dataPoints": [data_point]},
-            }
+        elif kind != "event":
+            assert isinstance(value, int | float), f"{name}: value must be a number"
 
-        elif kind == "histogram":
-            raise NotImplementedError("Histogram metrics are not supported yet")
+        now_ns = time.time_ns()
+        key, attrs = self._attrs_for(attributes)
+        by_attrs = self.series.get(name)
+        if by_attrs is None:
+            by_attrs = self.series[name] = {}
+            self.units[name] = unit
+        series = by_attrs.get(key)
+        if series is None:
+            series = _Histogram(attrs, now_ns) if kind == "histogram" else _Series(kind, attrs, now_ns)
+            by_attrs[key] = series
+        series.time_ns = now_ns
 
+        if kind == "histogram":
+            series.record(float(value))
         elif kind == "counter":
-            assert isinstance(value, int | float), f"{name}: counter value must be a number"
-            if name in self.metrics and self.metrics[name]:
-                existing_metric = self.metrics[name][0]  # Take first (and only) metric
-                existing_datapoint = existing_metric["gauge"]["dataPoints"][0]
-                existing_datapoint["asDouble"] += float(value)
-                existing_datapoint["timeUnixNano"] = timestamp_ns  # Update timestamp
-                return
-            else:
-                data_point = {
-                    "asDouble": float(value),
-                    "timeUnixNano": timestamp_ns,
-                    "startTimeUnixNano": timestamp_ns,
-                    "attributes": attrs,
-                }
-                metric_data = {
-                    "name": name,
-                    "unit": unit,
-                    "gauge": {"dataPoints": [data_point]},
-                }
+            series.value += float(value)
+            series.count += 1
+        elif kind == "event":
+            series.value += 1.0
+            series.count += 1
+            series.samples.append((now_ns, 1.0))
+        else:  # gauge, enum
+            series.value = value
+            series.count += 1
+            series.samples.append((now_ns, value))
 
-        assert self.kinds.setdefault(name, kind) == kind, f"Metric {name} has wrong kind"
-        self.metrics[name].append(metric_data)
+    def _first_series(self, name: str) -> _Series | _Histogram:
+        by_attrs = self.series[name]
+        return by_attrs[None] if None in by_attrs else next(iter(by_attrs.values()))
 
     def get(self, name: str, default: float | int | None = None) -> float | str:
-        if (name not in self.metrics) and (default is not None):
+        if (name not in self.series) and (default is not None):
             return default
-        assert name in self.metrics, f"Metric {name} not found"
-        assert self.metrics[name], f"Metric {name} is empty"
-
-        if self.kinds[name] in ["gauge", "counter"]:
-            metric_data = self.metrics[name][-1]
-            data_point = metric_data["gauge"]["dataPoints"][0]
-            return (
-                data_point["asDouble"] if "asDouble" in data_point else float(data_point["asInt"])
-            )
-        elif self.kinds[name] == "enum":
-            metric_data = self.metrics[name][-1]
-            data_point = metric_data["gauge"]["dataPoints"][0]
-            for attr in data_point["attributes"]:
-                if attr["key"] == name:
-                    return attr["value"]["stringValue"]
-            raise ValueError(f"Metric `{name}` with kind `enum` has no value")
-        elif self.kinds[name] == "event":
-            return len(self.metrics[name])
-        elif self.kinds[name] == "histogram":
-            raise NotImplementedError("Histogram metrics are not supported yet")
+        assert name in self.series, f"Metric {name} not found"
+        series = self._first_series(name)
+        kind = self.kinds[name]
+        if kind in ["gauge", "counter"]:
+            return float(series.value)
+        elif kind == "enum":
+            return series.value
+        elif kind == "event":
+            return series.count
+        elif kind == "histogram":
+            return series.sum / series.count if series.count else 0.0
+        else:
+            raise ValueError(f"Metric `{name}` with kind `{kind}` is not supported")
+
+    def _otlp_metric(self, name: str, exported: list[tuple[_Series | _Histogram, int, int]]) -> dict | None:
+        """OTLP metric of the series changed since the last push; `exported` collects what to commit"""
+        kind = self.kinds[name]
+        metric: dict = {"name": name, "unit": self.units[name]}
+        points = []
+        for series in self.series[name].values():
+            if series.count == series.exported_count:
+                continue
+            exported.append((series, series.count, len(series.samples) if kind != "histogram" else 0))
+            if kind in ["gauge", "event"]:
+                for time_ns, value in series.samples:
+                    points.append(
+                        {"asDouble": float(value), "timeUnixNano": time_ns, "startTimeUnixNano": time_ns, "attributes": series.attrs}
+                    )
+            elif kind == "enum":
+                attrs = series.attrs
+                for time_ns, value in series.samples:
+                    points.append(
+                        {
+                            "asInt": 1,
+                            "timeUnixNano": time_ns,
+                            "startTimeUnixNano": time_ns,
+                            "attributes": attrs + [{"key": name, "value": {"stringValue": value}}],
+                        }
+                    )
+            elif kind == "counter":
+                points.append(
+                    {
+                        "asDouble": float(series.value),
+                        "timeUnixNano": series.time_ns,
+                        "startTimeUnixNano": series.start_ns,
+                        "attributes": series.attrs,
+                    }
+                )
+            else:  # histogram
+                point = {
+                    "timeUnixNano": series.time_ns,
+                    "startTimeUnixNano": series.start_ns,
+                    "attributes": series.attrs,
+                    "count": series.count,
+                    "sum": series.sum,
+                    "scale": series.scale,
+                    "zeroCount": series.zero_count,
+                    "positive": {"offset": series.offset, "bucketCounts": series.counts},
+                }
+                if series.count:
+                    point.update(min=series.min, max=series.max)
+                points.append(point)
+        if not points:
+            return None
+
+        if kind == "histogram":
+            metric["exponentialHistogram"] = {
+                "dataPoints": points,
+                "aggregationTemporality": AGGREGATION_TEMPORALITY_CUMULATIVE,
+            }
         else:
-            raise ValueError(f"Metric `{name}` with kind `{self.kinds[name]}` is not supported")
+            # counters and events stay gauges, as Prometheus would rename sums with a `_total` suffix
+            metric["gauge"] = {"dataPoints": points}
+        return metric
+
+    def start(self) -> None:
+        """Push the aggregated state every flush_interval seconds on the running loop"""
+        if self.mode == "console" or self._flush_task is not None:
+            return
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.push()
+            except Exception:
+                pass  # already logged in push, the state is kept for the next flush
+
+    async def aclose(self):
+        """Stop the periodic flush, push the final state and close the HTTP session"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        try:
+            await self.push()
+        except Exception:
+            pass
+        finally:
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
 
     async def push(self, timeout: int = 5, max_retries: int = 3, retry_delay: float = 1.0):
         if self.mode == "console":
             return
-        if not self.metrics:
+        exported: list[tuple[_Series | _Histogram, int, int]] = []
+        payload_metrics = [
+            metric for name in self.series if (metric := self._otlp_metric(name, exported)) is not None
+        ]
+        if not payload_metrics:
             return
-        payload_metrics = sum(self.metrics.values(), [])
         payload = {"resourceMetrics": [{"scopeMetrics": [{"metrics": payload_metrics}]}]}
+        body = gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), compresslevel=5)
 
         headers = {
             "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
             "Authorization": f"Bearer {self.api_key}",
         }
 
         for attempt in range(1, max_retries + 1):
             try:
-                async with aiohttp.ClientSession(
-                    timeout=aiohttp.ClientTimeout(total=timeout)
-                ) as session:
-                    async with session.post(self.url, json=payload, headers=headers) as response:
-                        status = response.status
-                        if 200 <= status < 300:
-                            logger.info(f"✅ Pushed {len(self.metrics)} metrics to grafana")
-                            self.metrics.clear()
-                            return
-                        else:
-                            response_text = await response.text()
-                            raise Exception(f"HTTP {status}: {response_text}")
+                async with self._ensure_session().post(
+                    self.url, data=body, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as response:
+                    status = response.status
+                    if 200 <= status < 300:
+                        logger.info(f"✅ Pushed {len(payload_metrics)} metrics to grafana")
+                        # samples added while pushing stay for the next push
+                        for series, count, n_samples in exported:
+                            series.exported_count = count
+                            if n_samples:
+                                del series.samples[:n_samples]
+                        return
+                    else:
+                        response_text = await response.text()
+                        raise Exception(f"HTTP {status}: {response_text}")
 
             except Exception as e:
                 if attempt == max_retries:
@@ -0,0 +1,371 @@
+import asyncio
+import datetime as dt
+import json
+import logging
+import os
+import sqlite3
+import uuid
+import weakref
+import zlib
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Literal
+
+import aiohttp
+import numpy as np
+from pydantic import BaseModel
+
+from .memory_ingest import MemoryMessage
+
+logger = logging.getLogger(__name__)
+
+LOCAL_MEMORY_DIR = Path(os.getenv("LOCAL_MEMORY_DIR", "/tmp/local_memory"))
+
+# texts -> float32 array (len(texts), dim), rows need not be normalized
+EmbedFn = Callable[[list[str]], Awaitable[np.ndarray]]
+
+
+# ============================================================================
+# Embeddings
+# ============================================================================
+
+class HashingEmbedder:
+    """
+    Service-free embedding: word unigrams/bigrams and character trigrams
+    hashed into `dim` signed buckets. Lexical rather than semantic, but
+    deterministic, ~20 us per sentence and good enough for tests and as a
+    fallback.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str) -> list[str]:
+        words = text.casefold().split()
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return out
+
+    async def __call__(self, texts: list[str]) -> np.ndarray:
+        return self.embed(texts)
+
+
+class OpenAIEmbedder:
+    """OpenAI-compatible /embeddings endpoint"""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "text-embedding-3-small",
+        base_url: str = "https://api.openai.com/v1",
+        dim: int | None = 512,
+        timeout: float = 5.0,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.dim = dim
+        self.timeout = timeout
+        self._session: aiohttp.ClientSession | None = None
+
+    async def __call__(self, texts: list[str]) -> np.ndarray:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        payload = {"model": self.model, "input": texts}
+        if self.dim is not None:
+            payload["dimensions"] = self.dim
+        async with self._session.post(
+            f"{self.base_url}/embeddings",
+            json=payload,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        ) as response:
+            response.raise_for_status()
+            data = (await response.json())["data"]
+        return np.asarray([d["embedding"] for d in sorted(data, key=lambda d: d["index"])], dtype=np.float32)
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# ============================================================================
+# Store
+# ============================================================================
+
+class Memory(BaseModel):
+    id: str
+    memory: str
+    categories: list[str] | None
+    created_at: dt.datetime
+
+    def to_content(self, now_at: dt.datetime) -> str:
+        days = (now_at - self.created_at).days
+        return (
+            f'content: {self.memory}\n'
+            f'categories: {self.categories}\n'
+            f'created_at: {"today" if days < 1 else f"{days} days ago"}'
+        )
+
+
+class LocalVectorStore:
+    """
+    One SQLite file per user holding the memories and their float32
+    embeddings. On open the rows are loaded into a normalized matrix kept in
+    memory, so search is a single matrix-vector product; inserts go to both.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.ids: list[str] = []
+        self.texts: list[str] = []
+        self.categories: list[list[str] | None] = []
+        self.created_at: list[dt.datetime] = []
+        self.agent_ids: list[str] = []
+        self._keys: set[tuple[str, str]] = set()
+        # (capacity, dim) normalized embeddings and (capacity,) agent codes, first len(ids) rows in use
+        self._matrix: np.ndarray | None = None
+        self._agent_codes = np.zeros(0, dtype=np.int32)
+        self._codes: dict[str, int] = {}
+        self._conn: sqlite3.Connection | None = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS memories ("
+            "id TEXT PRIMARY KEY, agent_id TEXT, memory TEXT, categories TEXT, created_at TEXT, embedding BLOB)"
+        )
+        rows = self._conn.execute(
+            "SELECT id, agent_id, memory, categories, created_at, embedding FROM memories ORDER BY rowid"
+        ).fetchall()
+        if rows:
+            self.append(
+                ids=[r[0] for r in rows],
+                agent_ids=[r[1] for r in rows],
+                texts=[r[2] for r in rows],
+                categories=[json.loads(r[3]) if r[3] else None for r in rows],
+                created_at=[dt.datetime.fromisoformat(r[4]) for r in rows],
+                embeddings=_normalized(np.stack([np.frombuffer(r[5], dtype=np.float32) for r in rows])),
+            )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def contains(self, agent_id: str, text: str) -> bool:
+        return (agent_id, text) in self._keys
+
+    def write(
+        self,
+        agent_id: str,
+        texts: list[str],
+        categories: list[list[str] | None],
+        created_at: list[dt.datetime],
+        embeddings: np.ndarray,
+    ) -> tuple[list[str], np.ndarray]:
+        """Persist new rows, returns their ids and normalized embeddings for `append`"""
+        embeddings = _normalized(np.asarray(embeddings, dtype=np.float32))
+        ids = [str(uuid.uuid4()) for _ in texts]
+        self._conn.executemany(
+            "INSERT INTO memories VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (i, agent_id, t, json.dumps(c) if c else None, at.isoformat(), e.tobytes())
+                for i, t, c, at, e in zip(ids, texts, categories, created_at, embeddings)
+            ],
+        )
+        self._conn.commit()
+        return ids, embeddings
+
+    def add(self, agent_id, texts, categories, created_at, embeddings) -> None:
+        ids, embeddings = self.write(agent_id, texts, categories, created_at, embeddings)
+        self.append(ids, [agent_id] * len(texts), texts, categories, created_at, embeddings)
+
+    def append(self, ids, agent_ids, texts, categories, created_at, embeddings) -> None:
+        n, new_n = len(self.ids), len(self.ids) + len(ids)
+        if self._matrix is not None and self._matrix.shape[1] != embeddings.shape[1]:
+            raise ValueError(f"embedding dim {embeddings.shape[1]} != store dim {self._matrix.shape[1]}")
+        if self._matrix is None or new_n > len(self._matrix):
+            capacity = max(64, new_n, 2 * n)
+            grown = np.zeros((capacity, embeddings.shape[1]), dtype=np.float32)
+            codes = np.zeros(capacity, dtype=np.int32)
+            if n:
+                grown[:n] = self._matrix[:n]
+                codes[:n] = self._agent_codes[:n]
+            self._matrix, self._agent_codes = grown, codes
+        self._matrix[n:new_n] = embeddings
+        self._agent_codes[n:new_n] = [self._codes.setdefault(a, len(self._codes)) for a in agent_ids]
+        self.ids.extend(ids)
+        self.agent_ids.extend(agent_ids)
+        self.texts.extend(texts)
+        self.categories.extend(categories)
+        self.created_at.extend(created_at)
+        self._keys.update(zip(agent_ids, texts))
+
+    def search(self, query: np.ndarray, top_k: int, agent_id: str | None = None, min_score: float = 0.0) -> list[tuple[int, float]]:
+        """Cosine top-k as (row, score), best first"""
+        n = len(self.ids)
+        if n == 0 or self._matrix is None:
+            return []
+        query = _normalized(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        scores = self._matrix[:n] @ query
+        if agent_id is not None:
+            code = self._codes.get(agent_id)
+            if code is None:
+                return []
+            scores = np.where(self._agent_codes[:n] == code, scores, -np.inf)
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] >= min_score]
+
+
+# ============================================================================
+# Memory backend
+# ============================================================================
+
+class LocalMemory:
+    """
+    Drop-in, service-free alternative to Mem0Memory / ZepMemory. Every user
+    message long enough to carry a fact is stored verbatim with its
+    embedding; searches run in process against the user's store.
+    """
+
+    # one open store per user file, shared by concurrent sessions of that user, and
+    # one lock per file serializing its opening and the dedup + write of new memories
+    _stores: weakref.WeakValueDictionary[Path, LocalVectorStore] = weakref.WeakValueDictionary()
+    _path_locks: weakref.WeakValueDictionary[Path, asyncio.Lock] = weakref.WeakValueDictionary()
+
+    def __init__(
+        self,
+        user_id: str,
+        agent_id: str,
+        run_id: str,
+        embed: EmbedFn | None = None,
+        root: Path = LOCAL_MEMORY_DIR,
+        roles: tuple[str, ...] = ('user',),
+        min_chars: int = 12,
+        min_score: float = 0.2,
+        max_cached_queries: int = 256,
+    ) -> None:
+        self._user_id = user_id
+        self._agent_id = agent_id
+        self._run_id = run_id
+        self._embed = embed or HashingEmbedder()
+        self._path = root / f"{uuid.uuid5(uuid.NAMESPACE_URL, user_id).hex}.sqlite"
+        self.roles = roles
+        self.min_chars = min_chars
+        self.min_score = min_score
+        self.max_cached_queries = max_cached_queries
+        self._query_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._store_ref: LocalVectorStore | None = None
+        self._lock = self._path_locks.setdefault(self._path, asyncio.Lock())
+
+    async def _store(self) -> LocalVectorStore:
+        if self._store_ref is not None:
+            return self._store_ref
+        async with self._lock:
+            store = self._stores.get(self._path)
+            if store is None:
+                store = LocalVectorStore(self._path)
+                await asyncio.to_thread(store.open)
+                self._stores[self._path] = store
+                logger.info(f"✅ DONE to open local memory | {self._user_id} | {len(store)} memories")
+            self._store_ref = store
+        return store
+
+    async def _embed_query(self, query: str) -> np.ndarray:
+        cached = self._query_cache.get(query)
+        if cached is not None:
+            self._query_cache.move_to_end(query)
+            return cached
+        vector = (await self._embed([query]))[0]
+        self._query_cache[query] = vector
+        while len(self._query_cache) > self.max_cached_queries:
+            self._query_cache.popitem(last=False)
+        return vector
+
+    async def add_message(
+        self,
+        role: Literal['user', 'assistant'],
+        content: str,
+        name: str | None,
+        created_at: dt.datetime | None,
+    ) -> None:
+        await self.add_messages([MemoryMessage(role=role, content=content, name=name, created_at=created_at)])
+
+    async def add_messages(self, messages: list[MemoryMessage]) -> None:
+        store = await self._store()
+        async with self._lock:
+            now_at = dt.datetime.now(dt.timezone.utc)
+            new: dict[str, MemoryMessage] = {}
+            for m in messages:
+                text = m.content.strip()
+                if m.role in self.roles and len(text) >= self.min_chars and not store.contains(self._agent_id, text):
+                    new.setdefault(text, m)
+            if not new:
+                return
+            texts = list(new)
+            categories = [[m.role] for m in new.values()]
+            created_at = [(m.created_at or now_at).astimezone(dt.timezone.utc) for m in new.values()]
+            embeddings = await self._embed(texts)
+            # only the SQLite write leaves the loop, searches never see a half-appended store
+            ids, embeddings = await asyncio.to_thread(
+                store.write, self._agent_id, texts, categories, created_at, embeddings
+            )
+            store.append(ids, [self._agent_id] * len(texts), texts, categories, created_at, embeddings)
+
+    @staticmethod
+    def memories_to_content(memories: list[Memory]) -> str:
+        now_at = dt.datetime.now(dt.timezone.utc)
+        all_memory_content = '\n\n'.join([m.to_content(now_at) for m in memories])
+        return f'This is a set of relevant memories:\n\n{all_memory_content}'
+
+    async def _search(self, query: str, top_k: int) -> list[Memory]:
+        store = await self._store()
+        hits = store.search(await self._embed_query(query), top_k, agent_id=self._agent_id, min_score=self.min_score)
+        return [
+            Memory(id=store.ids[i], memory=store.texts[i], categories=store.categories[i], created_at=store.created_at[i])
+            for i, _ in hits
+        ]
+
+    async def search_for_turn(self, content: str, *, top_k: int = 5) -> list[Memory]:
+        return await self._search(content, top_k)
+
+    async def search_for_system(self, prompt: str, *, top_k: int = 15) -> list[Memory]:
+        return await self._search(prompt, top_k)
+
+    async def retrieve(self, query: str, top_k: int = 15, *, for_system: bool = False) -> list[str]:
+        """Relevant memories as plain lines, for MemoryRetriever"""
+        return [m.memory for m in await self._search(query, top_k)]
+
+    async def construct_system_prompt_safe(self, prompt: str) -> str | None:
+        try:
+            memories = await self.search_for_system(prompt)
+        except Exception:
+            logger.exception('failed to get memories')
+            return None
+        if not memories:
+            return None
+        return LocalMemory.memories_to_content(memories)
@@ -1,6 +1,8 @@
 import asyncio
+import gzip
+import json
 import logging
-from collections import defaultdict
+from collections import defaultdict, deque
 from dataclasses import dataclass
 from typing import Any, Literal
 
@@ -35,6 +37,9 @@ class Loki(logging.Handler):
         mode: Literal["dev", "start", "console"],
         noisy_errors: list[str] = [],
         noisy_strategy: Literal["NOTSET", "supress"] = "supress",
+        max_buffer: int = 10_000,
+        flush_size: int = 500,
+        flush_interval: float = 5.0,
     ):
         super().__init__()
         assert len(labels) <= 15, "Loki labels must be less than 15"
@@ -42,8 +47,18 @@ class Loki(logging.Handler):
         self.user_id = user_id
         self.api_key = api_key
         self.labels = {k: str(v) for k, v in labels.items()}
-        self.buffer: list[LokiRecord] = []
+        # raw records, formatted only when shipped; oldest are dropped when full
+        self.buffer: deque[logging.LogRecord] = deque(maxlen=max_buffer)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.n_dropped_overflow = 0
+        self.n_dropped_failed = 0
         self.mode = mode
+        self._last_created: float | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._flush_event: asyncio.Event | None = None
+        self._shipper_task: asyncio.Task | None = None
+        self._session: aiohttp.ClientSession | None = None
         self.codepos_to_nrepeats: defaultdict[tuple[str, int], int] = defaultdict(int)
         self.noisy_logs = noisy_errors
         self.noisy_strategy = noisy_strategy
@@ -68,17 +83,25 @@ class Loki(logging.Handler):
             "%(lname)s - %(message)s %(esc_gray)s%(extra)s%(esc_reset)s"
         )
         self.formatter._level_colors["NOISY"] = self.formatter._esc_codes["esc_gray"]
+        # installed on the loggers above, so ship from now on when created inside a running loop
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass  # no loop yet, call start() from the loop that should ship the logs
+        else:
+            self.start()
 
     def emit(self, record: logging.LogRecord):
+        # only cheap, order-dependent bookkeeping here, formatting happens in push
         def _is_noisy_error(record: logging.LogRecord) -> bool:
             return any(error in record.message for error in self.noisy_logs)
 
         def _add_timediff(record: logging.LogRecord) -> logging.LogRecord:
-            if len(self.buffer) > 0:
-                lastrecord: LokiRecord = self.buffer[-1]
-                record.timediff = f"[+{record.created - lastrecord.created:.1f}s]"
+            if self._last_created is not None:
+                record.timediff = f"[+{record.created - self._last_created:.1f}s]"
             else:
                 record.timediff = "[firstlog]"
+            self._last_created = record.created
             return record
 
         def _add_nrepeats(record: logging.LogRecord) -> logging.LogRecord:
@@ -90,6 +113,31 @@ class Loki(logging.Handler):
                 record.nrepeats = ""
             return record
 
+        # freeze the message now, args may be mutated before the record is shipped
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        # the traceback keeps its frames (and their locals) alive while buffered, keep only its text
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        if _is_noisy_error(record):
+            if self.noisy_strategy == "NOTSET":
+                record.levelname = "NOTSET"
+            elif self.noisy_strategy == "supress":
+                return
+        record = _add_timediff(record)
+        record = _add_nrepeats(record)
+        if len(self.buffer) == self.buffer.maxlen:
+            self.n_dropped_overflow += 1
+        self.buffer.append(record)
+        if len(self.buffer) >= self.flush_size and self._flush_event is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._flush_event.set)
+            except RuntimeError:
+                pass  # loop already closed, aclose/push ships the rest
+
+    def _to_loki_record(self, record: logging.LogRecord) -> LokiRecord:
         def _add_optional_name(record: logging.LogRecord) -> logging.LogRecord:
             if record.name in self.MAIN_FILE_NAMES:
                 record.lname = ""
@@ -108,63 +156,100 @@ class Loki(logging.Handler):
             record.extra = extra
             return record
 
-        record.message = record.getMessage()
-        if _is_noisy_error(record):
-            if self.noisy_strategy == "NOTSET":
-                record.levelname = "NOTSET"
-            elif self.noisy_strategy == "supress":
-                return
-        record = _add_timediff(record)
-        record = _add_nrepeats(record)
         record = _add_optional_name(record)
         record = _add_extra(record)
-        self.buffer.append(
-            LokiRecord(
-                record.created,
-                self.format(record),
-                record.levelname.lower(),
-            )
-        )
+        return LokiRecord(record.created, self.format(record), record.levelname.lower())
+
+    def start(self) -> None:
+        """Start the background shipper on the running loop (flushes every flush_interval or flush_size records)"""
+        if self.mode == "console" or self._shipper_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._flush_event = asyncio.Event()
+        self._shipper_task = asyncio.create_task(self._ship_loop())
+
+    async def _ship_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            while self.buffer:
+                try:
+                    await self.push()
+                except Exception:
+                    break  # already logged and counted in push
+                if len(self.buffer) < self.flush_size:
+                    break
+
+    async def aclose(self, timeout: int = 5):
+        """Stop the shipper, push what is left and close the HTTP session"""
+        if self._shipper_task is not None:
+            self._shipper_task.cancel()
+            await asyncio.gather(self._shipper_task, return_exceptions=True)
+            self._shipper_task = None
+        try:
+            while self.buffer:
+                await self.push(timeout=timeout)
+        except Exception:
+            pass
+        finally:
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "buffered": len(self.buffer),
+            "dropped_overflow": self.n_dropped_overflow,
+            "dropped_failed": self.n_dropped_failed,
+        }
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(auth=aiohttp.BasicAuth(self.user_id, self.api_key))
+        return self._session
 
-    # TODO finish this
-    # @retry_on_failure(max_retries=3, retry_delay=1.0)
-    # @log_execution("loki push", measure_time=True)
     async def push(self, timeout: int = 5, max_retries: int = 3, retry_delay: float = 1.0):
+        """Ship up to flush_size buffered records as one gzipped batch; the batch is dropped (and counted) if every attempt fails"""
         if self.mode == "console":
             return
         if not self.buffer:
             return
 
+        batch = []
+        while self.buffer and len(batch) < self.flush_size:
+            batch.append(self.buffer.popleft())
+
         level2entries = defaultdict(list)
-        for record in self.buffer:
+        for record in map(self._to_loki_record, batch):
             level2entries[record.level].append([record.ts, record.entry])
-        n_entries = sum(len(entries) for entries in level2entries.values())
+        n_entries = len(batch)
         logger.info(f"🔄 Pushing {n_entries} logs to Loki")
         streams = []
         for level, entries in level2entries.items():
             streams.append({"stream": {**self.labels, "level": level}, "values": entries})  # type: ignore
-        payload = {"streams": streams}
-        headers = {"Content-Type": "application/json"}
+        payload = gzip.compress(json.dumps({"streams": streams}).encode("utf-8"), compresslevel=5)
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
 
         for attempt in range(1, max_retries + 1):
             try:
-                auth = aiohttp.BasicAuth(self.user_id, self.api_key)
-                async with aiohttp.ClientSession(
-                    timeout=aiohttp.ClientTimeout(total=timeout), auth=auth
-                ) as S:
-                    async with S.post(self.url, json=payload, headers=headers) as response:
-                        status = response.status
-                        if 200 <= status < 300:
-                            logger.info(f"✅ Sent {n_entries} logs to Loki")
-                            self.buffer.clear()
-                            return
-                        else:
-                            response_text = await response.text()
-                            raise Exception(f"HTTP {status}: {response_text}")
+                async with self._ensure_session().post(
+                    self.url, data=payload, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as response:
+                    status = response.status
+                    if 200 <= status < 300:
+                        logger.info(f"✅ Sent {n_entries} logs to Loki ({len(payload)} bytes gzipped)")
+                        return
+                    else:
+                        response_text = await response.text()
+                        raise Exception(f"HTTP {status}: {response_text}")
 
             except Exception as e:
                 if attempt == max_retries:
-                    logger.error(f"❌ Failed to send logs after {max_retries} attempts: {e}")
+                    self.n_dropped_failed += n_entries
+                    logger.error(f"❌ Failed to send logs after {max_retries} attempts, dropped {n_entries}: {e}")
                     raise Exception(f"Failed to send logs after {max_retries} attempts: {e}")
                 else:
                     logger.warning(f"🔄 Push logs attempt {attempt}/{max_retries} failed: {e}")
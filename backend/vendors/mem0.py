@@ -7,6 +7,8 @@ from pydantic import BaseModel, TypeAdapter
 
 from fluently_agents.utils import humanize_time_since
 
+from .memory_ingest import MemoryMessage
+
 logger = logging.getLogger(__name__)
 
 ORG_ID = 'org_BD6ulFRTb7Ucv8wfoLICY7T77AUWHDtbbvf6QzS9'
@@ -139,9 +141,14 @@ class Mem0Memory:
         name: str | None,
         created_at: dt.datetime | None,
     ) -> None:
+        await self.add_messages([MemoryMessage(role=role, content=content, name=name, created_at=created_at)])
+
+    async def add_messages(self, messages: list[MemoryMessage]) -> None:
+        """One extraction call for the whole batch, timestamped with its first message"""
         # with self.grafana.gauge_time_seconds('memory_add_time', log=True, logger=logger):
+        created_at = next((m.created_at for m in messages if m.created_at), None)
         await self._client.add(
-            messages=[{'role': role, 'content': content, 'name': name}],
+            messages=[{'role': m.role, 'content': m.content, 'name': m.name} for m in messages],
             user_id=self._user_id,
             agent_id=self._agent_id,
             # run_id=self._run_id,
@@ -187,6 +194,14 @@ class Mem0Memory:
         )
         return TypeAdapter(list[Memory]).validate_python(raw_results['results'])
 
+    async def retrieve(self, query: str, top_k: int = 15, *, for_system: bool = False) -> list[str]:
+        """Relevant memories as plain lines, for MemoryRetriever; only the system query is reranked"""
+        if for_system:
+            memories = await self.search_for_system(query, top_k=top_k)
+        else:
+            memories = await self.search_for_turn(query, top_k=top_k)
+        return [m.memory for m in memories]
+
     async def construct_system_prompt_safe(self, prompt: str) -> str | None:
         try:
             memories = await self.search_for_system(prompt)
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import logging
 import os
 import random
+import weakref
 from copy import deepcopy
-from typing import TYPE_CHECKING, Any, Literal, TypeVar, cast
+from typing import TYPE_CHECKING, Any, Literal, TypeVar, cast, get_origin
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
@@ -88,6 +90,107 @@ class PersonalInterests(BaseModel):
     travel: list[str] = Field(default=[], description="Travel history or future plans.")
 
 
+# --- Merge engine ---
+# Field plans are computed once per model class; merge and filter walk them in a single
+# pass and return the original (sub-)model object whenever nothing in it changes.
+
+_FIELD_PLANS: dict[type[BaseModel], tuple[tuple[str, Literal["model", "list", "value"]], ...]] = {}
+_EMPTY_MODELS: dict[type[BaseModel], BaseModel] = {}
+
+
+def _field_plan(cls: type[BaseModel]) -> tuple[tuple[str, Literal["model", "list", "value"]], ...]:
+    plan = _FIELD_PLANS.get(cls)
+    if plan is None:
+        entries = []
+        for name, field in cls.model_fields.items():
+            annotation = field.annotation
+            if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+                entries.append((name, "model"))
+            elif get_origin(annotation) is list:
+                entries.append((name, "list"))
+            else:
+                entries.append((name, "value"))
+        plan = _FIELD_PLANS[cls] = tuple(entries)
+    return plan
+
+
+def _with_changes(model: T, changes: dict[str, Any]) -> T:
+    # shallow copy: unchanged fields (and sub-models) are shared with `model`
+    return model.model_copy(update=changes) if changes else model
+
+
+def _empty_with(cls: type[T], values: dict[str, Any]) -> T:
+    empty = _EMPTY_MODELS.get(cls)
+    if empty is None:
+        empty = _EMPTY_MODELS[cls] = cls.model_validate({})
+    return cast(T, empty.model_copy(update=values))
+
+
+def merge_profiles(old: T, new: T) -> tuple[T, T]:
+    """
+    Merge `new` into `old` and return (merged, diff) without mutating either:
+    None and empty lists in `new` keep the old value, lists are extended
+    with order-stable dedup (items repeated in `new` move to the end, as before),
+    scalars are overwritten. `diff` holds only what actually changed.
+    """
+    changes: dict[str, Any] = {}
+    diff_values: dict[str, Any] = {}
+    for key, kind in _field_plan(type(new)):
+        new_value = getattr(new, key, None)
+        if new_value is None:
+            continue
+        old_value = getattr(old, key, None)
+        if kind == "list" and isinstance(new_value, list):
+            if not new_value:
+                continue
+            new_unique = list(dict.fromkeys(new_value))
+            new_set = set(new_unique)
+            old_list = old_value or []
+            merged = [ov for ov in old_list if ov not in new_set] + new_unique
+            if merged != old_list:
+                changes[key] = merged
+            old_set = set(old_list)
+            added = [v for v in new_unique if v not in old_set]
+            if added:
+                diff_values[key] = added
+        elif kind == "model" and isinstance(old_value, BaseModel) and isinstance(new_value, BaseModel):
+            merged, sub_diff = merge_profiles(old_value, new_value)
+            if merged is not old_value:
+                changes[key] = merged
+            if sub_diff.model_fields_set:
+                diff_values[key] = sub_diff
+        else:
+            if new_value != old_value:
+                changes[key] = new_value
+                diff_values[key] = new_value
+    return _with_changes(old, changes), _empty_with(type(new), diff_values)
+
+
+def filter_profile(
+    model: T,
+    min_value_length: int,
+    max_value_length: int,
+    k_last_list_elements: int | None,
+) -> T:
+    """Single-pass `UserProfile.filter`, sharing every sub-model and list it leaves untouched"""
+    changes: dict[str, Any] = {}
+    for key, kind in _field_plan(type(model)):
+        value = getattr(model, key)
+        if isinstance(value, BaseModel):
+            filtered = filter_profile(value, min_value_length, max_value_length, k_last_list_elements)
+        elif isinstance(value, list):
+            filtered = [v for v in value if min_value_length <= len(str(v)) <= max_value_length]
+            if k_last_list_elements:
+                filtered = filtered[-k_last_list_elements:]
+            if len(filtered) == len(value):
+                continue
+        else:
+            filtered = value if min_value_length <= len(str(value)) <= max_value_length else None
+        if filtered is not value:
+            changes[key] = filtered
+    return _with_changes(model, changes)
+
+
 # --- The Final, Unified Top-Level Class ---
 
 
@@ -138,32 +241,12 @@ class UserProfile(BaseModel):
         max_value_length: int | None = None,
         k_last_list_elements: int | None = None,
     ) -> UserProfile:
-        out = deepcopy(self)
-        min_value_length = min_value_length or -1
-        max_value_length = max_value_length or 1_000_000
-
-        def _filter_value(value: Any) -> Any:
-            if isinstance(value, list):
-                value = [v for v in value if min_value_length <= len(str(v)) <= max_value_length]
-                if k_last_list_elements:
-                    value = value[-k_last_list_elements:]
-                return value
-            else:
-                if min_value_length <= len(str(value)) <= max_value_length:
-                    return value
-                else:
-                    return None
-
-        def _filter(x: T) -> T:
-            for field in x.model_fields:
-                value = getattr(x, field)
-                if isinstance(value, BaseModel):
-                    setattr(x, field, _filter(value))
-                else:
-                    setattr(x, field, _filter_value(value))
-            return x
-
-        return _filter(out)
+        return filter_profile(
+            self,
+            min_value_length=min_value_length or -1,
+            max_value_length=max_value_length or 1_000_000,
+            k_last_list_elements=k_last_list_elements,
+        )
 
     def flatten_format(self) -> dict[str, str]:
         def _format(key: str) -> str:
@@ -195,44 +278,13 @@ class UserProfile(BaseModel):
         return _flatten(self)
 
     def update_w_repair_and_calc_diff(self: T, update: T) -> T:
-        def compare_pydantic_schemas_to_update_and_diff(old: T, new: T) -> tuple[T, T]:
-            updated = deepcopy(old)
-            diff = type(new).model_validate({}, strict=False)
-            for key in new.model_fields:
-                old_value, new_value = (
-                    getattr(old, key, None),
-                    getattr(new, key, None),
-                )
-                if new_value is None:
-                    continue
-                if isinstance(new_value, list) and len(new_value) == 0:
-                    setattr(updated, key, old_value or [])
-                    continue
-                if isinstance(old_value, BaseModel) and isinstance(new_value, BaseModel):
-                    _updated, _diff = compare_pydantic_schemas_to_update_and_diff(
-                        cast(T, old_value), cast(T, new_value)
-                    )
-                    setattr(updated, key, _updated)
-                    setattr(diff, key, _diff)
-                    continue
-                if isinstance(old_value, list) and isinstance(new_value, list):
-                    new_value_unique = list(set(new_value))  # we don't care about order here
-                    old_value_unique = [
-                        ov for ov in old_value if (ov not in new_value)
-                    ]  # same order
-                    _updated = old_value_unique + new_value_unique  # type: ignore
-                    _diff = list(set(new_value) - set(old_value))  # type: ignore
-                    setattr(updated, key, _updated)
-                    setattr(diff, key, _diff)
-                    continue
-                # default: str, int, float, bool, ...
-                setattr(updated, key, new_value)
-                setattr(diff, key, new_value if (new_value != old_value) else None)
-            return updated, diff
-
-        _, diff = compare_pydantic_schemas_to_update_and_diff(self, update)
+        _, diff = merge_profiles(self, update)
         return diff
 
+    def merge_w_diff(self: T, update: T) -> tuple[T, T]:
+        """(merged profile, diff) in one pass, see `merge_profiles`"""
+        return merge_profiles(self, update)
+
     def is_empty(self) -> bool:
         return len(self.dump()) == 0
 
@@ -661,12 +713,21 @@ class UpdatableMemoryJSON:
         "exclude_unset": True,
     }
 
+    # at most one in-flight S3 write per user, shared by all instances in the process
+    _user_save_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
     def __init__(
         self,
         user_id: str,
         s3_client: AsyncS3,
         llmapi: LLMAPI,
         n_retries: int = 3,
+        save_debounce: float = 5.0,
+        extract_every_user_turns: int = 4,
+        extract_idle_seconds: float = 20.0,
+        max_new_utterances: int = 24,
+        context_utterances: int = 4,
+        max_extractions: int = 8,
     ):
         self.user_id = user_id
         self.s3_client = s3_client
@@ -674,6 +735,28 @@ class UpdatableMemoryJSON:
         self._memory: UserProfile | None = None
         self.n_retries = n_retries
         self.n_user_utterances_updates: set[int] = set()
+        # write-behind: updates mark the profile dirty, one debounced save uploads it
+        self.save_debounce = save_debounce
+        self._dirty = False
+        self._saved_hash: str | None = None
+        self._debounced_save: asyncio.Task | None = None
+        self._closing = False
+        self._save_lock = self._user_save_locks.setdefault(user_id, asyncio.Lock())
+        # incremental extraction: only utterances after `watermark` are sent, every
+        # `extract_every_user_turns` user turns or after `extract_idle_seconds` of silence;
+        # at most `max_extractions` calls of at most `max_new_utterances` each per session,
+        # a longer backlog is sent oldest first over the following calls
+        self.extract_every_user_turns = extract_every_user_turns
+        self.extract_idle_seconds = extract_idle_seconds
+        self.max_new_utterances = max_new_utterances
+        self.context_utterances = context_utterances
+        self.max_extractions = max_extractions
+        self.watermark = 0
+        self.n_extractions = 0
+        self._budget_warned = False
+        self._utterances: list[dict[str, Any]] = []
+        self._idle_extract: asyncio.Task | None = None
+        self._extract_lock = asyncio.Lock()
 
     def is_empty(self) -> bool:
         return (self._memory is None) or self._memory.is_empty()
@@ -711,19 +794,130 @@ class UpdatableMemoryJSON:
             logger.warning(f"❌ VALIDATION `load_memory` | {e}")
             self._memory = None
         else:
+            self._saved_hash = self._profile_hash(self._memory.dump())
             logger.info(f"✅ DONE `load_memory` | memory={self._memory.dump()}")
 
+    @staticmethod
+    def _profile_hash(dumped: dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(dumped, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _mark_dirty(self):
+        """Schedule a debounced save; saves requested while one is pending are coalesced"""
+        self._dirty = True
+        if self._debounced_save is None or self._debounced_save.done():
+            self._debounced_save = asyncio.create_task(self._save_after_debounce())
+
+    async def _save_after_debounce(self):
+        await asyncio.sleep(self.save_debounce)
+        try:
+            await self.save_memory()
+        finally:
+            # updates landing during the upload found this task running and did not schedule a save
+            self._debounced_save = None
+            if self._dirty and not self._closing:
+                self._mark_dirty()
+
     async def save_memory(self):
-        if self.is_empty():
-            return
-        assert self._memory is not None
-        self._memory = self._memory.filter(
-            min_value_length=1,
-            max_value_length=100,
-            k_last_list_elements=5,
-        )
-        await self.s3_client.save_file(f"memory/{self.user_id}.json", self._memory.dump())
-        logger.info(f"✅ DONE `save_memory` | memory={self._memory.dump()}")
+        """Upload the profile if it is dirty and differs from what S3 already holds"""
+        async with self._save_lock:
+            if not self._dirty or self.is_empty():
+                return
+            assert self._memory is not None
+            # the profile is kept filtered by load/update, no need to filter again here
+            dumped = self._memory.dump()
+            profile_hash = self._profile_hash(dumped)
+            # cleared before the upload so updates landing meanwhile schedule another save
+            self._dirty = False
+            if profile_hash == self._saved_hash:
+                logger.debug("⏭️ SKIP `save_memory` | profile unchanged")
+                return
+            try:
+                saved = await self.s3_client.save_file(f"memory/{self.user_id}.json", dumped)
+            except BaseException:
+                self._dirty = True
+                raise
+            if not saved:
+                self._dirty = True  # retried by the next save or aclose
+                return
+            self._saved_hash = profile_hash
+            logger.info(f"✅ DONE `save_memory` | memory={dumped}")
+
+    async def aclose(self):
+        """Flush pending changes, call on job shutdown (e.g. ctx.add_shutdown_callback)"""
+        self._closing = True
+        if self._idle_extract is not None and not self._idle_extract.done():
+            self._idle_extract.cancel()
+            await asyncio.gather(self._idle_extract, return_exceptions=True)
+        if self._debounced_save is not None and not self._debounced_save.done():
+            self._debounced_save.cancel()
+            await asyncio.gather(self._debounced_save, return_exceptions=True)
+        update_task = getattr(self, "_update_memory_task", None)
+        if update_task is not None and not update_task.done():
+            await asyncio.gather(update_task, return_exceptions=True)
+        while self._n_pending_user_turns():
+            watermark = self.watermark
+            await self.extract_pending()
+            if self.watermark == watermark:  # budget spent
+                break
+        await self.save_memory()
+
+    def _n_pending_user_turns(self) -> int:
+        return sum(1 for u in self._utterances[self.watermark:] if u["role"] == "user")
+
+    def on_utterances(self, utterances: list[dict[str, Any]]) -> asyncio.Task | None:
+        """
+        Call after every turn with the whole conversation so far. Starts an
+        extraction once enough user turns are pending, otherwise (re)arms the idle timer.
+        """
+        self._utterances = utterances
+        if self._idle_extract is not None and not self._idle_extract.done():
+            self._idle_extract.cancel()
+        n_pending = self._n_pending_user_turns()
+        if n_pending == 0:
+            return None
+        if n_pending >= self.extract_every_user_turns:
+            self._update_memory_task = asyncio.create_task(self.extract_pending())
+            return self._update_memory_task
+        self._idle_extract = asyncio.create_task(self._extract_after_idle())
+        return None
+
+    async def _extract_after_idle(self):
+        await asyncio.sleep(self.extract_idle_seconds)
+        # the extraction runs in its own task: the next turn and aclose cancel this one,
+        # which must only ever stop the timer, not an LLM call that already moved the watermark
+        self._update_memory_task = asyncio.create_task(self.extract_pending())
+
+    async def extract_pending(self) -> UserProfile | None:
+        """Extract facts from the utterances after the watermark, if there are new user turns"""
+        async with self._extract_lock:
+            if self._n_pending_user_turns() == 0:
+                return None
+            if self.n_extractions >= self.max_extractions:
+                if not self._budget_warned:
+                    self._budget_warned = True
+                    logger.warning(
+                        f"🟡 `extract_pending` budget of {self.max_extractions} calls spent,"
+                        f" later turns are not extracted | user_id={self.user_id}"
+                    )
+                return None
+            start = self.watermark
+            end = min(len(self._utterances), start + self.max_new_utterances)
+            if end < len(self._utterances):
+                logger.info(
+                    f"🟡 `extract_pending` capped at {self.max_new_utterances} utterances,"
+                    f" {len(self._utterances) - end} left for the next call | user_id={self.user_id}"
+                )
+            context = self._utterances[max(0, start - self.context_utterances):start]
+            conversation = self._utterances[start:end]
+            self.watermark = end
+            self.n_extractions += 1
+            self.n_user_utterances_updates.add(
+                sum(1 for u in self._utterances[:end] if u["role"] == "user")
+            )
+            return await self.update_memory(
+                conversation=self.prepare_utterances(conversation),
+                context=self.prepare_utterances(context),
+            )
 
     async def update_memory(self, conversation: str, context: str = "") -> UserProfile | None:
         logger.debug("🕒 starting `update_memory` in `UpdatableMemoryJSON`")
@@ -749,14 +943,16 @@ class UpdatableMemoryJSON:
                     chat_ctx=MEMORY_UPDATE_TEMPLATE.format(
                         context=context,
                         conversation=conversation,
-                        current_profile=self._memory.dump_json(indent=2),
+                        # compact, no indentation; filter() keeps it bounded, so it serves as the digest
+                        current_profile=self._memory.dump_json(),
                     ),
                     model="gpt-4.1",
                     structured_output=UserProfile,
                     n_retries=self.n_retries,
                 )
                 update = cast(UserProfile, update_response.payload)
-                diff = self._memory.update_w_repair_and_calc_diff(update=update)
+                merged, diff = self._memory.merge_w_diff(update)
+                self._memory = merged
                 diff = diff.filter(
                     min_value_length=1,
                     max_value_length=100,
@@ -767,6 +963,7 @@ class UpdatableMemoryJSON:
                     max_value_length=100,
                     k_last_list_elements=5,
                 )
+                self._mark_dirty()
                 logger.debug(f"🟢 DONE `update_memory` | diff={diff.dump()}")
                 return diff
             else:
@@ -793,6 +990,7 @@ class UpdatableMemoryJSON:
                     max_value_length=100,
                     k_last_list_elements=5,
                 )
+                self._mark_dirty()
                 logger.debug("🟢 DONE `update_memory` (init)")
                 return None
         except Exception as e:
@@ -0,0 +1,165 @@
+import asyncio
+import contextlib
+import datetime as dt
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Literal, Protocol
+
+from .grafana import Grafana
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class MemoryMessage:
+    role: Literal['user', 'assistant']
+    content: str
+    name: str | None = None
+    created_at: dt.datetime | None = None
+
+
+class IngestBackend(Protocol):
+    async def add_messages(self, messages: list[MemoryMessage]) -> None: ...
+
+
+class MemoryIngestQueue:
+    """
+    Per-session write queue in front of the memory vendors. `put` only
+    appends, one worker per backend sends the messages in bulk calls once
+    `max_batch` messages are queued or the oldest one waited `max_delay`
+    seconds. Failed batches are retried with exponential backoff off the
+    voice pipeline's critical path; `aclose` drains what is left.
+
+    A slow backend does not hold back the others, each has its own bounded
+    queue (`max_queue`, oldest messages are dropped first).
+    """
+
+    def __init__(
+        self,
+        backends: dict[str, IngestBackend],
+        *,
+        max_batch: int = 10,
+        max_delay: float = 5.0,
+        max_queue: int = 500,
+        n_retries: int = 3,
+        retry_delay: float = 1.0,
+        grafana: Grafana | None = None,
+    ):
+        self.backends = backends
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.n_retries = n_retries
+        self.retry_delay = retry_delay
+        self.grafana = grafana
+        self.n_sent = 0
+        self.n_batches = 0
+        self.n_dropped = 0
+        self._queues: dict[str, deque[tuple[float, MemoryMessage]]] = {name: deque() for name in backends}
+        self._wake: dict[str, asyncio.Event] = {name: asyncio.Event() for name in backends}
+        self._send_locks: dict[str, asyncio.Lock] = {name: asyncio.Lock() for name in backends}
+        self._workers: dict[str, asyncio.Task] = {}
+
+    def put(
+        self,
+        role: Literal['user', 'assistant'],
+        content: str,
+        name: str | None = None,
+        created_at: dt.datetime | None = None,
+    ) -> None:
+        """Queue a message for every backend, never blocks"""
+        if not content:
+            return
+        message = MemoryMessage(role=role, content=content, name=name, created_at=created_at)
+        now = asyncio.get_running_loop().time()
+        for backend, queue in self._queues.items():
+            if len(queue) >= self.max_queue:
+                queue.popleft()
+                self._dropped(backend, 1)
+            queue.append((now, message))
+            self._wake[backend].set()
+        self.start()
+
+    def start(self) -> None:
+        for backend in self.backends:
+            worker = self._workers.get(backend)
+            if worker is None or worker.done():
+                self._workers[backend] = asyncio.create_task(self._run(backend))
+
+    async def flush(self) -> None:
+        """Send everything queued so far, waiting for the batches in flight"""
+        await asyncio.gather(*(self._drain(backend) for backend in self.backends))
+
+    async def aclose(self, timeout: float = 10.0) -> None:
+        workers = list(self._workers.values())
+        self._workers.clear()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except TimeoutError:
+            left = sum(len(queue) for queue in self._queues.values())
+            logger.error(f"❌ FAILED to flush memory ingestion queue in {timeout}s | {left} messages lost")
+        logger.info(
+            f"✅ DONE memory ingestion | sent {self.n_sent} in {self.n_batches} batches | dropped {self.n_dropped}"
+        )
+
+    async def _run(self, backend: str):
+        queue, wake = self._queues[backend], self._wake[backend]
+        loop = asyncio.get_running_loop()
+        while True:
+            await wake.wait()
+            wake.clear()
+            while queue:
+                # wait for a full batch, at most max_delay after the oldest message
+                remaining = queue[0][0] + self.max_delay - loop.time()
+                if len(queue) < self.max_batch and remaining > 0:
+                    with contextlib.suppress(TimeoutError):
+                        await asyncio.wait_for(wake.wait(), remaining)
+                    wake.clear()
+                    continue
+                async with self._send_locks[backend]:
+                    await self._send_batch(backend)
+
+    async def _drain(self, backend: str):
+        async with self._send_locks[backend]:
+            while self._queues[backend]:
+                await self._send_batch(backend)
+
+    async def _send_batch(self, backend: str):
+        queue = self._queues[backend]
+        batch = [queue.popleft()[1] for _ in range(min(self.max_batch, len(queue)))]
+        if not batch:
+            return
+        if self.grafana is not None:
+            attributes = {"backend": backend}
+            self.grafana.add("memory_ingest_batch_size", "histogram", len(batch), attributes=attributes)
+            self.grafana.add("memory_ingest_queue_depth", "gauge", len(queue), attributes=attributes)
+        try:
+            for attempt in range(1, self.n_retries + 1):
+                try:
+                    await self.backends[backend].add_messages(batch)
+                    self.n_sent += len(batch)
+                    self.n_batches += 1
+                    return
+                except Exception as e:
+                    if attempt == self.n_retries:
+                        logger.error(f"❌ FAILED to ingest {len(batch)} messages | {backend} | {e}")
+                        self._dropped(backend, len(batch))
+                        return
+                    logger.warning(
+                        f"🟡 FAILED to ingest {len(batch)} messages | {backend}"
+                        f" | attempt {attempt}/{self.n_retries} | {e}"
+                    )
+                    await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+        except asyncio.CancelledError:
+            # back to the front of the queue, aclose drains it
+            queue.extendleft((0.0, m) for m in reversed(batch))
+            raise
+
+    def _dropped(self, backend: str, n: int):
+        self.n_dropped += n
+        if self.grafana is not None:
+            self.grafana.add("memory_ingest_dropped", "counter", n, attributes={"backend": backend})
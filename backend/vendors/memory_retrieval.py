@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Protocol
+
+from .grafana import Grafana
+
+logger = logging.getLogger(__name__)
+
+_NORMALIZE_RE = re.compile(r"[\W_]+")
+
+
+class MemoryBackend(Protocol):
+    # `for_system`: the once-per-session system query, backends may rank it more thoroughly
+    async def retrieve(self, query: str, top_k: int = ..., *, for_system: bool = False) -> list[str]: ...
+
+
+def _dedup_key(line: str) -> str:
+    return _NORMALIZE_RE.sub(" ", line.casefold()).strip()
+
+
+class MemoryRetriever:
+    """
+    Single entry point for long-term memory of one user session. A query is
+    fanned out to every configured backend concurrently and whatever answered
+    within `deadline` is merged into one deduplicated prompt block, so memory
+    never adds more than `deadline` seconds to a turn.
+
+    Backends that miss the deadline keep running in the background and their
+    result is cached, the next call with the same query picks it up. The
+    system context is fetched once per session, per-turn results are kept in
+    a small LRU keyed by the normalized query.
+    """
+
+    SYSTEM_KEY = "__system__"
+
+    def __init__(
+        self,
+        backends: dict[str, MemoryBackend],
+        *,
+        deadline: float = 0.5,
+        top_k: int = 10,
+        max_lines: int = 25,
+        max_cached_queries: int = 64,
+        grafana: Grafana | None = None,
+    ):
+        if max_cached_queries < 1:
+            raise ValueError(f"max_cached_queries must be >= 1, got {max_cached_queries}")
+        self.backends = backends
+        self.deadline = deadline
+        self.top_k = top_k
+        self.max_lines = max_lines
+        self.max_cached_queries = max_cached_queries
+        self.grafana = grafana
+        # query key -> backend name -> lines
+        self._results: OrderedDict[str, dict[str, list[str]]] = OrderedDict()
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+
+    async def system_context(self, prompt: str) -> str | None:
+        """Memory block for the system prompt, retrieved once per session"""
+        return await self._context(self.SYSTEM_KEY, prompt)
+
+    async def turn_context(self, content: str) -> str | None:
+        """Memory block relevant to the latest user message"""
+        key = _dedup_key(content)
+        if not key:
+            return None
+        return await self._context(key, content)
+
+    async def aclose(self):
+        tasks = [task for task in self._inflight.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._inflight.clear()
+
+    async def _context(self, key: str, query: str) -> str | None:
+        t0 = time.perf_counter()
+        results = self._cached(key)
+        tasks = []
+        for name in self.backends:
+            if name in results:
+                continue
+            task = self._inflight.get((key, name))
+            if task is None:
+                task = asyncio.create_task(self._fetch(results, key, name, query))
+                self._inflight[(key, name)] = task
+            tasks.append(task)
+
+        if not tasks:
+            outcome = "cached"
+        else:
+            # asyncio.wait does not cancel the stragglers, they fill the cache later
+            _, pending = await asyncio.wait(tasks, timeout=self.deadline)
+            if not pending:
+                outcome = "success" if len(results) == len(self.backends) else "error"
+            else:
+                outcome = "partial" if results else "timeout"
+                logger.warning(
+                    f"🟡 memory retrieval deadline hit | {len(pending)}/{len(self.backends)} backends pending"
+                )
+
+        block = self._compose(results)
+        if self.grafana is not None:
+            self.grafana.add("memory_retrieval_duration", "histogram", time.perf_counter() - t0, "s")
+            self.grafana.add("memory_retrieval_outcome", "enum", outcome)
+        return block
+
+    def _cached(self, key: str) -> dict[str, list[str]]:
+        results = self._results.get(key)
+        if results is None:
+            results = self._results[key] = {}
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_cached_queries:
+            evicted = next(k for k in self._results if k != self.SYSTEM_KEY)
+            del self._results[evicted]
+        return results
+
+    async def _fetch(self, results: dict[str, list[str]], key: str, name: str, query: str):
+        try:
+            results[name] = await self.backends[name].retrieve(
+                query, top_k=self.top_k, for_system=key == self.SYSTEM_KEY
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # not cached, retried on the next call
+            logger.error(f"❌ FAILED to retrieve memories | {name} | {e}")
+        finally:
+            self._inflight.pop((key, name), None)
+
+    def _compose(self, results: dict[str, list[str]]) -> str | None:
+        seen, lines = set(), []
+        for name in self.backends:  # configured order is the priority order
+            for line in results.get(name, ()):
+                dedup_key = _dedup_key(line)
+                if not dedup_key or dedup_key in seen:
+                    continue
+                seen.add(dedup_key)
+                lines.append(f"- {line.strip()}")
+                if len(lines) >= self.max_lines:
+                    break
+            if len(lines) >= self.max_lines:
+                break
+        if not lines:
+            return None
+        return "This is a set of relevant memories:\n\n" + "\n".join(lines)
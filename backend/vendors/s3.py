@@ -1,15 +1,150 @@
 import asyncio
+import contextlib
+import gzip
+import hashlib
 import json
 import logging
+import os
 import time
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Literal
 
 import aioboto3
 from botocore.exceptions import ClientError
 
+try:
+    import zstandard
+except ImportError:  # optional, falls back to gzip
+    zstandard = None
+
 logger = logging.getLogger(__name__)
 
+# the disk tier holds decoded user data, so it is off unless a private directory is configured
+S3_CACHE_DIR = Path(os.environ["S3_CACHE_DIR"]) if os.getenv("S3_CACHE_DIR") else None
+S3_CACHE_DISK_TTL = 24 * 60 * 60
+
+
+def _compress(body: bytes, compression: str) -> bytes:
+    if compression == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return body
+
+
+def _decompress(body: bytes, content_encoding: str | None) -> bytes:
+    if content_encoding == "gzip":
+        return gzip.decompress(body)
+    if content_encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("object is zstd-compressed but `zstandard` is not installed")
+        return zstandard.ZstdDecompressor().decompress(body)
+    return body
+
+
+class S3ReadCache:
+    """
+    Bounded read-through cache of S3 JSON objects keyed by path, holding the
+    ETag and the decoded JSON bytes: an in-memory LRU plus an opt-in disk tier
+    (`cache_dir`, S3_CACHE_DIR) that survives process restarts on the same
+    machine. Disk I/O runs in a worker thread; disk entries are owner-only,
+    expire after `disk_ttl` seconds and are trimmed to `max_disk_entries`
+    (oldest first) once a write takes the tier over the limit.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        cache_dir: Path | None = S3_CACHE_DIR,
+        max_disk_entries: int = 2048,
+        disk_ttl: float = S3_CACHE_DISK_TTL,
+    ):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.disk_ttl = disk_ttl
+        self._memory: OrderedDict[str, tuple[str, bytes]] = OrderedDict()
+        self._n_disk_entries: int | None = None  # counted on the first write, then tracked
+
+    def _disk_path(self, path: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(path.encode('utf-8')).hexdigest()}.json"
+
+    async def get(self, path: str) -> tuple[str, bytes] | None:
+        entry = self._memory.get(path)
+        if entry is not None:
+            self._memory.move_to_end(path)
+            return entry
+        if self.cache_dir is None:
+            return None
+        try:
+            stored = json.loads(await asyncio.to_thread(self._read_disk, path))
+        except (OSError, ValueError):
+            return None
+        entry = (stored["etag"], stored["body"].encode("utf-8"))
+        self._remember(path, entry)
+        return entry
+
+    async def put(self, path: str, etag: str, body: bytes) -> None:
+        self._remember(path, (etag, body))
+        if self.cache_dir is None:
+            return
+        try:
+            await asyncio.to_thread(self._write_disk, path, etag, body)
+        except OSError as e:
+            logger.warning(f"🟡 FAILED to write S3 disk cache | {path} | {e}")
+
+    async def discard(self, path: str) -> None:
+        self._memory.pop(path, None)
+        if self.cache_dir is not None:
+            await asyncio.to_thread(self._disk_path(path).unlink, missing_ok=True)
+
+    def _remember(self, path: str, entry: tuple[str, bytes]) -> None:
+        self._memory[path] = entry
+        self._memory.move_to_end(path)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, path: str) -> str:
+        target = self._disk_path(path)
+        if time.time() - target.stat().st_mtime > self.disk_ttl:
+            target.unlink(missing_ok=True)
+            raise FileNotFoundError(target)
+        return target.read_text(encoding="utf-8")
+
+    def _write_disk(self, path: str, etag: str, body: bytes) -> None:
+        self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if self._n_disk_entries is None:
+            self._n_disk_entries = sum(1 for _ in self.cache_dir.glob("*.json"))
+        target = self._disk_path(path)
+        is_new = not target.exists()
+        tmp = target.with_suffix(".tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "w", encoding="utf-8") as f:
+            json.dump({"etag": etag, "body": body.decode("utf-8")}, f)
+        tmp.replace(target)
+        if is_new:
+            self._n_disk_entries += 1
+        if self._n_disk_entries > self.max_disk_entries:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        # trims to 90% of the limit so the directory is not scanned again on the next writes
+        files = list(self.cache_dir.glob("*.json"))
+        keep = self.max_disk_entries * 9 // 10
+        if len(files) > keep:
+            files.sort(key=lambda f: f.stat().st_mtime)
+            for f in files[: len(files) - keep]:
+                f.unlink(missing_ok=True)
+        self._n_disk_entries = min(len(files), keep)
+
 
 class AsyncS3:
+    # one client per (event loop, credentials, region), shared by all instances in the process
+    _clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+    _client_locks: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
     def __init__(
         self,
         access_key_id,
@@ -18,6 +153,8 @@ class AsyncS3:
         region_name,
         n_retries=3,
         retry_delay=1.0,
+        compression: Literal["none", "gzip", "zstd"] = "none",
+        cache: S3ReadCache | None = None,
     ):
         self.session = aioboto3.Session(
             aws_access_key_id=access_key_id,
@@ -30,50 +167,107 @@ class AsyncS3:
         self.region_name = region_name
         self.n_retries = n_retries
         self.retry_delay = retry_delay
+        if compression == "zstd" and zstandard is None:
+            logger.warning("🟡 `zstandard` is not installed, compressing S3 objects with gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.cache = cache if cache is not None else S3ReadCache()
 
-    async def save_file(self, path, data):
+    async def _client(self):
+        loop = asyncio.get_running_loop()
+        key = (self.access_key_id, self.region_name)
+        lock = self._client_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            clients = self._clients.setdefault(loop, {})
+            if key not in clients:
+                stack = contextlib.AsyncExitStack()
+                client = await stack.enter_async_context(
+                    self.session.client(
+                        "s3",
+                        aws_access_key_id=self.access_key_id,
+                        aws_secret_access_key=self.secret_access_key,
+                        region_name=self.region_name,
+                    )
+                )
+                clients[key] = (client, stack)
+            return clients[key][0]
+
+    async def _drop_client(self):
+        # a broken connection pool is rebuilt on the next attempt
+        clients = self._clients.get(asyncio.get_running_loop(), {})
+        entry = clients.pop((self.access_key_id, self.region_name), None)
+        if entry is not None:
+            with contextlib.suppress(Exception):
+                await entry[1].aclose()
+
+    @classmethod
+    async def aclose_clients(cls):
+        """Close the clients of the running loop, call on job shutdown (e.g. ctx.add_shutdown_callback)"""
+        clients = cls._clients.pop(asyncio.get_running_loop(), {})
+        for _, stack in clients.values():
+            with contextlib.suppress(Exception):
+                await stack.aclose()
+
+    async def save_file(self, path, data) -> bool:
         save_start = time.time()
+        body = json.dumps(data).encode("utf-8")
+        put_kwargs = {
+            "Bucket": self.bucket_name,
+            "Key": path,
+            "Body": _compress(body, self.compression),
+            "ContentType": "application/json",
+        }
+        if self.compression != "none":
+            put_kwargs["ContentEncoding"] = self.compression
         for attempt in range(1, self.n_retries + 1):
-            async with self.session.client(
-                "s3",
-                aws_access_key_id=self.access_key_id,
-                aws_secret_access_key=self.secret_access_key,
-                region_name=self.region_name,
-            ) as s3:
-                try:
-                    await s3.put_object(Bucket=self.bucket_name, Key=path, Body=json.dumps(data))
-                    duration = time.time() - save_start
-                    logger.info(f"✅ DONE to save JSON to S3 | {path} | {duration:.2f}s")
-                    return
-                except Exception as e:
-                    if attempt == self.n_retries:
-                        logger.error(f"❌ FAILED to save JSON to S3 | {e}")
-                        return
-                    else:
-                        logger.warning(
-                            f"🟡 FAILED to save JSON to S3"
-                            f" | attempt {attempt}/{self.n_retries} | {e}"
-                        )
-                        await asyncio.sleep(self.retry_delay)
+            try:
+                s3 = await self._client()
+                res = await s3.put_object(**put_kwargs)
+                await self.cache.put(path, res["ETag"], body)
+                duration = time.time() - save_start
+                logger.info(
+                    f"✅ DONE to save JSON to S3 | {path} | {len(body)}->{len(put_kwargs['Body'])}B | {duration:.2f}s"
+                )
+                return True
+            except Exception as e:
+                if attempt == self.n_retries:
+                    logger.error(f"❌ FAILED to save JSON to S3 | {e}")
+                    await self.cache.discard(path)
+                    return False
+                else:
+                    logger.warning(
+                        f"🟡 FAILED to save JSON to S3"
+                        f" | attempt {attempt}/{self.n_retries} | {e}"
+                    )
+                    if not isinstance(e, ClientError):
+                        await self._drop_client()
+                    await asyncio.sleep(self.retry_delay)
 
     async def load_file(self, path) -> dict | None:
+        """Read-through: a cached copy is revalidated with If-None-Match and reused on 304"""
         load_start = time.time()
+        cached = await self.cache.get(path)
         for attempt in range(1, self.n_retries + 1):
             try:
-                async with self.session.client(
-                    "s3",
-                    aws_access_key_id=self.access_key_id,
-                    aws_secret_access_key=self.secret_access_key,
-                    region_name=self.region_name,
-                ) as s3:
-                    res = await s3.get_object(Bucket=self.bucket_name, Key=path)
-                    content = await res["Body"].read()
-                    duration = time.time() - load_start
-                    logger.info(f"✅ DONE to load JSON from S3 | {path} | {duration:.2f}s")
-                    return dict(json.loads(content))
+                s3 = await self._client()
+                get_kwargs = {"Bucket": self.bucket_name, "Key": path}
+                if cached is not None:
+                    get_kwargs["IfNoneMatch"] = cached[0]
+                res = await s3.get_object(**get_kwargs)
+                content = _decompress(await res["Body"].read(), res.get("ContentEncoding"))
+                await self.cache.put(path, res["ETag"], content)
+                duration = time.time() - load_start
+                logger.info(f"✅ DONE to load JSON from S3 | {path} | {duration:.2f}s")
+                return dict(json.loads(content))
             except ClientError as e:
-                if e.response["Error"]["Code"] == "NoSuchKey":
+                code = e.response["Error"]["Code"]
+                if code in ("304", "NotModified") and cached is not None:
+                    duration = time.time() - load_start
+                    logger.info(f"✅ DONE to load JSON from S3 (not modified) | {path} | {duration:.2f}s")
+                    return dict(json.loads(cached[1]))
+                if code == "NoSuchKey":
                     logger.info(f"📁 File not found in S3 | {path}")
+                    await self.cache.discard(path)
                     return None
                 else:
                     if attempt == self.n_retries:
@@ -94,13 +288,12 @@ class AsyncS3:
                         f"🟡 FAILED to load JSON from S3"
                         f" | attempt {attempt}/{self.n_retries} | {e}"
                     )
+                    await self._drop_client()
                     await asyncio.sleep(self.retry_delay)
         return None
 
 
 if __name__ == "__main__":
-    import os
-
     import dotenv
 
     dotenv.load_dotenv(override=True)
@@ -117,5 +310,8 @@ if __name__ == "__main__":
         await s3.save_file("test.json", {"test": "test"})
         dct = await s3.load_file("test.json")
         print(dct)
+        dct = await s3.load_file("test.json")  # revalidated, served from cache
+        print(dct)
+        await AsyncS3.aclose_clients()
 
     asyncio.run(main())
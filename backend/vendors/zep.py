@@ -4,8 +4,11 @@ import logging
 from typing import Literal
 
 from zep_cloud.client import AsyncZep
+from zep_cloud.core.api_error import ApiError
 from zep_cloud.types import EntityEdge, EntityNode, Message
 
+from .memory_ingest import MemoryMessage
+
 CONTEXT_STRING_TEMPLATE = """
 FACTS and ENTITIES represent relevant context to the current conversation.
 # These are the most relevant facts and their valid date ranges
@@ -40,22 +43,42 @@ def compose_context_block(nodes: list[EntityNode], edges: list[EntityEdge]) -> s
     return CONTEXT_STRING_TEMPLATE.format(facts='\n'.join(facts), entities='\n'.join(entities))
 
 
+def _already_exists(e: Exception) -> bool:
+    if not isinstance(e, ApiError):
+        return False
+    return e.status_code == 409 or (e.status_code == 400 and "already exists" in str(e.body).lower())
+
+
 class ZepMemory:
     def __init__(self, user_id: str, thread_id: str, first_name: str | None, api_key: str) -> None:
         self._client = AsyncZep(api_key=api_key)
         self._user_id = user_id
         self._thread_id = thread_id
         self._first_name = first_name
+        self._init_task: asyncio.Task | None = None
 
-    async def init(self) -> None:
+    async def _create_user_and_thread(self) -> None:
+        # sequential, the thread references the user
         try:
             await self._client.user.add(user_id=self._user_id, first_name=self._first_name)
-        except Exception:
-            pass  # already exists
+        except Exception as e:
+            if not _already_exists(e):
+                raise
         try:
             await self._client.thread.create(thread_id=self._thread_id, user_id=self._user_id)
-        except Exception:
-            pass  # already exists
+        except Exception as e:
+            if not _already_exists(e):
+                raise
+
+    async def init(self) -> None:
+        """
+        Create user and thread once per instance, concurrent callers share the
+        same attempt; a failed or cancelled attempt is retried by the next call.
+        """
+        task = self._init_task
+        if task is None or task.cancelled() or (task.done() and task.exception() is not None):
+            self._init_task = asyncio.create_task(self._create_user_and_thread())
+        await asyncio.shield(self._init_task)
 
     async def add_message(
         self,
@@ -64,18 +87,51 @@ class ZepMemory:
         name: str | None,
         created_at: dt.datetime | None,
     ) -> None:
-        message = Message(
-            role=role,
-            content=content,
-            name=name,
-            created_at=created_at.isoformat() if created_at else None,
-        )
-        await self._client.thread.add_messages(thread_id=self._thread_id, messages=[message])
+        await self.add_messages([MemoryMessage(role=role, content=content, name=name, created_at=created_at)])
+
+    async def add_messages(self, messages: list[MemoryMessage]) -> None:
+        messages = [
+            Message(
+                role=m.role,
+                content=m.content,
+                name=m.name,
+                created_at=m.created_at.isoformat() if m.created_at else None,
+            )
+            for m in messages
+        ]
+        # the API accepts at most 30 messages per call
+        for i in range(0, len(messages), 30):
+            await self._client.thread.add_messages(thread_id=self._thread_id, messages=messages[i : i + 30])
 
     async def retrieve_context(self) -> str | None:
         memory = await self._client.thread.get_user_context(thread_id=self._thread_id)
         return memory.context
 
+    async def _search(self, query: str, limit: int) -> tuple[list[EntityNode], list[EntityEdge]]:
+        result_nodes, result_edges = await asyncio.gather(
+            self._client.graph.search(
+                query=query[:400],
+                user_id=self._user_id,
+                scope='nodes',
+                reranker='cross_encoder',
+                limit=limit,
+            ),
+            self._client.graph.search(
+                query=query[:400],
+                user_id=self._user_id,
+                scope='edges',
+                reranker='cross_encoder',
+                limit=limit,
+            ),
+        )
+        return result_nodes.nodes or [], result_edges.edges or []
+
+    async def retrieve(self, query: str, top_k: int = 10, *, for_system: bool = False) -> list[str]:
+        """Relevant facts and entity summaries as plain lines, for MemoryRetriever"""
+        await self.init()
+        nodes, edges = await self._search(query, limit=top_k)
+        return [edge.fact for edge in edges] + [f"{node.name}: {node.summary}" for node in nodes]
+
     async def construct_system_prompt(self, prompt: str) -> str | None:
         # 1. init user and thread
         await self.init()
@@ -92,23 +148,7 @@ class ZepMemory:
         # )
         # # 3. retrieve context
         # context = await self.retrieve_context()
-        result_nodes, result_edges = await asyncio.gather(
-            self._client.graph.search(
-                query=prompt[:400],
-                user_id=self._user_id,
-                scope='nodes',
-                reranker='cross_encoder',
-                limit=10,
-            ),
-            self._client.graph.search(
-                query=prompt[:400],
-                user_id=self._user_id,
-                scope='edges',
-                reranker='cross_encoder',
-                limit=10,
-            ),
-        )
-        nodes, edges = result_nodes.nodes or [], result_edges.edges or []
+        nodes, edges = await self._search(prompt, limit=10)
         if not (nodes or edges):
             return None
         context = compose_context_block(nodes, edges)
@@ -160,7 +160,7 @@ export default function Page() {
     );
     
     // Передаем полную информацию о сценарии (без картинки) и user info
-    const { image_base64, ...scenarioInfo } = selectedScenarioData;
+    const { image_base64, image_mime, ...scenarioInfo } = selectedScenarioData;
     
     console.log('=== Scenario Info ===');
     console.log('Fields in scenarioInfo:', Object.keys(scenarioInfo));
@@ -818,7 +818,7 @@ function SimpleVoiceAssistant(props: {
                       {scenarios.map((scenario) => {
                         // Используем base64 изображение если есть, иначе путь к файлу
                         const imageSource = scenario.image_base64
-                          ? `data:image/png;base64,${scenario.image_base64}`
+                          ? `data:${scenario.image_mime || 'image/png'};base64,${scenario.image_base64}`
                           : `/photos/${props.selectedSkill.toLowerCase().replace(/\s+/g, '')}/${scenario.id}.png`;
 
                         const scenarioName = scenario.name || scenario.title;